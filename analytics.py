@@ -0,0 +1,230 @@
+"""
+============================================
+Complaint Analytics Rollups
+Web Based Smart Waste Management System
+============================================
+Questions like "complaints per area per day" or "average
+time to clean" would otherwise scan the whole complaints
+table. Instead two small rollup tables are kept up to date
+by the write routes, in the same transaction as the change:
+
+  complaint_daily_stats (day, area, status) -> complaints
+      complaints created on `day` in `area` that currently
+      have `status`
+
+  cleaning_daily_stats (day, area) -> cleaned, clean_seconds
+      complaints cleaned on `day` and the total time from
+      report to cleaning, for the average time to clean
+
+Like the map cluster counts (geo.py), every change is applied
+as -1 for the rows before it and +1 for the rows after it, so
+the rollups always match the table. Hotspots are read from
+the precomputed complaint_clusters grid.
+
+Complaints moved to complaints_archive (archive.py) stay
+counted: the rollups describe history, not the hot table.
+
+The analytics API reads only these small tables, so it
+answers in milliseconds however large complaints grows.
+Rebuild them from scratch with:
+    python migrations.py --rebuild-analytics
+============================================
+"""
+
+from datetime import date, datetime, timedelta
+
+# Days covered when no date range is given
+DEFAULT_RANGE_DAYS = 30
+
+# Most hotspot cells returned
+MAX_HOTSPOTS = 500
+
+
+# ============================================
+# INCREMENTAL MAINTENANCE
+# ============================================
+
+def daily_adjust_sql(where_sql, sign, table='complaints'):
+    """
+    SQL adding (sign=+1) or removing (sign=-1) the complaints matching
+    `where_sql` (table alias c) in complaint_daily_stats.
+    """
+    return f"""
+        INSERT INTO complaint_daily_stats (day, area, status, complaints)
+        SELECT * FROM (
+            SELECT DATE(c.created_at) AS d, c.area AS a, c.status AS s,
+                   {sign} * COUNT(*) AS d_count
+            FROM {table} c
+            WHERE ({where_sql})
+            GROUP BY d, a, s
+        ) AS delta
+        ON DUPLICATE KEY UPDATE
+            complaints = complaint_daily_stats.complaints + delta.d_count
+    """
+
+
+def cleaning_adjust_sql(where_sql, sign, table='complaints'):
+    """
+    SQL adding (sign=+1) or removing (sign=-1) the cleaned complaints
+    matching `where_sql` (table alias c) in cleaning_daily_stats.
+    Complaints without cleaned_at are ignored.
+    """
+    return f"""
+        INSERT INTO cleaning_daily_stats (day, area, cleaned, clean_seconds)
+        SELECT * FROM (
+            SELECT DATE(c.cleaned_at) AS d, c.area AS a,
+                   {sign} * COUNT(*) AS d_count,
+                   {sign} * SUM(TIMESTAMPDIFF(SECOND, c.created_at, c.cleaned_at)) AS d_seconds
+            FROM {table} c
+            WHERE c.cleaned_at IS NOT NULL AND ({where_sql})
+            GROUP BY d, a
+        ) AS delta
+        ON DUPLICATE KEY UPDATE
+            cleaned = cleaning_daily_stats.cleaned + delta.d_count,
+            clean_seconds = cleaning_daily_stats.clean_seconds + delta.d_seconds
+    """
+
+
+# ============================================
+# QUERIES FOR THE ANALYTICS API
+# ============================================
+
+def _parse_day(value, name):
+    try:
+        return datetime.strptime(value.strip(), '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError(f"{name} must be a date like 2024-02-05")
+
+
+def parse_day_range(args):
+    """
+    Read date_from / date_to (YYYY-MM-DD, inclusive) from request
+    arguments. Defaults to the last DEFAULT_RANGE_DAYS days.
+    """
+    date_to = _parse_day(args['date_to'], 'date_to') if args.get('date_to') else date.today()
+    if args.get('date_from'):
+        date_from = _parse_day(args['date_from'], 'date_from')
+    else:
+        date_from = date_to - timedelta(days=DEFAULT_RANGE_DAYS - 1)
+    if date_from > date_to:
+        raise ValueError("date_from must not be after date_to")
+    return date_from, date_to
+
+
+def parse_list(value):
+    """Comma separated request argument -> list of non-empty values."""
+    return [item.strip() for item in (value or '').split(',') if item.strip()]
+
+
+def _in_condition(column, values, conditions, params):
+    if values:
+        conditions.append(f"{column} IN ({', '.join(['%s'] * len(values))})")
+        params.extend(values)
+
+
+def daily_counts(cursor, date_from, date_to, areas=None, statuses=None):
+    """
+    Complaints per (day, area, status) plus totals per day, area and
+    status. Uses a dictionary cursor.
+    """
+    conditions = ["day BETWEEN %s AND %s", "complaints <> 0"]
+    params = [date_from, date_to]
+    _in_condition('area', areas, conditions, params)
+    _in_condition('status', statuses, conditions, params)
+    cursor.execute(f"""
+        SELECT day, area, status, complaints FROM complaint_daily_stats
+        WHERE {' AND '.join(conditions)}
+        ORDER BY day, area, status
+    """, params)
+
+    rows = []
+    totals = {'total': 0, 'by_day': {}, 'by_area': {}, 'by_status': {}}
+    for row in cursor.fetchall():
+        day, count = row['day'].isoformat(), int(row['complaints'])
+        rows.append({'day': day, 'area': row['area'], 'status': row['status'], 'count': count})
+        totals['total'] += count
+        for key, value in (('by_day', day), ('by_area', row['area']), ('by_status', row['status'])):
+            totals[key][value] = totals[key].get(value, 0) + count
+    return rows, totals
+
+
+def _clean_summary(cleaned, seconds):
+    cleaned = int(cleaned or 0)
+    average = float(seconds) / cleaned if cleaned else None
+    return {
+        'cleaned': cleaned,
+        'avg_hours_to_clean': round(average / 3600, 2) if average is not None else None,
+    }
+
+
+def time_to_clean(cursor, date_from, date_to, areas=None):
+    """
+    Complaints cleaned and average hours from report to cleaning,
+    overall, per area and per day (by cleaning day).
+    """
+    conditions = ["day BETWEEN %s AND %s"]
+    params = [date_from, date_to]
+    _in_condition('area', areas, conditions, params)
+    cursor.execute(f"""
+        SELECT day, area, cleaned, clean_seconds FROM cleaning_daily_stats
+        WHERE {' AND '.join(conditions)} AND cleaned <> 0
+        ORDER BY day, area
+    """, params)
+
+    overall = [0, 0]
+    by_area = {}
+    by_day = {}
+    for row in cursor.fetchall():
+        cleaned, seconds = int(row['cleaned']), int(row['clean_seconds'])
+        for totals in (overall, by_area.setdefault(row['area'], [0, 0]),
+                       by_day.setdefault(row['day'].isoformat(), [0, 0])):
+            totals[0] += cleaned
+            totals[1] += seconds
+    return {
+        'overall': _clean_summary(*overall),
+        'by_area': {area: _clean_summary(*totals) for area, totals in by_area.items()},
+        'by_day': {day: _clean_summary(*totals) for day, totals in by_day.items()},
+    }
+
+
+def hotspots(cursor, level, statuses, limit):
+    """
+    Grid cells with the most complaints at a cluster level, busiest
+    first, from the complaint_clusters table. With one status the
+    idx_level_status_count index returns the top cells directly.
+    """
+    if len(statuses) == 1:
+        cursor.execute("""
+            SELECT x, y, count, sum_lat / count AS latitude, sum_lng / count AS longitude
+            FROM complaint_clusters
+            WHERE level = %s AND status = %s AND count > 0
+            ORDER BY count DESC
+            LIMIT %s
+        """, (level, statuses[0], limit))
+    else:
+        conditions = ["level = %s"]
+        params = [level]
+        _in_condition('status', statuses, conditions, params)
+        cursor.execute(f"""
+            SELECT x, y, SUM(count) AS count,
+                   SUM(sum_lat) / SUM(count) AS latitude,
+                   SUM(sum_lng) / SUM(count) AS longitude
+            FROM complaint_clusters
+            WHERE {' AND '.join(conditions)}
+            GROUP BY x, y
+            HAVING SUM(count) > 0
+            ORDER BY count DESC
+            LIMIT %s
+        """, params + [limit])
+
+    cells = [{
+        'x': row['x'],
+        'y': row['y'],
+        'count': int(row['count']),
+        'latitude': round(float(row['latitude']), 6),
+        'longitude': round(float(row['longitude']), 6),
+    } for row in cursor.fetchall()]
+    busiest = cells[0]['count'] if cells else 0
+    for cell in cells:
+        cell['weight'] = round(cell['count'] / busiest, 3)  # 1.0 = hottest cell
+    return cells
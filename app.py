@@ -21,49 +21,148 @@
 # ============================================
 # IMPORT REQUIRED LIBRARIES
 # ============================================
-from flask import Flask, render_template, request, redirect, url_for, jsonify, flash, session
+from flask import Flask, Blueprint, Request, render_template, request, redirect, url_for, jsonify, flash, session, Response
+from flask import current_app
+from flask import before_render_template, template_rendered
+from werkzeug.local import LocalProxy  # Module names for the app's services
 import mysql.connector  # Library to connect Python with MySQL database
 import os  # For file and folder operations
-from werkzeug.utils import secure_filename  # For secure file uploads
+import time  # For request, query and upload timings
+from contextlib import contextmanager  # For get_db()
 from functools import wraps  # For creating login decorator
+import json  # For the multipart batch submission payload
+import uuid  # For server-generated idempotency keys
+from db_pool import ConnectionPool, PoolError  # Reusable MySQL connections
+import complaint_queries  # Filters, projection and keyset pagination
+import complaint_export  # Streaming NDJSON / CSV export
+from stats_cache import StatsCache, STATS_QUERY, build_stats  # Cached dashboard counts
+import migrations  # Versioned schema migrations
+import geo  # Distance, bounding box and map cluster helpers
+from duplicate_index import DuplicateIndex  # Finds repeat reports of the same spot
+import image_worker  # Background thumbnails / resized images
+import storage  # Content-addressed, streamed image uploads
+import http_cache  # ETag / Last-Modified and image cache headers
+import journal  # Write-behind journal for complaint submissions
+import routing  # Collection route planning (NumPy)
+import analytics  # Daily rollups, time to clean and hotspots
+import search  # Ranked full-text search
+import events  # Live dashboard updates (Server-Sent Events)
+import archive  # Archival of complaints cleaned long ago
+import metrics  # Request / query timing and the /metrics endpoint
+import settings  # WASTE_* environment settings
 
 # ============================================
 # FLASK APP CONFIGURATION
 # ============================================
-app = Flask(__name__)
+# The app is built by create_app() at the end of this file. Every
+# route is registered on this blueprint, and the services (database
+# pool, event broker, caches, metrics) live in app.extensions.
+bp = Blueprint('main', __name__)
 
-# Secret key for session management and flash messages
-app.secret_key = 'waste_management_secret_key_2024'
-
-# Configure upload folder for garbage images
-UPLOAD_FOLDER = 'uploads'
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+# Folders, relative to the working directory
+UPLOAD_FOLDER = 'uploads'               # Garbage images
+ARCHIVE_UPLOAD_FOLDER = 'archive_uploads'  # Images of archived complaints (see archive.py);
+                                        # may be a slower, cheaper disk
+JOURNAL_FOLDER = 'journal'              # Write-behind journal (see journal.py)
 
 # Allowed file extensions for image upload
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
 
-# Create uploads folder if it doesn't exist
-if not os.path.exists(UPLOAD_FOLDER):
-    os.makedirs(UPLOAD_FOLDER)
+# Background threads creating thumbnails of uploaded images
+IMAGE_WORKERS = 2
+
+# Upload limits: one image, and a whole request (batch sync with images)
+MAX_IMAGE_BYTES = 10 * 1024 * 1024
+MAX_CONTENT_LENGTH = 64 * 1024 * 1024
+
+
+class UploadRequest(Request):
+    """Streams every uploaded file straight into the blob store's temp area."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None,
+                         content_length=None):
+        return blob_store.new_upload()
+
 
 # ============================================
 # DATABASE CONFIGURATION
 # ============================================
-# MySQL Workbench connection settings
-DB_CONFIG = {
+# MySQL Workbench connection settings; override them with the
+# WASTE_DB_HOST / PORT / USER / PASSWORD / NAME environment variables
+DB_CONFIG = settings.db_config({
     'host': 'localhost',      # Database server (local machine)
     'user': 'root',           # MySQL username
     'password': 'aman',       # MySQL password
     'database': 'waste_management'  # Database name
-}
+})
+
+# The C extension of the MySQL driver blocks a gevent worker while it
+# waits for the server; the pure Python driver yields to other requests
+if settings.gevent_patched():
+    DB_CONFIG['use_pure'] = True
+
+# Largest radius accepted by /api/complaints/near (metres)
+NEAR_MAX_RADIUS_M = 20000
+
+# A new report is merged into an open complaint within this distance
+# that was reported within this time window
+DUPLICATE_RADIUS_M = 50
+DUPLICATE_WINDOW_HOURS = 24
+
+# Most complaints accepted in one batch submission
+MAX_BATCH_SIZE = 500
+
+# Fields a client may send for each complaint in a batch
+BATCH_ITEM_FIELDS = ('name', 'area', 'description', 'latitude', 'longitude',
+                     'image_path', 'idempotency_key')
+
+# Allowed complaint statuses
+VALID_STATUSES = ('Pending', 'Cleaned')
+
+# Most complaint IDs per status update (and per UPDATE statement)
+MAX_BULK_UPDATE = 1000
+
+# Dashboard statistics are cached in memory for this many seconds
+STATS_CACHE_TTL = 30
+
+# Most rows rendered by one /admin/rows request
+MAX_FRAGMENT_ROWS = 500
+
+# Complaints per dashboard page; more are loaded while scrolling
+ADMIN_PAGE_SIZE = 50
+
+# Request arguments that choose which complaints the dashboard shows
+ADMIN_VIEW_ARGS = ('status', 'area', 'date_from', 'date_to', 'sort')
+
+# ============================================
+# SERVICES (built by create_app)
+# ============================================
+# Module names for the current app's services, so routes and helpers
+# can use them as before; they work inside an app or request context.
+
+
+def _service(name):
+    return LocalProxy(lambda: current_app.extensions[name])
+
+
+db_pool = _service('db_pool')                  # Shared pool used by every route (db_pool.py)
+request_metrics = _service('request_metrics')  # Timings served at /metrics (metrics.py)
+blob_store = _service('blob_store')            # Uploaded images by content hash (storage.py)
+archive_store = _service('archive_store')      # Cold storage for archived complaints' images
+image_processor = _service('image_processor')  # Thumbnails made in the background
+duplicate_index = _service('duplicate_index')  # Open complaints near a new report
+dashboard_stats = _service('dashboard_stats')  # Cached dashboard counts
+live_events = _service('live_events')          # Pushes changes to open dashboards (events.py)
+write_journal = _service('write_journal')      # Write-behind journal of submissions
 
 # ============================================
 # ADMIN CREDENTIALS (For Municipality Login)
 # ============================================
 # In production, these should be stored securely in database
+# (until then set WASTE_ADMIN_USERNAME / WASTE_ADMIN_PASSWORD)
 ADMIN_CREDENTIALS = {
-    'username': 'admin',
-    'password': 'admin123'
+    'username': settings.get('ADMIN_USERNAME', 'admin'),
+    'password': settings.get('ADMIN_PASSWORD', 'admin123')
 }
 
 
@@ -71,74 +170,464 @@ ADMIN_CREDENTIALS = {
 # HELPER FUNCTIONS
 # ============================================
 
+def wants_json():
+    """
+    True if the caller is an API client rather than a browser: it
+    sent JSON, called an /api/ URL or prefers a JSON answer.
+    """
+    if request.is_json or request.path.startswith('/api/'):
+        return True
+    return request.accept_mimetypes.best_match(['text/html', 'application/json']) == 'application/json'
+
+
 def login_required(f):
     """
     Decorator function to protect admin routes.
-    Redirects to login page if user is not authenticated.
+    Redirects to login page if user is not authenticated; API
+    clients get 401 with a JSON message instead.
     """
     @wraps(f)
     def decorated_function(*args, **kwargs):
         if 'admin_logged_in' not in session:
+            if wants_json():
+                return jsonify({'success': False, 'message': 'Admin login required'}), 401
             flash('Please login to access the dashboard.', 'error')
-            return redirect(url_for('login'))
+            return redirect(url_for('main.login'))
         return f(*args, **kwargs)
     return decorated_function
 
 
 def init_database():
     """
-    Initialize the database and table if they don't exist.
-    This runs automatically when the app starts.
+    Create the database if needed and apply pending schema migrations.
+    Already-applied migrations are skipped, so this is cheap on restart.
+    See migrations.py (can also be run on its own).
     """
-    try:
-        # First connect without database to create it
-        conn = mysql.connector.connect(
-            host='localhost',
-            user='root',
-            password='aman'
-        )
-        cursor = conn.cursor()
-        
-        # Create database if not exists
-        cursor.execute("CREATE DATABASE IF NOT EXISTS waste_management")
-        cursor.execute("USE waste_management")
-        
-        # Create complaints table if not exists
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS complaints (
-                id INT PRIMARY KEY AUTO_INCREMENT,
-                name VARCHAR(100) NOT NULL,
-                area VARCHAR(100) NOT NULL,
-                description TEXT,
-                latitude VARCHAR(50),
-                longitude VARCHAR(50),
-                image_path VARCHAR(255),
-                status VARCHAR(50) DEFAULT 'Pending',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
+    if migrations.run_migrations(DB_CONFIG):
         print("✅ Database initialized successfully!")
         return True
-    except mysql.connector.Error as err:
-        print(f"❌ Database initialization error: {err}")
-        return False
+    print("❌ Database initialization failed")
+    return False
+
+
+@contextmanager
+def get_db():
+    """
+    Borrow a database connection from the pool.
+    Use it as a context manager so the connection is always returned:
+
+        with get_db() as connection:
+            cursor = connection.cursor()
+
+    The wait for the connection and every statement run on it are
+    timed for /metrics. Raises PoolError if no connection is available.
+    """
+    started = time.perf_counter()
+    with db_pool.connection() as connection:
+        request_metrics.observe_checkout(time.perf_counter() - started)
+        timed = request_metrics.instrument(connection)
+        try:
+            yield timed
+        finally:
+            timed.finish()
+
+
+def stage_uploaded_image(files, field='image'):
+    """
+    Return the uploaded image in `field` from the request, already
+    hashed and checked while the request was read (see storage.py),
+    or None if no valid image was sent.
+    """
+    if not files or field not in files:
+        return None
+    file = files[field]
+    if not file or file.filename == '' or not allowed_file(file.filename):
+        return None
+    return blob_store.stage(file)
 
 
-def get_db_connection():
+def save_uploaded_image(cursor, files, field='image'):
     """
-    Create and return a database connection.
-    This function is called whenever we need to interact with MySQL.
+    Store the uploaded image in `field` from the request, if any.
+    It is moved to its content-addressed path and counted in
+    image_blobs in the caller's transaction.
+    Returns the stored path, or None if no valid image was sent.
     """
+    upload = stage_uploaded_image(files, field)
+    if upload is None:
+        return None
+    # Lock the blob's row first, so a concurrent delete of the same
+    # photo cannot remove the file after it is published
+    storage.add_reference(cursor, upload.blob_path, upload.size)
+    started = time.perf_counter()
+    published = blob_store.publish(upload)
+    request_metrics.observe_upload_stored(time.perf_counter() - started)
+    if published:
+        # Thumbnails are created in the background; the request does not wait
+        image_processor.submit(upload.blob_path)
+    return upload.blob_path
+
+
+def release_image(cursor, image_path):
+    """
+    Drop one complaint's use of an image, in the caller's transaction.
+    The file and its variants are deleted only when no other
+    complaint uses them.
+    """
+    if not image_path:
+        return
+    if storage.release_reference(cursor, image_path) is not True:
+        return  # Still used by another complaint, or not a tracked upload
     try:
-        connection = mysql.connector.connect(**DB_CONFIG)
-        return connection
-    except mysql.connector.Error as err:
-        print(f"Database Connection Error: {err}")
+        blob_store.remove(image_path)
+    except ValueError as err:
+        print(f"Image not deleted: {err}")
+        return
+    image_worker.remove_variants(current_app.config['UPLOAD_FOLDER'], image_path)
+
+
+@bp.app_template_global()
+def image_url(image_path, variant=None):
+    """
+    URL of an uploaded image for templates. With a variant
+    ('thumb' or 'medium') the resized copy is used once the
+    background worker has created it, otherwise the original.
+    """
+    if variant and image_processor.has_variant(image_path, variant):
+        return url_for('main.uploaded_variant', variant=variant,
+                       filename=image_worker.variant_name(image_path))
+    return url_for('main.uploaded_file', filename=image_path)
+
+
+def merge_into_duplicate(cursor, latitude, longitude):
+    """
+    Check whether this report repeats an open complaint within
+    DUPLICATE_RADIUS_M reported in the last DUPLICATE_WINDOW_HOURS.
+    If so, add one to that complaint's report_count and return its ID;
+    otherwise return None. Runs in the caller's transaction.
+    """
+    lat = complaint_queries.parse_coordinate(latitude, 90)
+    lng = complaint_queries.parse_coordinate(longitude, 180)
+    if lat is None or lng is None:
         return None
+    
+    if duplicate_index.needs_refresh():
+        duplicate_index.load(cursor)
+    
+    for parent_id in duplicate_index.candidates(lat, lng):
+        cursor.execute(
+            "UPDATE complaints SET report_count = report_count + 1 "
+            "WHERE id = %s AND status = 'Pending'",
+            (parent_id,)
+        )
+        if cursor.rowcount:
+            return parent_id
+        # Cleaned or deleted by another worker since it was indexed
+        duplicate_index.remove(parent_id)
+    return None
+
+
+def adjust_aggregates(cursor, where_sql, params, sign):
+    """
+    Add (sign=1) or remove (sign=-1) the matching complaints from the
+    precomputed map cluster counts and the analytics rollups.
+    Runs in the caller's transaction.
+    `where_sql` refers to the complaints table as `c`.
+    """
+    cursor.execute(geo.cluster_adjust_sql(where_sql, sign), params)
+    cursor.execute(analytics.daily_adjust_sql(where_sql, sign), params)
+    cursor.execute(analytics.cleaning_adjust_sql(where_sql, sign), params)
+
+
+def insert_complaint(cursor, name, area, description, latitude, longitude, image_path,
+                     idempotency_key=None):
+    """
+    Insert one complaint and count it in the map clusters and rollups.
+    Runs in the caller's transaction; returns the new complaint ID.
+    """
+    cursor.execute(
+        complaint_queries.INSERT_COMPLAINT_SQL,
+        complaint_queries.insert_params(name, area, description, latitude, longitude,
+                                        image_path, idempotency_key)
+    )
+    complaint_id = cursor.lastrowid
+    adjust_aggregates(cursor, "c.id = %s", (complaint_id,), 1)
+    return complaint_id
+
+
+def insert_complaints_batch(cursor, items, files=None):
+    """
+    Insert many complaints in the caller's transaction.
+
+    Each item is a dict with name, area, description, latitude,
+    longitude, image_path and an optional idempotency_key. Items whose
+    key was already stored return the original complaint ID instead of
+    inserting again, so a retried sync is safe. Repeat reports of an
+    open complaint are merged into it as in the single-submit routes.
+
+    `files` (multipart uploads) may hold an image per item, sent as
+    image_0, image_1, ... matching the item positions. Without files,
+    an image_path must name an image that is already stored (its use
+    is counted here); journaled items that carry their own image
+    (image_size set) are counted by store_journal_records.
+
+    Returns (results, created): one result dict per item, in order,
+    and the list of newly inserted complaints for the cache hooks.
+    """
+    results = [None] * len(items)
+    pending = []  # (index, item) still to be stored
+    
+    for index, item in enumerate(items):
+        error = complaint_queries.validate_complaint(item)
+        if error:
+            results[index] = {'index': index, 'success': False, 'error': error}
+        else:
+            pending.append((index, item))
+    
+    # 1. Replayed items: their idempotency key is already stored
+    keys = [item['idempotency_key'] for _, item in pending if item.get('idempotency_key')]
+    known = {}
+    if keys:
+        placeholders = ', '.join(['%s'] * len(keys))
+        cursor.execute(f"SELECT idempotency_key, id FROM complaints "
+                       f"WHERE idempotency_key IN ({placeholders})", keys)
+        known.update(dict(cursor.fetchall()))
+        cursor.execute(f"SELECT idempotency_key, complaint_id FROM merged_reports "
+                       f"WHERE idempotency_key IN ({placeholders})", keys)
+        known.update(dict(cursor.fetchall()))
+    
+    new_items = []
+    merged_keys = []
+    seen_keys = set()
+    for index, item in pending:
+        key = item.get('idempotency_key')
+        if key in known:
+            results[index] = {'index': index, 'success': True, 'complaint_id': known[key],
+                              'status': 'replayed'}
+            continue
+        if key in seen_keys:
+            results[index] = {'index': index, 'success': False,
+                              'error': 'idempotency_key repeated within the batch'}
+            continue
+        if key:
+            seen_keys.add(key)
+        
+        # 2. Repeat reports of an open complaint are merged into it
+        parent_id = merge_into_duplicate(cursor, item.get('latitude'), item.get('longitude'))
+        if parent_id is not None:
+            results[index] = {'index': index, 'success': True, 'complaint_id': parent_id,
+                              'status': 'merged', 'duplicate_of': parent_id}
+            if key:
+                merged_keys.append((key, parent_id))
+            continue
+        
+        # Every inserted row gets a key so its new ID can be looked up
+        item = dict(item, idempotency_key=key or f"srv-{uuid.uuid4().hex}")
+        if files is not None:
+            item['image_path'] = save_uploaded_image(cursor, files, f'image_{index}')
+        elif item.get('image_path') and item.get('image_size') is None:
+            if not storage.add_existing_reference(cursor, item['image_path']):
+                results[index] = {'index': index, 'success': False,
+                                  'error': complaint_queries.UNKNOWN_IMAGE_MESSAGE}
+                continue
+        new_items.append((index, item))
+    
+    if merged_keys:
+        cursor.executemany("INSERT INTO merged_reports (idempotency_key, complaint_id) VALUES (%s, %s)",
+                           merged_keys)
+    
+    # 3. One multi-row INSERT for all new complaints
+    created = []
+    if new_items:
+        cursor.executemany(complaint_queries.INSERT_COMPLAINT_SQL, [
+            complaint_queries.insert_params(
+                item['name'], item['area'], item.get('description'), item.get('latitude'),
+                item.get('longitude'), item.get('image_path'), item['idempotency_key'])
+            for _, item in new_items
+        ])
+        
+        new_keys = [item['idempotency_key'] for _, item in new_items]
+        placeholders = ', '.join(['%s'] * len(new_keys))
+        cursor.execute(f"SELECT idempotency_key, id FROM complaints "
+                       f"WHERE idempotency_key IN ({placeholders})", new_keys)
+        ids = dict(cursor.fetchall())
+        
+        for index, item in new_items:
+            complaint_id = ids[item['idempotency_key']]
+            results[index] = {'index': index, 'success': True, 'complaint_id': complaint_id,
+                              'status': 'created'}
+            created.append(dict(item, id=complaint_id))
+        
+        # Count the new complaints in the map clusters and rollups
+        created_ids = [complaint['id'] for complaint in created]
+        adjust_aggregates(cursor, f"c.id IN ({', '.join(['%s'] * len(created_ids))})", created_ids, 1)
+    
+    return results, created
+
+
+def set_complaint_status(cursor, target_sql, target_params, new_status):
+    """
+    Set the status of every complaint matching `target_sql` with
+    set-based statements, in the caller's transaction.
+    Complaints already in `new_status` are left alone.
+    Returns the IDs of the complaints that changed.
+    """
+    # Lock the matching rows whose status actually changes
+    cursor.execute(
+        f"SELECT id FROM complaints WHERE ({target_sql}) AND status <> %s FOR UPDATE",
+        list(target_params) + [new_status]
+    )
+    changed_ids = [row[0] for row in cursor.fetchall()]
+    
+    for start in range(0, len(changed_ids), MAX_BULK_UPDATE):
+        chunk = changed_ids[start:start + MAX_BULK_UPDATE]
+        id_list = ', '.join(['%s'] * len(chunk))
+        
+        # Move the complaints between status counts in the map clusters
+        # and rollups; cleaned_at records when a complaint was cleaned
+        adjust_aggregates(cursor, f"c.id IN ({id_list})", chunk, -1)
+        cleaned_at = 'CURRENT_TIMESTAMP' if new_status == 'Cleaned' else 'NULL'
+        cursor.execute(f"UPDATE complaints SET status = %s, cleaned_at = {cleaned_at} "
+                       f"WHERE id IN ({id_list})",
+                       [new_status] + chunk)
+        adjust_aggregates(cursor, f"c.id IN ({id_list})", chunk, 1)
+    
+    return changed_ids
+
+
+def load_dashboard_stats():
+    """
+    Compute dashboard statistics with a single grouped query
+    (counts per status and per area).
+    """
+    with get_db() as connection:
+        cursor = connection.cursor(dictionary=True)
+        cursor.execute(STATS_QUERY)
+        rows = cursor.fetchall()
+        cursor.close()
+    return build_stats(rows)
+
+
+def get_dashboard_stats():
+    """Return dashboard statistics from the cache, loading them if needed."""
+    return dashboard_stats.get(load_dashboard_stats)
+
+
+def on_complaint_created(complaint_id, area, latitude, longitude):
+    """
+    Called after a new complaint is committed.
+    Keeps in-process caches and indexes in step with the database.
+    """
+    dashboard_stats.record_insert(area, 'Pending')
+    duplicate_index.add(
+        complaint_id,
+        complaint_queries.parse_coordinate(latitude, 90),
+        complaint_queries.parse_coordinate(longitude, 180)
+    )
+    live_events.publish('created', {'ids': [complaint_id]})
+
+
+def on_reports_merged(complaint_ids):
+    """
+    Called after repeat reports are merged into open complaints
+    (their report_count went up).
+    """
+    live_events.publish('updated', {'ids': sorted(set(complaint_ids))})
+
+
+def on_status_changed(complaint_ids, new_status):
+    """
+    Called after the status of complaints is updated.
+    Drops in-process caches that may now be stale.
+    """
+    dashboard_stats.invalidate()
+    if new_status != 'Pending':
+        for complaint_id in complaint_ids:
+            duplicate_index.remove(complaint_id)
+    live_events.publish('updated', {'ids': list(complaint_ids), 'status': new_status})
+
+
+def on_complaints_deleted(complaint_ids):
+    """
+    Called after complaints are deleted.
+    Drops in-process caches that may now be stale.
+    """
+    dashboard_stats.invalidate()
+    for complaint_id in complaint_ids:
+        duplicate_index.remove(complaint_id)
+    live_events.publish('deleted', {'ids': list(complaint_ids)})
+
+
+def queue_complaint(item, files=None):
+    """
+    Accept a complaint into the write-behind journal, with its
+    uploaded image. Returns the idempotency key it will be stored with.
+    """
+    item = dict(item, idempotency_key=item.get('idempotency_key') or f"jnl-{uuid.uuid4().hex}")
+    write_journal.submit(item, stage_uploaded_image(files))
+    return item['idempotency_key']
+
+
+def store_journal_records(records, files_dir):
+    """
+    Store journaled complaints in MySQL in one transaction. Called by
+    the journal's flusher thread; raising makes it retry later.
+    Images kept in the journal are published for the complaints that
+    are inserted (merged repeat reports do not keep their image).
+    """
+    items = []
+    for record in records:
+        item = dict(record['item'])
+        image_path = item.get('image_path')
+        if image_path and item.get('image_size') is not None:
+            kept = os.path.join(files_dir, os.path.basename(image_path))
+            if not os.path.exists(kept) and not os.path.exists(os.path.join(blob_store.root, image_path)):
+                print(f"Journal: image {image_path} is missing, storing complaint without it")
+                item['image_path'] = None
+        items.append(item)
+    
+    new_images = []
+    with get_db() as connection:
+        cursor = connection.cursor()
+        results, created = insert_complaints_batch(cursor, items)
+        for complaint in created:
+            image_path = complaint.get('image_path')
+            if not image_path:
+                continue
+            if complaint.get('image_size') is None:
+                continue  # Pre-uploaded path, counted by insert_complaints_batch
+            storage.add_reference(cursor, image_path, complaint['image_size'])
+            kept = os.path.join(files_dir, os.path.basename(image_path))
+            if blob_store.publish_copy(kept, image_path):
+                new_images.append(image_path)
+        if any(result['success'] and result['status'] != 'replayed' for result in results):
+            http_cache.bump_data_version(cursor)
+        connection.commit()
+        cursor.close()
+    
+    for result in results:
+        if not result['success']:
+            print(f"Journal: dropped invalid complaint: {result['error']}")
+    for image_path in new_images:
+        image_processor.submit(image_path)
+    for complaint in created:
+        on_complaint_created(complaint['id'], complaint['area'],
+                             complaint.get('latitude'), complaint.get('longitude'))
+    merged = [result['complaint_id'] for result in results
+              if result['success'] and result['status'] == 'merged']
+    if merged:
+        on_reports_merged(merged)
+
+
+# Flush errors caused by a record itself; anything else (MySQL down,
+# lost connection, lock timeouts, a full disk) is retried as a whole
+JOURNAL_RECORD_ERRORS = (mysql.connector.DataError, mysql.connector.IntegrityError,
+                         ValueError, TypeError, KeyError)
+
+
+def is_journal_outage(error):
+    """True if a failed journal flush should be retried later as is."""
+    return not isinstance(error, JOURNAL_RECORD_ERRORS)
 
 
 def allowed_file(filename):
@@ -150,10 +639,76 @@ def allowed_file(filename):
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
+# ============================================
+# REQUEST METRICS
+# ============================================
+# Registered before the other request hooks, so their time counts too
+
+@bp.before_app_request
+def start_request_timer():
+    request_metrics.start_request()
+
+
+@bp.after_app_request
+def record_request_metrics(response):
+    request_metrics.finish_request(request.method, request.endpoint or 'unmatched',
+                                   response.status_code, request.path)
+    return response
+
+
+def _render_started(sender, template, context, **extra):
+    request_metrics.render_started()
+
+
+def _render_finished(sender, template, context, **extra):
+    request_metrics.render_finished(template.name)
+
+
+
+
+# ============================================
+# BACKGROUND JOBS AND UPLOAD LIMITS
+# ============================================
+
+@bp.before_app_request
+def start_background_jobs():
+    """
+    Start the journal flusher (and replay unstored complaints) on the
+    first request, so each worker of a pre-forking server runs its own.
+    """
+    write_journal.start()
+
+
+@bp.before_app_request
+def read_uploads():
+    """
+    Parse multipart uploads before the view runs, so a request
+    rejected while streaming (too large / not an image) is answered
+    by upload_rejected() below instead of the view's error handling.
+    """
+    if request.method == 'POST' and request.mimetype == 'multipart/form-data':
+        started = time.perf_counter()
+        request.form
+        request_metrics.observe_upload_received(
+            time.perf_counter() - started,
+            [file.stream.size for _, file in request.files.items(multi=True)
+             if isinstance(file.stream, storage.HashingUpload)])
+
+
+@bp.app_errorhandler(413)
+@bp.app_errorhandler(415)
+def upload_rejected(error):
+    """Answer a rejected upload as JSON for the API, with a flash message otherwise."""
+    if request.path.startswith('/api/'):
+        return jsonify({'success': False, 'message': error.description}), error.code
+    flash(error.description, 'error')
+    return redirect(url_for('main.index'))
+
+
 # ============================================
 # ROUTE 1: HOME PAGE - User Complaint Form
 # ============================================
-@app.route('/')
+@bp.route('/')
 def index():
     """
     Display the garbage reporting page for citizens.
@@ -165,7 +720,7 @@ def index():
 # ============================================
 # ROUTE: ADMIN LOGIN PAGE
 # ============================================
-@app.route('/login', methods=['GET', 'POST'])
+@bp.route('/login', methods=['GET', 'POST'])
 def login():
     """
     Admin login page for municipality staff.
@@ -181,10 +736,10 @@ def login():
             session['admin_logged_in'] = True
             session['admin_username'] = username
             flash('Login successful! Welcome to the dashboard.', 'success')
-            return redirect(url_for('admin'))
+            return redirect(url_for('main.admin'))
         else:
             flash('Invalid username or password!', 'error')
-            return redirect(url_for('login'))
+            return redirect(url_for('main.login'))
     
     return render_template('login.html')
 
@@ -192,7 +747,7 @@ def login():
 # ============================================
 # ROUTE: ADMIN LOGOUT
 # ============================================
-@app.route('/logout')
+@bp.route('/logout')
 def logout():
     """
     Logout admin and clear session.
@@ -200,13 +755,13 @@ def logout():
     """
     session.clear()
     flash('You have been logged out successfully.', 'success')
-    return redirect(url_for('login'))
+    return redirect(url_for('main.login'))
 
 
 # ============================================
 # ROUTE 2: SUBMIT COMPLAINT
 # ============================================
-@app.route('/submit_complaint', methods=['POST'])
+@bp.route('/submit_complaint', methods=['POST'])
 def submit_complaint():
     """
     Handle complaint submission from both web form and mobile app.
@@ -220,63 +775,69 @@ def submit_complaint():
         description = request.form.get('description')
         latitude = request.form.get('latitude')
         longitude = request.form.get('longitude')
+        item = {'name': name, 'area': area, 'description': description,
+                'latitude': latitude, 'longitude': longitude}
         
-        # Handle image upload
-        image_path = None
-        if 'image' in request.files:
-            file = request.files['image']
-            if file and file.filename != '' and allowed_file(file.filename):
-                # Secure the filename to prevent security issues
-                filename = secure_filename(file.filename)
-                # Create unique filename using timestamp
-                import time
-                unique_filename = f"{int(time.time())}_{filename}"
-                # Save file to uploads folder
-                file_path = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-                file.save(file_path)
-                image_path = unique_filename
-        
-        # Connect to database
-        connection = get_db_connection()
-        if connection is None:
-            flash('Database connection failed!', 'error')
-            return redirect(url_for('index'))
-        
-        cursor = connection.cursor()
+        error = complaint_queries.validate_complaint(item)
+        if error:
+            flash(f'Could not submit complaint: {error}', 'error')
+            return redirect(url_for('main.index'))
         
-        # SQL query to insert complaint data
-        insert_query = """
-            INSERT INTO complaints (name, area, description, latitude, longitude, image_path, status)
-            VALUES (%s, %s, %s, %s, %s, %s, 'Pending')
-        """
+        if current_app.config['WRITE_BEHIND']:
+            # Journaled now, stored in MySQL in the background
+            queue_complaint(item, request.files)
+            flash('Complaint submitted successfully!', 'success')
+            return redirect(url_for('main.index'))
         
-        # Execute the query with complaint data
-        cursor.execute(insert_query, (name, area, description, latitude, longitude, image_path))
+        # Borrow a connection from the pool
+        with get_db() as connection:
+            cursor = connection.cursor()
+            
+            # Same spot already reported? Then count this report on it
+            parent_id = merge_into_duplicate(cursor, latitude, longitude)
+            
+            if parent_id is None:
+                # Handle image upload (only stored for new complaints)
+                image_path = save_uploaded_image(cursor, request.files)
+                
+                # Insert the complaint data
+                complaint_id = insert_complaint(cursor, name, area, description, latitude, longitude, image_path)
+            
+            # Commit the transaction to save changes
+            http_cache.bump_data_version(cursor)
+            connection.commit()
+            cursor.close()
         
-        # Commit the transaction to save changes
-        connection.commit()
+        if parent_id is not None:
+            on_reports_merged([parent_id])
+            flash(f'This spot was already reported. Your report was added to complaint #{parent_id}.', 'success')
+            return redirect(url_for('main.index'))
         
-        # Close database connection
-        cursor.close()
-        connection.close()
+        on_complaint_created(complaint_id, area, latitude, longitude)
         
         flash('Complaint submitted successfully!', 'success')
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
         
+    except PoolError as err:
+        # MySQL is unreachable: keep the complaint in the journal instead
+        print(f"Database Connection Error: {err}")
+        queue_complaint(item, request.files)
+        flash('Complaint submitted successfully!', 'success')
+        return redirect(url_for('main.index'))
     except mysql.connector.Error as err:
         print(f"Database Error: {err}")
         flash('Error submitting complaint. Please try again.', 'error')
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
     except Exception as e:
         print(f"Error: {e}")
         flash('An unexpected error occurred.', 'error')
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
 
 
 # ============================================
 # ROUTE 3: ADMIN DASHBOARD
 # ============================================
-@app.route('/admin')
+@bp.route('/admin')
 @login_required  # Protect this route - requires login
 def admin():
     """
@@ -285,180 +846,872 @@ def admin():
     Municipality staff can update complaint status from here.
     PROTECTED: Requires admin login to access.
     """
+    view_args = admin_view_args(request.args)
     try:
-        connection = get_db_connection()
-        if connection is None:
-            return render_template('admin.html', complaints=[], error="Database connection failed")
-        
-        cursor = connection.cursor(dictionary=True)  # Return results as dictionary
-        
-        # Fetch all complaints ordered by newest first
-        cursor.execute("SELECT * FROM complaints ORDER BY created_at DESC")
-        complaints = cursor.fetchall()
-        
-        # Get statistics for dashboard
-        cursor.execute("SELECT COUNT(*) as total FROM complaints")
-        total = cursor.fetchone()['total']
-        
-        cursor.execute("SELECT COUNT(*) as pending FROM complaints WHERE status='Pending'")
-        pending = cursor.fetchone()['pending']
+        query, params, limit = build_dashboard_query(view_args, request.args.get('cursor'))
+    except ValueError as err:
+        flash(str(err), 'error')
+        return redirect(url_for('main.admin'))
+    
+    try:
+        with get_db() as connection:
+            cursor = connection.cursor(dictionary=True)  # Return results as dictionary
+            
+            # One page of complaints; the rest is loaded while scrolling
+            cursor.execute(query, params)
+            complaints = cursor.fetchall()
+            cursor.close()
         
-        cursor.execute("SELECT COUNT(*) as cleaned FROM complaints WHERE status='Cleaned'")
-        cleaned = cursor.fetchone()['cleaned']
+        complaints, next_cursor = split_page(complaints, limit)
         
-        stats = {'total': total, 'pending': pending, 'cleaned': cleaned}
+        # Get statistics for dashboard (cached, one grouped query)
+        stats = get_dashboard_stats()
         
-        cursor.close()
-        connection.close()
+        return render_template('admin.html', complaints=complaints, stats=stats,
+                               view_args=view_args, next_cursor=next_cursor,
+                               sort_orders=complaint_queries.SORT_ORDERS)
         
-        return render_template('admin.html', complaints=complaints, stats=stats)
+    except PoolError as err:
+        print(f"Database Connection Error: {err}")
+        return render_template('admin.html', complaints=[], stats=None, error="Database connection failed",
+                               view_args=view_args, next_cursor=None,
+                               sort_orders=complaint_queries.SORT_ORDERS)
+    except mysql.connector.Error as err:
+        print(f"Database Error: {err}")
+        return render_template('admin.html', complaints=[], stats=None, error="Database error occurred",
+                               view_args=view_args, next_cursor=None,
+                               sort_orders=complaint_queries.SORT_ORDERS)
+
+
+def admin_view_args(args):
+    """The dashboard filters and sort order from request arguments."""
+    return {key: args[key] for key in ADMIN_VIEW_ARGS if args.get(key)}
+
+
+def build_dashboard_query(view_args, cursor_token=None, ids=None):
+    """
+    SELECT for the dashboard rows matching the filters in `view_args`,
+    in its sort order: one page after `cursor_token`, or with `ids`
+    just those complaints. Returns (query, params, limit).
+    Raises ValueError for invalid arguments.
+    """
+    sort = complaint_queries.parse_sort(view_args.get('sort'))
+    conditions, params = complaint_queries.parse_filters(view_args)
+    limit = ADMIN_PAGE_SIZE
+    if ids is not None:
+        conditions.append(f"id IN ({', '.join(['%s'] * len(ids))})")
+        params.extend(ids)
+        limit = len(ids)
+    if cursor_token:
+        condition, cursor_params = complaint_queries.keyset_condition(cursor_token, sort)
+        conditions.append(condition)
+        params.extend(cursor_params)
+    query, params = complaint_queries.build_page_query(
+        complaint_queries.DASHBOARD_FIELDS, conditions, params, limit, sort=sort)
+    return query, params, limit
+
+
+def split_page(rows, limit):
+    """
+    Cut the extra row off a page fetched with build_page_query().
+    Returns (rows, next_cursor).
+    """
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, complaint_queries.encode_cursor(rows[-1])
+    return rows, None
+
+
+# ============================================
+# ROUTE: LIVE DASHBOARD UPDATES
+# ============================================
+@bp.route('/admin/events')
+@login_required
+def admin_events():
+    """
+    Server-Sent Events stream of complaint changes for the dashboard
+    (created / updated / deleted, see events.py). The browser's
+    EventSource reconnects by itself and sends Last-Event-ID, so
+    events missed in between are delivered on reconnect.
+    PROTECTED: Requires admin login.
+    """
+    try:
+        stream = live_events.stream(request.headers.get('Last-Event-ID'))
+    except events.SubscriberLimitReached:
+        return Response('Too many live dashboards open\n', status=503,
+                        headers={'Retry-After': '30'}, mimetype='text/plain')
+    except (PoolError, mysql.connector.Error) as err:
+        print(f"Live events error: {err}")
+        return Response('Live updates are unavailable\n', status=503,
+                        headers={'Retry-After': '30'}, mimetype='text/plain')
+    
+    return Response(stream, mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # Tell nginx not to buffer the stream
+    })
+
+
+@bp.route('/admin/rows')
+@login_required
+def admin_rows():
+    """
+    Render dashboard table rows as an HTML fragment.
+
+      /admin/rows?cursor=...&status=Pending   the next page of the
+          dashboard (infinite scroll); the cursor for the page after
+          it is sent in the X-Next-Cursor header
+      /admin/rows?ids=12,15                   just these complaints,
+          for the live updates (filters still apply)
+
+    Takes the same status / area / date_from / date_to / sort
+    arguments as /admin.
+    PROTECTED: Requires admin login.
+    """
+    view_args = admin_view_args(request.args)
+    try:
+        ids = None
+        if 'ids' in request.args:
+            ids = complaint_queries.parse_id_list(request.args.get('ids'), MAX_FRAGMENT_ROWS)
+            if not ids:
+                return ''
+        query, params, limit = build_dashboard_query(view_args, request.args.get('cursor'), ids)
+    except ValueError as err:
+        return Response(str(err), status=400, mimetype='text/plain')
+    
+    try:
+        with get_db() as connection:
+            cursor = connection.cursor(dictionary=True)
+            cursor.execute(query, params)
+            complaints = cursor.fetchall()
+            cursor.close()
         
+        complaints, next_cursor = split_page(complaints, limit)
+        response = Response(''.join(render_template('complaint_row.html', complaint=complaint)
+                                    for complaint in complaints), mimetype='text/html')
+        if next_cursor and ids is None:
+            response.headers['X-Next-Cursor'] = next_cursor
+        return response
+    
+    except PoolError as err:
+        print(f"Database Connection Error: {err}")
+        return Response('Database connection failed', status=500, mimetype='text/plain')
     except mysql.connector.Error as err:
         print(f"Database Error: {err}")
-        return render_template('admin.html', complaints=[], error="Database error occurred")
+        return Response('Database error occurred', status=500, mimetype='text/plain')
 
 
 # ============================================
 # ROUTE 4: UPDATE COMPLAINT STATUS
 # ============================================
-@app.route('/update_status', methods=['POST'])
+@bp.route('/update_status', methods=['POST'])
+@login_required
 def update_status():
     """
-    Update the status of a complaint (Pending / Cleaned).
-    Called when municipality staff marks a complaint as resolved.
+    Update the status of complaints (Pending / Cleaned).
+    Called when municipality staff marks complaints as resolved.
+
+    Which complaints to update (JSON or form fields):
+      id      : one complaint ID (original behaviour)
+      ids     : a list of IDs (JSON array, repeated form field
+                or comma separated)
+      filter  : JSON object with area / status / date_from / date_to,
+                e.g. {"area": "Kankarbagh", "status": "Pending"}
+                (form: filter_area, filter_status)
+    All matching complaints are updated with one set-based UPDATE.
+    Returns the number of complaints whose status changed.
+    PROTECTED: Requires admin login.
     """
+    is_json = request.is_json
+    
+    def fail(message, code=400):
+        if is_json:
+            return jsonify({'success': False, 'message': message}), code
+        flash(message, 'error')
+        return redirect(url_for('main.admin'))
+    
+    # Get complaint IDs / filter and new status from form or JSON
+    if is_json:
+        # For API calls (Flutter app)
+        data = request.get_json(silent=True) or {}
+        new_status = data.get('status')
+        ids = data.get('ids')
+        if ids is None and data.get('id') is not None:
+            ids = [data.get('id')]
+        filters = data.get('filter')
+    else:
+        # For web form submission
+        new_status = request.form.get('status')
+        ids = []
+        for value in request.form.getlist('id') + request.form.getlist('ids'):
+            ids.extend(part for part in value.split(',') if part.strip())
+        filters = {key[len('filter_'):]: value for key, value in request.form.items()
+                   if key.startswith('filter_') and value}
+    
+    if new_status not in VALID_STATUSES:
+        return fail(f"status must be one of: {', '.join(VALID_STATUSES)}")
+    
+    # Work out which complaints to update
+    if ids:
+        try:
+            ids = sorted({int(complaint_id) for complaint_id in ids})
+        except (TypeError, ValueError):
+            return fail('ids must be integers')
+        if len(ids) > MAX_BULK_UPDATE:
+            return fail(f'At most {MAX_BULK_UPDATE} complaints per update')
+        target_sql = f"id IN ({', '.join(['%s'] * len(ids))})"
+        target_params = ids
+    elif filters:
+        if not isinstance(filters, dict):
+            return fail('filter must be an object')
+        try:
+            conditions, target_params = complaint_queries.parse_filters(filters)
+        except ValueError as err:
+            return fail(str(err))
+        if not conditions:
+            return fail('filter needs at least one of area, status, date_from, date_to')
+        target_sql = ' AND '.join(conditions)
+    else:
+        return fail('Provide id, ids or filter')
+    
     try:
-        # Get complaint ID and new status from form or JSON
-        if request.is_json:
-            # For API calls (Flutter app)
-            data = request.get_json()
-            complaint_id = data.get('id')
-            new_status = data.get('status')
-        else:
-            # For web form submission
-            complaint_id = request.form.get('id')
-            new_status = request.form.get('status')
-        
-        connection = get_db_connection()
-        if connection is None:
-            if request.is_json:
-                return jsonify({'success': False, 'message': 'Database connection failed'}), 500
-            flash('Database connection failed!', 'error')
-            return redirect(url_for('admin'))
+        with get_db() as connection:
+            cursor = connection.cursor()
+            changed_ids = set_complaint_status(cursor, target_sql, target_params, new_status)
+            if changed_ids:
+                http_cache.bump_data_version(cursor)
+            connection.commit()
+            cursor.close()
         
-        cursor = connection.cursor()
-        
-        # Update query
-        update_query = "UPDATE complaints SET status = %s WHERE id = %s"
-        cursor.execute(update_query, (new_status, complaint_id))
-        
-        connection.commit()
-        cursor.close()
-        connection.close()
+        if changed_ids:
+            on_status_changed(changed_ids, new_status)
         
-        if request.is_json:
-            return jsonify({'success': True, 'message': 'Status updated successfully'})
+        updated = len(changed_ids)
+        if is_json:
+            return jsonify({'success': True, 'message': 'Status updated successfully',
+                            'updated': updated, 'ids': changed_ids})
         
-        flash('Status updated successfully!', 'success')
-        return redirect(url_for('admin'))
+        if updated == 1:
+            flash('Status updated successfully!', 'success')
+        else:
+            flash(f'Status updated for {updated} complaints.', 'success')
+        return redirect(url_for('main.admin'))
         
+    except PoolError as err:
+        print(f"Database Connection Error: {err}")
+        return fail('Database connection failed', 500)
     except mysql.connector.Error as err:
         print(f"Database Error: {err}")
-        if request.is_json:
-            return jsonify({'success': False, 'message': str(err)}), 500
-        flash('Error updating status.', 'error')
-        return redirect(url_for('admin'))
+        return fail(str(err) if is_json else 'Error updating status.', 500)
 
 
 # ============================================
 # ROUTE: DELETE COMPLAINT
 # ============================================
-@app.route('/delete_complaint/<int:complaint_id>', methods=['POST'])
+@bp.route('/delete_complaint/<int:complaint_id>', methods=['POST'])
 @login_required
 def delete_complaint(complaint_id):
     """
     Delete a complaint from the database.
-    Also deletes the associated image file.
+    Also deletes the associated image file if no other complaint uses it.
     PROTECTED: Requires admin login.
     """
     try:
-        connection = get_db_connection()
-        if connection is None:
-            flash('Database connection failed!', 'error')
-            return redirect(url_for('admin'))
-        
-        cursor = connection.cursor(dictionary=True)
-        
-        # First, get the image path to delete the file
-        cursor.execute("SELECT image_path FROM complaints WHERE id = %s", (complaint_id,))
-        complaint = cursor.fetchone()
-        
-        if complaint and complaint['image_path']:
-            # Delete the image file
-            image_file = os.path.join(app.config['UPLOAD_FOLDER'], complaint['image_path'])
-            if os.path.exists(image_file):
-                os.remove(image_file)
-        
-        # Delete from database
-        cursor.execute("DELETE FROM complaints WHERE id = %s", (complaint_id,))
-        connection.commit()
+        with get_db() as connection:
+            cursor = connection.cursor(dictionary=True)
+            
+            # First, get the image path to delete the file
+            cursor.execute("SELECT image_path FROM complaints WHERE id = %s", (complaint_id,))
+            complaint = cursor.fetchone()
+            
+            # Delete from database (and from the map cluster counts and rollups)
+            adjust_aggregates(cursor, "c.id = %s", (complaint_id,), -1)
+            cursor.execute("DELETE FROM complaints WHERE id = %s", (complaint_id,))
+            
+            if complaint:
+                # Delete the image file unless another complaint uses it
+                release_image(cursor, complaint['image_path'])
+                http_cache.bump_data_version(cursor)
+            connection.commit()
+            cursor.close()
         
-        cursor.close()
-        connection.close()
+        on_complaints_deleted([complaint_id])
         
         flash('Complaint deleted successfully!', 'success')
-        return redirect(url_for('admin'))
+        return redirect(url_for('main.admin'))
         
+    except PoolError as err:
+        print(f"Database Connection Error: {err}")
+        flash('Database connection failed!', 'error')
+        return redirect(url_for('main.admin'))
     except mysql.connector.Error as err:
         print(f"Database Error: {err}")
         flash('Error deleting complaint.', 'error')
-        return redirect(url_for('admin'))
+        return redirect(url_for('main.admin'))
 
 
 # ============================================
-# ROUTE 5: API - GET ALL COMPLAINTS (JSON)
+# ROUTE 5: API - GET COMPLAINTS (JSON, PAGINATED)
 # ============================================
-@app.route('/complaints', methods=['GET'])
+@bp.route('/complaints', methods=['GET'])
 def get_complaints():
     """
-    REST API endpoint to get all complaints in JSON format.
+    REST API endpoint to get complaints in JSON format.
     This API is designed to be used by Flutter mobile app (Android & iOS).
-    Returns: JSON array of all complaints
+
+    Query parameters (all optional):
+      limit     : page size (default 50, max 500)
+      cursor    : next_cursor value from the previous page
+      status    : Pending / Cleaned (comma separated for several)
+      area      : exact area name
+      date_from : YYYY-MM-DD or YYYY-MM-DD HH:MM:SS
+      date_to   : YYYY-MM-DD or YYYY-MM-DD HH:MM:SS
+      fields    : columns to return, e.g. id,area,status,created_at
+
+    Returns: JSON page of complaints, newest first, plus next_cursor
+    (null when there are no more pages).
+
+    Responses carry an ETag (and Last-Modified). Polling clients
+    should send it back in If-None-Match; until any complaint
+    changes the answer is an empty 304 Not Modified.
     """
     try:
-        connection = get_db_connection()
-        if connection is None:
-            return jsonify({'success': False, 'message': 'Database connection failed'}), 500
+        fields = complaint_queries.parse_fields(request.args.get('fields'))
+        limit = complaint_queries.parse_limit(request.args.get('limit'))
+        conditions, params = complaint_queries.parse_filters(request.args)
         
-        cursor = connection.cursor(dictionary=True)
+        cursor_token = request.args.get('cursor')
+        if cursor_token:
+            condition, cursor_params = complaint_queries.keyset_condition(cursor_token)
+            conditions.append(condition)
+            params.extend(cursor_params)
+    except ValueError as err:
+        return jsonify({'success': False, 'message': str(err)}), 400
+    
+    try:
+        query, query_params = complaint_queries.build_page_query(fields, conditions, params, limit)
         
-        # Fetch all complaints
-        cursor.execute("SELECT * FROM complaints ORDER BY created_at DESC")
-        complaints = cursor.fetchall()
+        with get_db() as connection:
+            cursor = connection.cursor(dictionary=True)
+            
+            # Same transaction as the query below, so the version
+            # matches the rows that are sent
+            version, changed_at, db_now = http_cache.read_data_version(cursor)
+            etag = http_cache.make_etag(version, request.args)
+            modified = http_cache.last_modified(changed_at, db_now)
+            if http_cache.is_not_modified(request, etag, modified):
+                cursor.close()
+                return http_cache.set_validators(Response(status=304), etag, modified)
+            
+            cursor.execute(query, query_params)
+            complaints = cursor.fetchall()
+            cursor.close()
         
-        cursor.close()
-        connection.close()
+        # The extra row only tells us whether another page exists
+        next_cursor = None
+        if len(complaints) > limit:
+            complaints = complaints[:limit]
+            next_cursor = complaint_queries.encode_cursor(complaints[-1])
         
         # Convert datetime objects to string for JSON serialization
         for complaint in complaints:
-            if complaint.get('created_at'):
-                complaint['created_at'] = complaint['created_at'].strftime('%Y-%m-%d %H:%M:%S')
+            complaint_queries.serialize_complaint(complaint)
+        
+        response = jsonify({
+            'success': True,
+            'data': complaints,
+            'count': len(complaints),
+            'next_cursor': next_cursor
+        })
+        return http_cache.set_validators(response, etag, modified)
+        
+    except PoolError as err:
+        print(f"Database Connection Error: {err}")
+        return jsonify({'success': False, 'message': 'Database connection failed'}), 500
+    except mysql.connector.Error as err:
+        print(f"Database Error: {err}")
+        return jsonify({'success': False, 'message': str(err)}), 500
+
+
+# ============================================
+# ROUTE: API - FULL-TEXT SEARCH
+# ============================================
+@bp.route('/api/search', methods=['GET'])
+def search_complaints():
+    """
+    Search complaint descriptions and areas, best match first.
+    Example: /api/search?q=dead+animal&status=Pending
+
+    Query parameters:
+      q         : search text (required); "quoted words" match as a phrase
+      limit     : page size (default 50, max 500)
+      cursor    : next_cursor value from the previous page
+      status, area, date_from, date_to, fields : same as /complaints
+
+    Returns: matching complaints with their relevance score, plus
+    next_cursor (null when there are no more results).
+    """
+    try:
+        boolean_query, natural_query = search.parse_search_text(request.args.get('q'))
+        fields = complaint_queries.parse_fields(request.args.get('fields'))
+        limit = complaint_queries.parse_limit(request.args.get('limit'))
+        conditions, params = complaint_queries.parse_filters(request.args)
+        cursor_token = request.args.get('cursor')
+        offset = search.decode_cursor(cursor_token) if cursor_token else 0
+    except ValueError as err:
+        return jsonify({'success': False, 'message': str(err)}), 400
+    
+    try:
+        query, query_params = search.build_search_query(
+            fields, conditions, params, boolean_query, natural_query, limit, offset)
+        
+        with get_db() as connection:
+            cursor = connection.cursor(dictionary=True)
+            cursor.execute(query, query_params)
+            results = cursor.fetchall()
+            cursor.close()
+        
+        next_cursor = None
+        if len(results) > limit:
+            results = results[:limit]
+            if offset + limit <= search.MAX_SEARCH_OFFSET:
+                next_cursor = search.encode_cursor(offset + limit)
+        
+        for result in results:
+            complaint_queries.serialize_complaint(result)
+            result['score'] = round(float(result['score']), 4)
+        
+        return jsonify({
+            'success': True,
+            'data': results,
+            'count': len(results),
+            'next_cursor': next_cursor
+        })
+    
+    except PoolError as err:
+        print(f"Database Connection Error: {err}")
+        return jsonify({'success': False, 'message': 'Database connection failed'}), 500
+    except mysql.connector.Error as err:
+        print(f"Database Error: {err}")
+        return jsonify({'success': False, 'message': str(err)}), 500
+
+
+# ============================================
+# ROUTE: API - ARCHIVED COMPLAINTS
+# ============================================
+@bp.route('/api/archive/complaints', methods=['GET'])
+def get_archived_complaints():
+    """
+    Complaints moved to the archive by archive.py (cleaned long ago),
+    newest first, one page at a time.
+    Takes the same limit / cursor / status / area / date_from /
+    date_to / fields arguments as /complaints; fields may also
+    include archived_at. A date range reads only the archive
+    partitions (years) it covers.
+    Images are served from /archive/uploads/<image_path>.
+    """
+    try:
+        fields = complaint_queries.parse_fields(request.args.get('fields'), archive.ARCHIVE_FIELDS)
+        limit = complaint_queries.parse_limit(request.args.get('limit'))
+        conditions, params = complaint_queries.parse_filters(request.args)
+        
+        cursor_token = request.args.get('cursor')
+        if cursor_token:
+            condition, cursor_params = complaint_queries.keyset_condition(cursor_token)
+            conditions.append(condition)
+            params.extend(cursor_params)
+    except ValueError as err:
+        return jsonify({'success': False, 'message': str(err)}), 400
+    
+    try:
+        query, query_params = complaint_queries.build_page_query(
+            fields, conditions, params, limit, table='complaints_archive')
+        
+        with get_db() as connection:
+            cursor = connection.cursor(dictionary=True)
+            cursor.execute(query, query_params)
+            complaints = cursor.fetchall()
+            cursor.close()
+        
+        complaints, next_cursor = split_page(complaints, limit)
+        for complaint in complaints:
+            complaint_queries.serialize_complaint(complaint)
         
         return jsonify({
             'success': True,
             'data': complaints,
-            'count': len(complaints)
+            'count': len(complaints),
+            'next_cursor': next_cursor
         })
+    
+    except PoolError as err:
+        print(f"Database Connection Error: {err}")
+        return jsonify({'success': False, 'message': 'Database connection failed'}), 500
+    except mysql.connector.Error as err:
+        print(f"Database Error: {err}")
+        return jsonify({'success': False, 'message': str(err)}), 500
+
+
+# ============================================
+# ROUTE: API - STREAMING EXPORT (NDJSON / CSV)
+# ============================================
+@bp.route('/complaints/export', methods=['GET'])
+def export_complaints():
+    """
+    Stream every matching complaint for reporting jobs.
+
+    Query parameters (all optional):
+      format    : ndjson (default) or csv
+      gzip      : 1 to gzip-compress the download
+      status, area, date_from, date_to, fields : same as /complaints
+
+    Rows are streamed in batches from a server-side cursor, so
+    memory stays flat no matter how large the table is.
+    """
+    export_format = request.args.get('format', 'ndjson').lower()
+    if export_format not in complaint_export.EXPORT_FORMATS:
+        return jsonify({'success': False, 'message': 'format must be ndjson or csv'}), 400
+    use_gzip = request.args.get('gzip') in ('1', 'true', 'yes')
+    
+    try:
+        fields = complaint_queries.parse_fields(request.args.get('fields'))
+        conditions, params = complaint_queries.parse_filters(request.args)
+    except ValueError as err:
+        return jsonify({'success': False, 'message': str(err)}), 400
+    
+    query = complaint_queries.build_select_query(fields, conditions)
+    
+    # Borrow the connection before streaming starts so a database
+    # outage is reported as an error instead of an empty download
+    try:
+        started = time.perf_counter()
+        connection, opened_at = db_pool.acquire()
+        request_metrics.observe_checkout(time.perf_counter() - started)
+    except PoolError as err:
+        print(f"Database Connection Error: {err}")
+        return jsonify({'success': False, 'message': 'Database connection failed'}), 500
+    timed = request_metrics.instrument(connection)
+    
+    def generate():
+        # The connection goes back to the pool when the stream ends,
+        # fails or the client disconnects (GeneratorExit)
+        completed = False
+        batches = complaint_export.iter_batches(timed, query, params)
+        try:
+            if export_format == 'csv':
+                chunks = complaint_export.csv_chunks(fields, batches)
+            else:
+                chunks = complaint_export.ndjson_chunks(fields, batches)
+            if use_gzip:
+                chunks = complaint_export.gzip_chunks(chunks)
+            for chunk in chunks:
+                yield chunk
+            completed = True
+        except mysql.connector.Error as err:
+            # Headers are already sent; abort the stream so the client
+            # sees a truncated transfer rather than a "complete" file
+            print(f"Database Error during export: {err}")
+            raise
+        finally:
+            # Close the cursor while the connection is still ours. An
+            # unfinished result is never read to the end: the query is
+            # cancelled and the connection closed, not reused
+            if not completed:
+                db_pool.cancel_query(connection)
+            batches.close()
+            timed.finish()
+            db_pool.release(connection, opened_at, discard=not completed)
+    
+    mimetype, extension = complaint_export.EXPORT_FORMATS[export_format]
+    filename = f"complaints.{extension}"
+    if use_gzip:
+        mimetype = 'application/gzip'
+        filename += '.gz'
+    
+    return Response(
+        generate(),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+
+# ============================================
+# ROUTE: API - COMPLAINTS NEAR A POINT
+# ============================================
+@bp.route('/api/complaints/near', methods=['GET'])
+def complaints_near():
+    """
+    Find complaints within a radius of a point, nearest first.
+    Example: pending complaints within 500 m of a truck
+        /api/complaints/near?lat=25.61&lng=85.14&radius=500&status=Pending
+
+    Query parameters:
+      lat, lng  : centre point (required)
+      radius    : metres (default 500, max 20000)
+      limit     : max results (default 50, max 500)
+      status, area, date_from, date_to, fields : same as /complaints
+
+    Uses the SPATIAL index to read only the bounding box around
+    the circle, then filters by exact distance.
+    """
+    try:
+        lat = float(request.args['lat'])
+        lng = float(request.args['lng'])
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            raise ValueError("lat / lng out of range")
+        radius = min(float(request.args.get('radius', 500)), NEAR_MAX_RADIUS_M)
+        if radius <= 0:
+            raise ValueError("radius must be positive")
+        limit = complaint_queries.parse_limit(request.args.get('limit'))
+        fields = complaint_queries.parse_fields(request.args.get('fields'))
+        conditions, params = complaint_queries.parse_filters(request.args)
+    except KeyError:
+        return jsonify({'success': False, 'message': 'lat and lng are required'}), 400
+    except ValueError as err:
+        return jsonify({'success': False, 'message': str(err)}), 400
+    
+    box = geo.bounding_box(lat, lng, radius)
+    query = f"""
+        SELECT {', '.join(fields)},
+               ST_Distance_Sphere(location, ST_PointFromText(%s, 4326, 'axis-order=lat-long')) AS distance_m
+        FROM complaints
+        WHERE MBRContains(ST_PolygonFromText(%s, 4326, 'axis-order=lat-long'), location)
+          AND latitude IS NOT NULL
+          {''.join(' AND ' + condition for condition in conditions)}
+        HAVING distance_m <= %s
+        ORDER BY distance_m
+        LIMIT %s
+    """
+    query_params = [geo.point_wkt(lat, lng), geo.box_wkt(*box)] + params + [radius, limit]
+    
+    try:
+        with get_db() as connection:
+            cursor = connection.cursor(dictionary=True)
+            cursor.execute(query, query_params)
+            complaints = cursor.fetchall()
+            cursor.close()
         
+        for complaint in complaints:
+            complaint_queries.serialize_complaint(complaint)
+            complaint['distance_m'] = round(float(complaint['distance_m']), 1)
+        
+        return jsonify({'success': True, 'data': complaints, 'count': len(complaints)})
+    
+    except PoolError as err:
+        print(f"Database Connection Error: {err}")
+        return jsonify({'success': False, 'message': 'Database connection failed'}), 500
     except mysql.connector.Error as err:
         print(f"Database Error: {err}")
         return jsonify({'success': False, 'message': str(err)}), 500
 
 
+# ============================================
+# ROUTE: API - COMPLAINTS INSIDE A BOUNDING BOX
+# ============================================
+@bp.route('/api/complaints/within', methods=['GET'])
+def complaints_within():
+    """
+    Find complaints inside a map bounding box, newest first.
+
+    Query parameters:
+      min_lat, min_lng, max_lat, max_lng : the box (required)
+      limit : max results (default 50, max 500)
+      status, area, date_from, date_to, fields : same as /complaints
+    """
+    try:
+        box = geo.parse_bbox(request.args)
+        if box is None:
+            raise ValueError("min_lat, min_lng, max_lat and max_lng are required")
+        limit = complaint_queries.parse_limit(request.args.get('limit'))
+        fields = complaint_queries.parse_fields(request.args.get('fields'))
+        conditions, params = complaint_queries.parse_filters(request.args)
+    except ValueError as err:
+        return jsonify({'success': False, 'message': str(err)}), 400
+    
+    conditions = [
+        "MBRContains(ST_PolygonFromText(%s, 4326, 'axis-order=lat-long'), location)",
+        "latitude IS NOT NULL",
+    ] + conditions
+    params = [geo.box_wkt(*box)] + params
+    query, query_params = complaint_queries.build_page_query(fields, conditions, params, limit)
+    
+    try:
+        with get_db() as connection:
+            cursor = connection.cursor(dictionary=True)
+            cursor.execute(query, query_params)
+            complaints = cursor.fetchall()
+            cursor.close()
+        
+        # The extra row tells us the box holds more than `limit` complaints
+        truncated = len(complaints) > limit
+        complaints = complaints[:limit]
+        for complaint in complaints:
+            complaint_queries.serialize_complaint(complaint)
+        
+        return jsonify({'success': True, 'data': complaints, 'count': len(complaints),
+                        'truncated': truncated})
+    
+    except PoolError as err:
+        print(f"Database Connection Error: {err}")
+        return jsonify({'success': False, 'message': 'Database connection failed'}), 500
+    except mysql.connector.Error as err:
+        print(f"Database Error: {err}")
+        return jsonify({'success': False, 'message': str(err)}), 500
+
+
+# ============================================
+# ROUTE: API - MAP CLUSTERS
+# ============================================
+@bp.route('/api/complaints/clusters', methods=['GET'])
+def complaint_clusters():
+    """
+    Cluster counts for drawing complaints on a map.
+    Returns one entry per grid cell (count + centroid) instead of
+    one per complaint, read from the precomputed complaint_clusters
+    table, so the cost depends on the visible area only.
+
+    Query parameters:
+      zoom   : map zoom level 0-22 (required)
+      min_lat, min_lng, max_lat, max_lng : visible area (optional)
+      status : Pending / Cleaned (comma separated; default all)
+    """
+    try:
+        zoom = int(request.args['zoom'])
+        if not 0 <= zoom <= 22:
+            raise ValueError("zoom must be between 0 and 22")
+        box = geo.parse_bbox(request.args)
+    except KeyError:
+        return jsonify({'success': False, 'message': 'zoom is required'}), 400
+    except ValueError as err:
+        return jsonify({'success': False, 'message': str(err)}), 400
+    
+    level = geo.cluster_level(zoom)
+    conditions = ["level = %s"]
+    params = [level]
+    
+    status = request.args.get('status')
+    if status:
+        statuses = [s.strip() for s in status.split(',') if s.strip()]
+        conditions.append(f"status IN ({', '.join(['%s'] * len(statuses))})")
+        params.extend(statuses)
+    
+    if box:
+        min_lat, min_lng, max_lat, max_lng = box
+        # Tile y grows southwards, so the north-west corner has the smallest x and y
+        x0, y0 = geo.tile_xy(max_lat, min_lng, level)
+        x1, y1 = geo.tile_xy(min_lat, max_lng, level)
+        conditions.append("x BETWEEN %s AND %s AND y BETWEEN %s AND %s")
+        params.extend([x0, x1, y0, y1])
+    
+    query = f"""
+        SELECT x, y, SUM(count) AS count,
+               SUM(sum_lat) / SUM(count) AS latitude,
+               SUM(sum_lng) / SUM(count) AS longitude
+        FROM complaint_clusters
+        WHERE {' AND '.join(conditions)}
+        GROUP BY x, y
+        HAVING SUM(count) > 0
+    """
+    
+    try:
+        with get_db() as connection:
+            cursor = connection.cursor(dictionary=True)
+            cursor.execute(query, params)
+            clusters = [
+                {
+                    'x': row['x'],
+                    'y': row['y'],
+                    'count': int(row['count']),
+                    'latitude': round(float(row['latitude']), 6),
+                    'longitude': round(float(row['longitude']), 6),
+                }
+                for row in cursor.fetchall()
+            ]
+            cursor.close()
+        
+        return jsonify({'success': True, 'zoom': zoom, 'level': level,
+                        'data': clusters, 'count': len(clusters)})
+    
+    except PoolError as err:
+        print(f"Database Connection Error: {err}")
+        return jsonify({'success': False, 'message': 'Database connection failed'}), 500
+    except mysql.connector.Error as err:
+        print(f"Database Error: {err}")
+        return jsonify({'success': False, 'message': str(err)}), 500
+
+
+# ============================================
+# ROUTE: API - COLLECTION ROUTE PLANNING
+# ============================================
+@bp.route('/api/routes', methods=['GET'])
+@login_required
+def plan_collection_routes():
+    """
+    Plan truck routes over the pending complaints (see routing.py).
+    Admin only: planning takes up to a few seconds of CPU.
+    Example: 3 trucks of 40 complaints each from the depot
+        /api/routes?depot_lat=25.61&depot_lng=85.14&vehicles=3&capacity=40
+
+    Query parameters:
+      depot_lat, depot_lng : where the vehicles start and finish (required)
+      vehicles             : number of vehicles (default 1, max 100)
+      capacity             : most complaints per vehicle (default 50)
+      area                 : only these areas (comma separated)
+
+    Returns: the ordered stops of each vehicle with the route length,
+    complaints left over when capacity runs out, and solve timings.
+    """
+    try:
+        depot_lat = float(request.args['depot_lat'])
+        depot_lng = float(request.args['depot_lng'])
+        if not (-90 <= depot_lat <= 90 and -180 <= depot_lng <= 180):
+            raise ValueError("depot_lat / depot_lng out of range")
+        vehicles = int(request.args.get('vehicles', 1))
+        capacity = int(request.args.get('capacity', 50))
+        if not (1 <= vehicles <= routing.MAX_VEHICLES):
+            raise ValueError(f"vehicles must be between 1 and {routing.MAX_VEHICLES}")
+        if capacity < 1:
+            raise ValueError("capacity must be positive")
+    except KeyError:
+        return jsonify({'success': False, 'message': 'depot_lat and depot_lng are required'}), 400
+    except ValueError as err:
+        return jsonify({'success': False, 'message': str(err)}), 400
+    areas = [area.strip() for area in request.args.get('area', '').split(',') if area.strip()]
+    
+    try:
+        with get_db() as connection:
+            cursor = connection.cursor(dictionary=True)
+            stops = routing.load_pending_stops(cursor, areas)
+            cursor.close()
+    except PoolError as err:
+        print(f"Database Connection Error: {err}")
+        return jsonify({'success': False, 'message': 'Database connection failed'}), 500
+    except mysql.connector.Error as err:
+        print(f"Database Error: {err}")
+        return jsonify({'success': False, 'message': str(err)}), 500
+    
+    if len(stops) > routing.MAX_ROUTE_STOPS:
+        return jsonify({'success': False,
+                        'message': f'More than {routing.MAX_ROUTE_STOPS} pending complaints; '
+                                   f'filter by area'}), 400
+    
+    # CPU-bound: under gevent it runs on a native thread
+    plan = settings.run_cpu_bound(routing.plan_routes, stops, depot_lat, depot_lng, vehicles, capacity)
+    for route in plan['routes']:
+        for stop in route['stops']:
+            complaint_queries.serialize_complaint(stop)
+    
+    return jsonify({
+        'success': True,
+        'depot': {'latitude': depot_lat, 'longitude': depot_lng},
+        'stop_count': len(stops),
+        **plan
+    })
+
+
 # ============================================
 # ROUTE 6: API - SUBMIT COMPLAINT (JSON)
 # ============================================
-@app.route('/api/submit_complaint', methods=['POST'])
+@bp.route('/api/submit_complaint', methods=['POST'])
 def api_submit_complaint():
     """
     REST API endpoint for submitting complaints from Flutter app.
@@ -474,7 +1727,7 @@ def api_submit_complaint():
             description = data.get('description')
             latitude = data.get('latitude')
             longitude = data.get('longitude')
-            image_path = data.get('image_path')  # For JSON, image should be pre-uploaded
+            image_path = data.get('image_path')  # For JSON, a stored image's path
         else:
             # Handle form data (for image upload)
             name = request.form.get('name')
@@ -483,37 +1736,43 @@ def api_submit_complaint():
             latitude = request.form.get('latitude')
             longitude = request.form.get('longitude')
             
-            # Handle image upload
             image_path = None
-            if 'image' in request.files:
-                file = request.files['image']
-                if file and file.filename != '' and allowed_file(file.filename):
-                    filename = secure_filename(file.filename)
-                    import time
-                    unique_filename = f"{int(time.time())}_{filename}"
-                    file_path = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-                    file.save(file_path)
-                    image_path = unique_filename
-        
-        connection = get_db_connection()
-        if connection is None:
-            return jsonify({'success': False, 'message': 'Database connection failed'}), 500
-        
-        cursor = connection.cursor()
-        
-        insert_query = """
-            INSERT INTO complaints (name, area, description, latitude, longitude, image_path, status)
-            VALUES (%s, %s, %s, %s, %s, %s, 'Pending')
-        """
+        item = {'name': name, 'area': area, 'description': description,
+                'latitude': latitude, 'longitude': longitude, 'image_path': image_path}
+        error = complaint_queries.validate_complaint(item)
+        if error:
+            return jsonify({'success': False, 'message': error}), 400
         
-        cursor.execute(insert_query, (name, area, description, latitude, longitude, image_path))
-        connection.commit()
+        with get_db() as connection:
+            cursor = connection.cursor()
+            
+            # Same spot already reported? Then count this report on it
+            parent_id = merge_into_duplicate(cursor, latitude, longitude)
+            
+            if parent_id is None:
+                # Handle image upload (only stored for new complaints)
+                if not request.is_json:
+                    image_path = save_uploaded_image(cursor, request.files)
+                elif image_path and not storage.add_existing_reference(cursor, image_path):
+                    cursor.close()
+                    return jsonify({'success': False, 'message': complaint_queries.UNKNOWN_IMAGE_MESSAGE}), 400
+                
+                # Insert and get the ID of the new complaint
+                complaint_id = insert_complaint(cursor, name, area, description, latitude, longitude, image_path)
+            http_cache.bump_data_version(cursor)
+            connection.commit()
+            cursor.close()
         
-        # Get the ID of the inserted complaint
-        complaint_id = cursor.lastrowid
+        if parent_id is not None:
+            on_reports_merged([parent_id])
+            return jsonify({
+                'success': True,
+                'message': 'This spot was already reported; your report was added to the existing complaint',
+                'complaint_id': parent_id,
+                'duplicate_of': parent_id
+            })
         
-        cursor.close()
-        connection.close()
+        on_complaint_created(complaint_id, area, latitude, longitude)
         
         return jsonify({
             'success': True,
@@ -521,22 +1780,426 @@ def api_submit_complaint():
             'complaint_id': complaint_id
         })
         
+    except PoolError as err:
+        # MySQL is unreachable: accept the complaint into the journal;
+        # it is stored (and gets its ID) once the database is back
+        print(f"Database Connection Error: {err}")
+        key = queue_complaint(item, None if request.is_json else request.files)
+        return jsonify({
+            'success': True,
+            'queued': True,
+            'message': 'Complaint accepted and will be stored shortly',
+            'idempotency_key': key
+        }), 202
     except Exception as e:
         print(f"Error: {e}")
         return jsonify({'success': False, 'message': str(e)}), 500
 
 
+# ============================================
+# ROUTE: API - BATCH SUBMIT (OFFLINE SYNC)
+# ============================================
+@bp.route('/api/submit_complaints/batch', methods=['POST'])
+def api_submit_complaints_batch():
+    """
+    Submit many complaints at once, e.g. when the mobile app syncs
+    reports it queued while offline. All complaints are stored in one
+    transaction with one multi-row INSERT.
+
+    Accepts either:
+      - JSON: {"complaints": [{...}, {...}]} (or a bare JSON array)
+      - multipart/form-data: a 'complaints' field holding the JSON array,
+        plus image files named image_0, image_1, ... per complaint
+
+    Each complaint may carry an "idempotency_key" (max 64 chars). If a
+    sync is retried, complaints with a known key are not inserted again
+    and their original complaint_id is returned.
+
+    Returns: one result per complaint, in order, with its complaint_id
+    (status created / merged / replayed) or an error message.
+    """
+    try:
+        if request.is_json:
+            data = request.get_json()
+            items = data.get('complaints') if isinstance(data, dict) else data
+            files = None
+        else:
+            items = json.loads(request.form.get('complaints', '[]'))
+            files = request.files
+    except ValueError:
+        return jsonify({'success': False, 'message': 'complaints must be a JSON array'}), 400
+    
+    if not isinstance(items, list) or not items:
+        return jsonify({'success': False, 'message': 'complaints must be a non-empty JSON array'}), 400
+    if len(items) > MAX_BATCH_SIZE:
+        return jsonify({'success': False,
+                        'message': f'At most {MAX_BATCH_SIZE} complaints per batch'}), 413
+    # Only the documented fields: keys such as image_size are set by
+    # the server for images it stored itself
+    items = [{key: item[key] for key in BATCH_ITEM_FIELDS if key in item} if isinstance(item, dict) else item
+             for item in items]
+    
+    try:
+        with get_db() as connection:
+            cursor = connection.cursor()
+            results, created = insert_complaints_batch(cursor, items, files)
+            if any(result['success'] and result['status'] != 'replayed' for result in results):
+                http_cache.bump_data_version(cursor)
+            connection.commit()
+            cursor.close()
+        
+        for complaint in created:
+            on_complaint_created(complaint['id'], complaint['area'],
+                                 complaint.get('latitude'), complaint.get('longitude'))
+        merged = [result['complaint_id'] for result in results
+                  if result['success'] and result['status'] == 'merged']
+        if merged:
+            on_reports_merged(merged)
+        
+        counts = {'created': 0, 'merged': 0, 'replayed': 0, 'failed': 0}
+        for result in results:
+            counts[result['status'] if result['success'] else 'failed'] += 1
+        
+        return jsonify({'success': True, 'results': results, **counts})
+    
+    except PoolError as err:
+        print(f"Database Connection Error: {err}")
+        return jsonify({'success': False, 'message': 'Database connection failed'}), 500
+    except mysql.connector.IntegrityError as err:
+        # The same idempotency key arrived twice at the same moment
+        print(f"Database Error: {err}")
+        return jsonify({'success': False, 'message': 'Batch conflicts with a concurrent retry; please retry'}), 409
+    except mysql.connector.Error as err:
+        print(f"Database Error: {err}")
+        return jsonify({'success': False, 'message': str(err)}), 500
+
+
+# ============================================
+# ROUTE: API - DASHBOARD STATISTICS
+# ============================================
+@bp.route('/api/stats', methods=['GET'])
+def api_stats():
+    """
+    Complaint counts per status and per area (cached).
+    Same numbers as the dashboard statistics cards.
+    """
+    try:
+        return jsonify({'success': True, 'data': get_dashboard_stats()})
+    except PoolError as err:
+        print(f"Database Connection Error: {err}")
+        return jsonify({'success': False, 'message': 'Database connection failed'}), 500
+    except mysql.connector.Error as err:
+        print(f"Database Error: {err}")
+        return jsonify({'success': False, 'message': str(err)}), 500
+
+
+# ============================================
+# ROUTE: API - ANALYTICS
+# ============================================
+@bp.route('/api/analytics/daily', methods=['GET'])
+def analytics_daily():
+    """
+    Complaints per day, area and status (by day reported), with
+    totals, read from the complaint_daily_stats rollup.
+
+    Query parameters (all optional):
+      date_from, date_to : YYYY-MM-DD, inclusive (default: last 30 days)
+      area               : comma separated areas
+      status             : comma separated statuses
+    """
+    try:
+        date_from, date_to = analytics.parse_day_range(request.args)
+    except ValueError as err:
+        return jsonify({'success': False, 'message': str(err)}), 400
+    
+    try:
+        with get_db() as connection:
+            cursor = connection.cursor(dictionary=True)
+            rows, totals = analytics.daily_counts(
+                cursor, date_from, date_to,
+                analytics.parse_list(request.args.get('area')),
+                analytics.parse_list(request.args.get('status'))
+            )
+            cursor.close()
+        
+        return jsonify({'success': True, 'date_from': date_from.isoformat(),
+                        'date_to': date_to.isoformat(), 'data': rows, 'totals': totals})
+    
+    except PoolError as err:
+        print(f"Database Connection Error: {err}")
+        return jsonify({'success': False, 'message': 'Database connection failed'}), 500
+    except mysql.connector.Error as err:
+        print(f"Database Error: {err}")
+        return jsonify({'success': False, 'message': str(err)}), 500
+
+
+@bp.route('/api/analytics/time_to_clean', methods=['GET'])
+def analytics_time_to_clean():
+    """
+    Complaints cleaned and average hours from report to cleaning,
+    overall, per area and per day cleaned.
+
+    Query parameters (all optional):
+      date_from, date_to : cleaning days, YYYY-MM-DD (default: last 30 days)
+      area               : comma separated areas
+    """
+    try:
+        date_from, date_to = analytics.parse_day_range(request.args)
+    except ValueError as err:
+        return jsonify({'success': False, 'message': str(err)}), 400
+    
+    try:
+        with get_db() as connection:
+            cursor = connection.cursor(dictionary=True)
+            data = analytics.time_to_clean(cursor, date_from, date_to,
+                                           analytics.parse_list(request.args.get('area')))
+            cursor.close()
+        
+        return jsonify({'success': True, 'date_from': date_from.isoformat(),
+                        'date_to': date_to.isoformat(), 'data': data})
+    
+    except PoolError as err:
+        print(f"Database Connection Error: {err}")
+        return jsonify({'success': False, 'message': 'Database connection failed'}), 500
+    except mysql.connector.Error as err:
+        print(f"Database Error: {err}")
+        return jsonify({'success': False, 'message': str(err)}), 500
+
+
+@bp.route('/api/analytics/hotspots', methods=['GET'])
+def analytics_hotspots():
+    """
+    Heatmap of the busiest grid cells, hottest first, with a weight
+    from 0 to 1 for colouring. Read from the map cluster counts.
+
+    Query parameters (all optional):
+      zoom   : map zoom level 0-22, sets the cell size (default 12)
+      status : comma separated statuses (default Pending)
+      limit  : most cells returned (default 100, max 500)
+    """
+    try:
+        zoom = int(request.args.get('zoom', 12))
+        if not 0 <= zoom <= 22:
+            raise ValueError("zoom must be between 0 and 22")
+        limit = int(request.args.get('limit', 100))
+        if not 1 <= limit <= analytics.MAX_HOTSPOTS:
+            raise ValueError(f"limit must be between 1 and {analytics.MAX_HOTSPOTS}")
+    except ValueError as err:
+        return jsonify({'success': False, 'message': str(err)}), 400
+    
+    level = geo.cluster_level(zoom)
+    statuses = analytics.parse_list(request.args.get('status', 'Pending'))
+    
+    try:
+        with get_db() as connection:
+            cursor = connection.cursor(dictionary=True)
+            cells = analytics.hotspots(cursor, level, statuses, limit)
+            cursor.close()
+        
+        return jsonify({'success': True, 'zoom': zoom, 'level': level,
+                        'data': cells, 'count': len(cells)})
+    
+    except PoolError as err:
+        print(f"Database Connection Error: {err}")
+        return jsonify({'success': False, 'message': 'Database connection failed'}), 500
+    except mysql.connector.Error as err:
+        print(f"Database Error: {err}")
+        return jsonify({'success': False, 'message': str(err)}), 500
+
+
+# ============================================
+# ROUTE: API - CONNECTION POOL STATISTICS
+# ============================================
+@bp.route('/api/pool_stats', methods=['GET'])
+def pool_stats():
+    """
+    Report database connection pool usage for monitoring:
+    connections in use / idle, wait times and checkout failures.
+    """
+    return jsonify({'success': True, 'data': db_pool.stats()})
+
+
+# ============================================
+# ROUTE: API - WRITE JOURNAL STATISTICS
+# ============================================
+@bp.route('/api/journal_stats', methods=['GET'])
+def journal_stats():
+    """
+    Report the write-behind journal for monitoring: complaints
+    waiting to be stored (depth), age of the oldest one (lag),
+    fsyncs and failed flushes.
+    """
+    return jsonify({'success': True, 'data': write_journal.stats()})
+
+
+# ============================================
+# ROUTE: API - LIVE EVENT STATISTICS
+# ============================================
+@bp.route('/api/event_stats', methods=['GET'])
+def event_stats():
+    """
+    Report the live dashboard event broker for monitoring: open
+    streams and events published.
+    """
+    return jsonify({'success': True, 'data': live_events.stats()})
+
+
+# ============================================
+# ROUTE: PROMETHEUS METRICS
+# ============================================
+@bp.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """
+    Request, SQL, template and upload timings plus the pool,
+    journal, image worker and event broker counters, in the
+    Prometheus text format (see metrics.py).
+    """
+    return Response(request_metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
 # ============================================
 # ROUTE 7: SERVE UPLOADED IMAGES
 # ============================================
-@app.route('/uploads/<filename>')
+@bp.route('/uploads/<path:filename>')
 def uploaded_file(filename):
     """
     Serve uploaded images from the uploads folder.
     This allows displaying garbage images in the admin dashboard.
+    Images are stored under their content hash, so they are cached
+    as immutable; Range requests and conditional GETs are supported.
     """
     from flask import send_from_directory
-    return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+    response = send_from_directory(current_app.config['UPLOAD_FOLDER'], filename)
+    return http_cache.cache_image(response, filename)
+
+
+@bp.route('/archive/uploads/<path:filename>')
+def archived_file(filename):
+    """
+    Serve the image of an archived complaint from cold storage.
+    """
+    from flask import send_from_directory
+    response = send_from_directory(current_app.config['ARCHIVE_UPLOAD_FOLDER'], filename)
+    return http_cache.cache_image(response, filename)
+
+
+@bp.route('/uploads/variants/<variant>/<path:filename>')
+def uploaded_variant(variant, filename):
+    """
+    Serve a resized copy (thumb / medium) of an uploaded image.
+    These are created in the background by image_worker.py.
+    """
+    from flask import send_from_directory, abort
+    if variant not in image_worker.VARIANTS:
+        abort(404)
+    folder = os.path.join(current_app.config['UPLOAD_FOLDER'], image_worker.VARIANTS_DIR, variant)
+    response = send_from_directory(folder, filename)
+    return http_cache.cache_image(response, filename)
+
+
+# ============================================
+# APPLICATION SETUP
+# ============================================
+def create_app(config=None):
+    """
+    Build the app: its settings, services and routes.
+
+    Settings come from WASTE_* environment variables (settings.py),
+    then from `config`, which may override any of them, e.g.
+    {'TESTING': True} or another 'DB_CONFIG'. The services are built
+    from the result and kept in app.extensions:
+
+        db_pool          pooled MySQL connections
+        request_metrics  timings and counters for /metrics
+        blob_store, archive_store  image storage
+        image_processor  background thumbnails
+        duplicate_index, dashboard_stats  in-process caches
+        live_events      live dashboard event broker
+        write_journal    write-behind journal of submissions
+
+    Building the app opens no database connection and starts no
+    thread, so it can be created once and then forked: run the schema
+    migrations once before starting the workers (gunicorn.conf.py
+    does), and every worker process opens its own pooled
+    connections, journal flusher and image threads on first use.
+    """
+    app = Flask(__name__)
+    app.request_class = UploadRequest
+    app.config.update(
+        # Session and flash messages (set WASTE_SECRET_KEY in production)
+        SECRET_KEY=settings.get('SECRET_KEY', 'waste_management_secret_key_2024'),
+        UPLOAD_FOLDER=UPLOAD_FOLDER,
+        ARCHIVE_UPLOAD_FOLDER=ARCHIVE_UPLOAD_FOLDER,
+        JOURNAL_FOLDER=JOURNAL_FOLDER,
+        MAX_CONTENT_LENGTH=MAX_CONTENT_LENGTH,
+        DB_CONFIG=dict(DB_CONFIG),
+        # Connection pool settings (see db_pool.py)
+        DB_POOL_CONFIG={
+            'pool_size': settings.get_int('DB_POOL_SIZE', 5),         # Connections kept open while idle
+            'max_overflow': settings.get_int('DB_MAX_OVERFLOW', 10),  # Extra connections allowed during bursts
+            'timeout': 5.0,         # Seconds to wait for a free connection
+            'recycle': 1800,        # Reopen connections older than 30 minutes
+        },
+        # Queries / requests slower than these (milliseconds) are
+        # logged with their SQL; 0 = no log
+        SLOW_QUERY_MS=settings.get_int('SLOW_QUERY_MS', 200),
+        SLOW_REQUEST_MS=settings.get_int('SLOW_REQUEST_MS', 1000),
+        # Every open dashboard holds one server thread unless the app
+        # runs on gevent, so thread-based servers lower this per worker
+        MAX_LIVE_STREAMS=settings.get_int('MAX_LIVE_STREAMS', events.MAX_SUBSCRIBERS),
+        # Web form complaints are journaled and stored in MySQL in the
+        # background; the JSON API uses the journal only while MySQL is
+        # down. WASTE_WRITE_BEHIND=0 stores them before answering.
+        WRITE_BEHIND=settings.get_bool('WRITE_BEHIND', True),
+    )
+    if config:
+        app.config.update(config)
+
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    pool = ConnectionPool(app.config['DB_CONFIG'], **app.config['DB_POOL_CONFIG'])
+    app_metrics = metrics.AppMetrics(slow_query_ms=app.config['SLOW_QUERY_MS'],
+                                     slow_request_ms=app.config['SLOW_REQUEST_MS'])
+    processor = image_worker.ImageProcessor(app.config['UPLOAD_FOLDER'], workers=IMAGE_WORKERS)
+
+    @contextmanager
+    def app_db():
+        # For the background threads, which run outside any request
+        with app.app_context(), get_db() as connection:
+            yield connection
+
+    def store_in_app(records, files_dir):
+        with app.app_context():
+            store_journal_records(records, files_dir)
+
+    broker = events.EventBroker(max_subscribers=app.config['MAX_LIVE_STREAMS'],
+                                table=events.EventTable(app_db))
+    journal_writer = journal.WriteBehindJournal(app.config['JOURNAL_FOLDER'], sink=store_in_app,
+                                          is_outage=is_journal_outage)
+    app.extensions.update({
+        'db_pool': pool,
+        'request_metrics': app_metrics,
+        'blob_store': storage.BlobStore(app.config['UPLOAD_FOLDER'], max_bytes=MAX_IMAGE_BYTES),
+        'archive_store': storage.BlobStore(app.config['ARCHIVE_UPLOAD_FOLDER'], max_bytes=MAX_IMAGE_BYTES),
+        'image_processor': processor,
+        'duplicate_index': DuplicateIndex(radius_m=DUPLICATE_RADIUS_M, window_hours=DUPLICATE_WINDOW_HOURS),
+        'dashboard_stats': StatsCache(ttl=STATS_CACHE_TTL),
+        'live_events': broker,
+        'write_journal': journal_writer,
+    })
+
+    app_metrics.add_stats('db_pool', 'Database connection pool', pool.stats,
+                          counters=('checkouts', 'checkout_failures', 'reconnects', 'wait_time_total'))
+    app_metrics.add_stats('journal', 'Write-behind journal', journal_writer.stats,
+                          counters=('appended', 'flushed', 'fsyncs', 'flush_failures', 'dead_letters'))
+    app_metrics.add_stats('image_worker', 'Background image processing', processor.stats,
+                          counters=('queued', 'done', 'failed'))
+    app_metrics.add_stats('live_events', 'Live dashboard event broker', broker.stats,
+                          counters=('published', 'poll_errors'))
+    before_render_template.connect(_render_started, app)
+    template_rendered.connect(_render_finished, app)
+
+    app.register_blueprint(bp)
+    return app
 
 
 # ============================================
@@ -544,23 +2207,31 @@ def uploaded_file(filename):
 # ============================================
 if __name__ == '__main__':
     """
-    Run the Flask development server.
-    Debug mode is enabled for development (shows detailed errors).
+    Run the Flask development server (one process, auto-reload).
+    Debug mode is on unless WASTE_DEBUG=0 (shows detailed errors).
     Host '0.0.0.0' allows access from other devices on the network.
+    For production use the pre-forking server instead:
+        gunicorn -c gunicorn.conf.py wsgi:app
     """
-    print("=" * 50)
-    print("Web Based Smart Waste Management System")
-    print("for Municipal Services")
-    print("=" * 50)
-    
-    # Initialize database on startup
-    print("Initializing database...")
-    init_database()
+    debug = settings.get_bool('DEBUG', True)
+    app = create_app()
     
-    print("Server starting...")
-    print("User Page: http://localhost:5000/")
-    print("Admin Dashboard: http://localhost:5000/admin")
-    print("API Endpoint: http://localhost:5000/complaints")
-    print("=" * 50)
+    # The reloader runs this file again in a child process
+    # (WERKZEUG_RUN_MAIN set); the database is set up only once
+    if not os.environ.get('WERKZEUG_RUN_MAIN'):
+        print("=" * 50)
+        print("Web Based Smart Waste Management System")
+        print("for Municipal Services")
+        print("=" * 50)
+        
+        # Initialize database on startup
+        print("Initializing database...")
+        init_database()
+        
+        print("Server starting...")
+        print("User Page: http://localhost:5000/")
+        print("Admin Dashboard: http://localhost:5000/admin")
+        print("API Endpoint: http://localhost:5000/complaints")
+        print("=" * 50)
     
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    app.run(debug=debug, host='0.0.0.0', port=5000)
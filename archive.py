@@ -0,0 +1,282 @@
+"""
+============================================
+Archival of Resolved Complaints
+Web Based Smart Waste Management System
+============================================
+Complaints used to stay in the complaints table forever, so
+old Cleaned rows slowed every query and the dashboard.
+This job moves complaints that were cleaned more than
+ARCHIVE_AFTER_DAYS ago into complaints_archive:
+
+  - complaints_archive has the same columns (plus
+    archived_at), is compressed (ROW_FORMAT=COMPRESSED) and is
+    partitioned by year of created_at, so date-range queries
+    read only the years they need and a whole year can later
+    be removed instantly with ALTER TABLE ... DROP PARTITION.
+  - Rows move in small batches, each in its own short
+    transaction: copy to the archive, take them out of the map
+    cluster counts, delete. Only the rows of the batch are
+    locked (READ COMMITTED, no gap locks), so the web app keeps
+    writing while the job runs.
+  - Images are copied to cold storage (ARCHIVE_UPLOAD_FOLDER,
+    e.g. a cheaper disk) and removed from uploads/ once no
+    complaint in the hot table uses them. Their thumbnails are
+    deleted; JPEG / PNG files do not get smaller by compressing
+    them again.
+
+The daily analytics rollups are history and keep counting
+archived complaints (migrations.py --rebuild-analytics reads
+both tables). Archived complaints are read through
+/api/archive/complaints and their images through
+/archive/uploads/<image_path>.
+
+Command line (uses the settings from app.py), e.g. from cron:
+    python archive.py                     # archive in batches
+    python archive.py --days 365 --batch-size 200 --pause 0.5
+    python archive.py --dry-run           # only count
+============================================
+"""
+
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+import geo
+import http_cache
+import image_worker
+import storage
+
+# Complaints cleaned longer ago than this are archived
+ARCHIVE_AFTER_DAYS = 180
+
+# Complaints moved per transaction
+DEFAULT_BATCH_SIZE = 500
+
+# Seconds to sleep between batches, to leave room for the app
+DEFAULT_BATCH_PAUSE = 0.2
+
+# First year with its own partition (older rows share one partition)
+FIRST_PARTITION_YEAR = 2024
+
+# Columns copied from complaints (all except the spatial location)
+ARCHIVE_COLUMNS = (
+    'id', 'name', 'area', 'description', 'latitude', 'longitude', 'image_path',
+    'status', 'created_at', 'report_count', 'cleaned_at', 'idempotency_key',
+)
+
+# Columns a client may request from /api/archive/complaints
+ARCHIVE_FIELDS = ARCHIVE_COLUMNS[:-1] + ('archived_at',)
+
+# Complaints due for archiving. Complaints cleaned before cleaned_at
+# was recorded have none; their creation time is used instead.
+DUE_QUERY = """
+    SELECT id, image_path FROM complaints
+    WHERE status = 'Cleaned' AND cleaned_at < %s
+    ORDER BY cleaned_at, id
+    LIMIT %s
+    FOR UPDATE
+"""
+LEGACY_DUE_QUERY = """
+    SELECT id, image_path FROM complaints
+    WHERE status = 'Cleaned' AND cleaned_at IS NULL AND created_at < %s
+    ORDER BY id
+    LIMIT %s
+    FOR UPDATE
+"""
+
+
+# ============================================
+# TABLE AND PARTITIONS
+# ============================================
+
+def _partition_sql(year):
+    return f"PARTITION p{year} VALUES LESS THAN (UNIX_TIMESTAMP('{year + 1}-01-01 00:00:00'))"
+
+
+def create_table_sql(last_year):
+    """CREATE TABLE for complaints_archive with a partition per year up to `last_year`."""
+    partitions = [f"PARTITION p_old VALUES LESS THAN (UNIX_TIMESTAMP('{FIRST_PARTITION_YEAR}-01-01 00:00:00'))"]
+    partitions += [_partition_sql(year) for year in range(FIRST_PARTITION_YEAR, last_year + 1)]
+    partitions.append("PARTITION p_future VALUES LESS THAN MAXVALUE")
+    return f"""
+        CREATE TABLE IF NOT EXISTS complaints_archive (
+            id INT NOT NULL,
+            name VARCHAR(100) NOT NULL,
+            area VARCHAR(100) NOT NULL,
+            description TEXT,
+            latitude DECIMAL(10,7),
+            longitude DECIMAL(10,7),
+            image_path VARCHAR(255),
+            status VARCHAR(50),
+            created_at TIMESTAMP NOT NULL,
+            report_count INT NOT NULL DEFAULT 1,
+            cleaned_at TIMESTAMP NULL DEFAULT NULL,
+            idempotency_key VARCHAR(64) NULL,
+            archived_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (id, created_at),
+            INDEX idx_created (created_at),
+            INDEX idx_area_created (area, created_at)
+        )
+        ROW_FORMAT=COMPRESSED
+        PARTITION BY RANGE (UNIX_TIMESTAMP(created_at)) (
+            {', '.join(partitions)}
+        )
+    """
+
+
+def ensure_partitions(cursor, last_year):
+    """
+    Give every year up to `last_year` its own partition by splitting
+    p_future (instant while p_future is empty, which it normally is).
+    """
+    cursor.execute("""
+        SELECT PARTITION_NAME FROM information_schema.PARTITIONS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'complaints_archive'
+    """)
+    existing = {row[0] for row in cursor.fetchall()}
+    missing = [year for year in range(FIRST_PARTITION_YEAR, last_year + 1)
+               if f"p{year}" not in existing]
+    if missing:
+        print(f"   Adding archive partitions for {', '.join(map(str, missing))}")
+        cursor.execute(f"""
+            ALTER TABLE complaints_archive REORGANIZE PARTITION p_future INTO (
+                {', '.join(_partition_sql(year) for year in missing)},
+                PARTITION p_future VALUES LESS THAN MAXVALUE
+            )
+        """)
+
+
+# ============================================
+# MOVING COMPLAINTS
+# ============================================
+
+def archive_image(cursor, image_path, references, hot_store, cold_store):
+    """
+    Move `references` uses of an image from the hot table to the
+    archive, in the caller's transaction: the file is copied to
+    cold storage and, once no hot complaint uses it, removed from
+    uploads/ with its variants (while its image_blobs row is locked).
+    Paths that are not tracked in image_blobs are not touched.
+    """
+    released = [storage.release_reference(cursor, image_path) for _ in range(references)]
+    if released[0] is None:
+        # Not an upload this app stored: leave whatever file it names alone
+        print(f"Archive: image {image_path} is not a tracked upload, not copied")
+        return
+    try:
+        cold_store.publish_copy(hot_store.target(image_path), image_path)
+    except FileNotFoundError:
+        print(f"Archive: image {image_path} is missing")
+        return
+    except ValueError as err:
+        print(f"Archive: {err}, not copied")
+        return
+    if True in released:
+        hot_store.remove(image_path)
+        image_worker.remove_variants(hot_store.root, image_path)
+
+
+def archive_batch(connection, cutoff, batch_size, hot_store, cold_store):
+    """
+    Move up to `batch_size` complaints cleaned before `cutoff` into
+    complaints_archive in one transaction.
+    Returns the number of complaints archived (0 when done).
+    """
+    connection.start_transaction(isolation_level='READ COMMITTED')
+    cursor = connection.cursor()
+    try:
+        cursor.execute(DUE_QUERY, (cutoff, batch_size))
+        rows = cursor.fetchall()
+        if len(rows) < batch_size:
+            cursor.execute(LEGACY_DUE_QUERY, (cutoff, batch_size - len(rows)))
+            rows += cursor.fetchall()
+        if not rows:
+            connection.rollback()
+            return 0
+
+        ids = [row[0] for row in rows]
+        placeholders = ', '.join(['%s'] * len(ids))
+        columns = ', '.join(ARCHIVE_COLUMNS)
+        cursor.execute(f"INSERT INTO complaints_archive ({columns}) "
+                       f"SELECT {columns} FROM complaints WHERE id IN ({placeholders})", ids)
+        cursor.execute(geo.cluster_adjust_sql(f"c.id IN ({placeholders})", -1), ids)
+        cursor.execute(f"DELETE FROM complaints WHERE id IN ({placeholders})", ids)
+
+        for image_path, references in sorted(Counter(row[1] for row in rows if row[1]).items()):
+            archive_image(cursor, image_path, references, hot_store, cold_store)
+
+        http_cache.bump_data_version(cursor)
+        connection.commit()
+        return len(ids)
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def count_due(connection, cutoff):
+    """Number of complaints the job would archive now."""
+    cursor = connection.cursor()
+    cursor.execute("""
+        SELECT COUNT(*) FROM complaints
+        WHERE status = 'Cleaned'
+          AND (cleaned_at < %s OR (cleaned_at IS NULL AND created_at < %s))
+    """, (cutoff, cutoff))
+    count = cursor.fetchone()[0]
+    cursor.close()
+    connection.commit()
+    return count
+
+
+def run_archive(connection, hot_store, cold_store, days=ARCHIVE_AFTER_DAYS,
+                batch_size=DEFAULT_BATCH_SIZE, pause=DEFAULT_BATCH_PAUSE):
+    """
+    Archive every complaint cleaned more than `days` ago, one batch
+    at a time. Returns the total number archived.
+    """
+    cutoff = datetime.now() - timedelta(days=days)
+    cursor = connection.cursor()
+    ensure_partitions(cursor, datetime.now().year + 1)
+    cursor.close()
+    connection.commit()
+
+    total = 0
+    while True:
+        moved = archive_batch(connection, cutoff, batch_size, hot_store, cold_store)
+        if not moved:
+            break
+        total += moved
+        print(f"   ... archived {total} complaints")
+        if pause:
+            time.sleep(pause)
+    return total
+
+
+if __name__ == '__main__':
+    import argparse
+
+    import mysql.connector
+
+    parser = argparse.ArgumentParser(description='Move old cleaned complaints to the archive.')
+    parser.add_argument('--days', type=int, default=ARCHIVE_AFTER_DAYS,
+                        help='archive complaints cleaned more than this many days ago')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help='complaints moved per transaction')
+    parser.add_argument('--pause', type=float, default=DEFAULT_BATCH_PAUSE,
+                        help='seconds to sleep between batches')
+    parser.add_argument('--dry-run', action='store_true', help='only count what would be archived')
+    args = parser.parse_args()
+
+    from app import create_app
+
+    app = create_app()
+    connection = mysql.connector.connect(**app.config['DB_CONFIG'])
+    if args.dry_run:
+        cutoff = datetime.now() - timedelta(days=args.days)
+        print(f"{count_due(connection, cutoff)} complaints cleaned before {cutoff:%Y-%m-%d} would be archived")
+    else:
+        archived = run_archive(connection, app.extensions['blob_store'], app.extensions['archive_store'],
+                               args.days, args.batch_size, args.pause)
+        print(f"Archived {archived} complaints")
+    connection.close()
@@ -0,0 +1,62 @@
+"""
+============================================
+Route Planning Benchmark
+Web Based Smart Waste Management System
+============================================
+Times routing.plan_routes() on random stops spread over a
+city-sized area (about 20 x 20 km around Patna), for a range
+of stop counts, and prints solve time per phase and the total
+route length. No database is needed.
+
+    python bench/bench_routing.py
+    python bench/bench_routing.py --sizes 500,1000,4000 --vehicles 8
+============================================
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import routing  # noqa: E402
+
+DEPOT = (25.6093, 85.1376)
+SPREAD_DEG = 0.09  # About 10 km in each direction
+
+
+def random_stops(count, rng):
+    lats = DEPOT[0] + rng.uniform(-SPREAD_DEG, SPREAD_DEG, count)
+    lngs = DEPOT[1] + rng.uniform(-SPREAD_DEG, SPREAD_DEG, count)
+    return [{'id': index + 1, 'area': 'bench', 'latitude': lat, 'longitude': lng, 'report_count': 1}
+            for index, (lat, lng) in enumerate(zip(lats, lngs))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark route planning.')
+    parser.add_argument('--sizes', default='100,250,500,1000,2000,3000,4000',
+                        help='comma separated stop counts')
+    parser.add_argument('--vehicles', type=int, default=5)
+    parser.add_argument('--time-limit', type=float, default=routing.DEFAULT_TIME_LIMIT)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    print(f"{'stops':>6} {'matrix ms':>10} {'build ms':>9} {'2-opt ms':>9} {'total ms':>9} "
+          f"{'NN km':>8} {'final km':>9}")
+    for size in (int(value) for value in args.sizes.split(',')):
+        stops = random_stops(size, rng)
+        capacity = -(-size // args.vehicles)
+        # Length before 2-opt, for comparison
+        baseline = routing.plan_routes(stops, *DEPOT, args.vehicles, capacity, time_limit=0)
+        plan = routing.plan_routes(stops, *DEPOT, args.vehicles, capacity, args.time_limit)
+        timings = plan['timings_ms']
+        print(f"{size:>6} {timings['matrix']:>10.1f} {timings['construction']:>9.1f} "
+              f"{timings['two_opt']:>9.1f} {timings['total']:>9.1f} "
+              f"{baseline['total_distance_m'] / 1000:>8.1f} {plan['total_distance_m'] / 1000:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,423 @@
+"""
+============================================
+HTTP Load Test
+Web Based Smart Waste Management System
+============================================
+Drives a running instance of the app (seeded with
+bench/seed.py) with a number of concurrent clients, one
+endpoint at a time, and reports for each endpoint:
+
+    requests, errors, throughput (requests/s) and the
+    p50 / p95 / p99 / mean / max latency in milliseconds
+
+The results are written as JSON, so runs before and after a
+change can be compared: --baseline prints the difference to
+an earlier result file and exits with status 1 if any p95
+latency got more than --max-regression percent worse.
+
+Each client keeps one HTTP connection open (keep-alive) and
+sends its next request as soon as the previous answer has been
+read in full. Latency is measured by the client, so it includes
+the network and the server's queueing. Requests pick random
+areas, statuses, points and complaint IDs, so the server's
+caches see a realistic mix rather than one repeated URL.
+
+The write endpoints (submit_complaint, api_submit_complaint,
+update_status) change the data: only run them against a
+benchmark database.
+
+    python bench/load.py --url http://127.0.0.1:5000 --output before.json
+    python bench/load.py --concurrency 1,16 --duration 20 --endpoints complaints,search
+    python bench/load.py --output after.json --baseline before.json
+============================================
+"""
+
+import argparse
+import http.client
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime
+from urllib.parse import urlencode, urlsplit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from seed import AREAS, PLACES, PROBLEMS, png_bytes  # noqa: E402
+
+AREA_NAMES = list(AREAS)
+STATUSES = ('Pending', 'Cleaned')
+SEARCH_WORDS = ('garbage', 'dustbin', 'dead animal', 'hospital', 'market', 'drain',
+                '"bus stop"', 'plastic', 'smell', 'school')
+
+# Seconds a request may take before it counts as an error
+REQUEST_TIMEOUT = 30
+
+PERCENTILES = (50, 95, 99)
+
+
+# ============================================
+# REQUEST MIX PER ENDPOINT
+# ============================================
+# Each scenario returns (method, path, body, headers) for one request.
+
+def _point(rng):
+    lat, lng, _ = AREAS[rng.choice(AREA_NAMES)]
+    return round(rng.gauss(lat, 0.006), 6), round(rng.gauss(lng, 0.006), 6)
+
+
+def _get(path, params=None):
+    return 'GET', path + ('?' + urlencode(params) if params else ''), None, {}
+
+
+def _complaint(rng):
+    lat, lng = _point(rng)
+    return {
+        'name': 'Load Test',
+        'area': rng.choice(AREA_NAMES),
+        'description': f"{rng.choice(PROBLEMS)} {rng.choice(PLACES)}.",
+        'latitude': str(lat),
+        'longitude': str(lng),
+    }
+
+
+def _multipart(fields, image):
+    boundary = uuid.uuid4().hex
+    parts = [f'--{boundary}\r\nContent-Disposition: form-data; name="{key}"\r\n\r\n{value}\r\n'.encode()
+             for key, value in fields.items()]
+    if image:
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="image"; '
+                     f'filename="photo.png"\r\nContent-Type: image/png\r\n\r\n'.encode() + image + b'\r\n')
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return b''.join(parts), {'Content-Type': f'multipart/form-data; boundary={boundary}'}
+
+
+def index_page(rng, context):
+    return _get('/')
+
+
+def admin_page(rng, context):
+    params = {}
+    if rng.random() < 0.5:
+        params['status'] = rng.choice(STATUSES)
+    if rng.random() < 0.3:
+        params['area'] = rng.choice(AREA_NAMES)
+    return _get('/admin', params)
+
+
+def complaints_list(rng, context):
+    params = {'limit': 50}
+    if rng.random() < 0.5:
+        params['status'] = rng.choice(STATUSES)
+    if rng.random() < 0.5:
+        params['area'] = rng.choice(AREA_NAMES)
+    return _get('/complaints', params)
+
+
+def search(rng, context):
+    return _get('/api/search', {'q': rng.choice(SEARCH_WORDS), 'limit': 20})
+
+
+def near(rng, context):
+    lat, lng = _point(rng)
+    return _get('/api/complaints/near', {'lat': lat, 'lng': lng, 'radius': rng.choice((250, 500, 1000)),
+                                         'status': 'Pending'})
+
+
+def clusters(rng, context):
+    zoom = rng.randint(10, 16)
+    lat, lng = _point(rng)
+    half = 0.2 / 2 ** (zoom - 10)
+    return _get('/api/complaints/clusters', {'zoom': zoom, 'min_lat': lat - half, 'max_lat': lat + half,
+                                             'min_lng': lng - half, 'max_lng': lng + half})
+
+
+def stats(rng, context):
+    return _get('/api/stats')
+
+
+def analytics_daily(rng, context):
+    return _get('/api/analytics/daily', {'area': rng.choice(AREA_NAMES)})
+
+
+def submit_complaint(rng, context):
+    image = context['images'][rng.randrange(len(context['images']))] if rng.random() < 0.5 else None
+    body, headers = _multipart(_complaint(rng), image)
+    return 'POST', '/submit_complaint', body, headers
+
+
+def api_submit_complaint(rng, context):
+    body = json.dumps(_complaint(rng)).encode()
+    return 'POST', '/api/submit_complaint', body, {'Content-Type': 'application/json'}
+
+
+def update_status(rng, context):
+    body = json.dumps({'id': rng.randint(1, context['max_id']), 'status': rng.choice(STATUSES)}).encode()
+    return 'POST', '/update_status', body, {'Content-Type': 'application/json'}
+
+
+SCENARIOS = {
+    'index': index_page,
+    'admin': admin_page,
+    'complaints': complaints_list,
+    'search': search,
+    'near': near,
+    'clusters': clusters,
+    'stats': stats,
+    'analytics_daily': analytics_daily,
+    'submit_complaint': submit_complaint,
+    'api_submit_complaint': api_submit_complaint,
+    'update_status': update_status,
+}
+
+
+# ============================================
+# RUNNING THE LOAD
+# ============================================
+
+class Client:
+    """One keep-alive HTTP connection with the admin session cookie."""
+
+    def __init__(self, url, cookie):
+        parts = urlsplit(url)
+        connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self.connection = connection_class(parts.hostname, parts.port, timeout=REQUEST_TIMEOUT)
+        self.cookie = cookie
+
+    def request(self, method, path, body=None, headers=None):
+        """Send one request; returns (status, headers, body)."""
+        headers = dict(headers or {})
+        if self.cookie:
+            headers['Cookie'] = self.cookie
+        try:
+            self.connection.request(method, path, body, headers)
+            response = self.connection.getresponse()
+            return response.status, response.headers, response.read()
+        except (OSError, http.client.HTTPException):
+            self.connection.close()  # Reconnects on the next request
+            raise
+
+    def close(self):
+        self.connection.close()
+
+
+def login(url, username, password):
+    """Log in as admin; returns the session Cookie header value."""
+    client = Client(url, None)
+    body = urlencode({'username': username, 'password': password}).encode()
+    status, headers, _ = client.request('POST', '/login', body,
+                                        {'Content-Type': 'application/x-www-form-urlencoded'})
+    client.close()
+    cookies = [value.split(';', 1)[0] for value in headers.get_all('Set-Cookie') or []]
+    if status != 302 or not cookies:
+        raise SystemExit(f"Admin login failed (HTTP {status})")
+    return '; '.join(cookies)
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(endpoint, concurrency, elapsed, latencies, errors, status_codes):
+    latencies.sort()
+    result = {
+        'endpoint': endpoint,
+        'concurrency': concurrency,
+        'requests': len(latencies) + errors,
+        'errors': errors,
+        'seconds': round(elapsed, 3),
+        'throughput_rps': round(len(latencies) / elapsed, 2) if elapsed else 0,
+        'latency_ms': {f"p{p}": _ms(percentile(latencies, p)) for p in PERCENTILES},
+        'status_codes': dict(sorted(status_codes.items())),
+    }
+    result['latency_ms']['mean'] = _ms(sum(latencies) / len(latencies)) if latencies else None
+    result['latency_ms']['max'] = _ms(latencies[-1]) if latencies else None
+    return result
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 2) if seconds is not None else None
+
+
+def run_endpoint(url, cookie, endpoint, concurrency, duration, warmup, context, seed):
+    """
+    Run `concurrency` clients against one endpoint for `warmup` +
+    `duration` seconds; only requests finished in the measured part
+    are counted. Responses other than 2xx / 3xx count as errors.
+    """
+    scenario = SCENARIOS[endpoint]
+    lock = threading.Lock()
+    latencies = []
+    status_codes = {}
+    errors = [0]
+    started = time.monotonic()
+    measure_from = started + warmup
+    stop_at = measure_from + duration
+
+    def worker(number):
+        rng = random.Random(f"{seed}-{endpoint}-{number}")
+        client = Client(url, cookie)
+        own = []
+        own_codes = {}
+        own_errors = 0
+        while True:
+            method, path, body, headers = scenario(rng, context)
+            sent = time.monotonic()
+            if sent >= stop_at:
+                break
+            try:
+                status, _, _ = client.request(method, path, body, headers)
+            except (OSError, http.client.HTTPException):
+                status = None
+            done = time.monotonic()
+            if sent < measure_from or done > stop_at:
+                continue
+            code = str(status) if status else 'failed'
+            own_codes[code] = own_codes.get(code, 0) + 1
+            if status is None or status >= 400:
+                own_errors += 1
+            else:
+                own.append(done - sent)
+        client.close()
+        with lock:
+            latencies.extend(own)
+            errors[0] += own_errors
+            for code, count in own_codes.items():
+                status_codes[code] = status_codes.get(code, 0) + count
+
+    threads = [threading.Thread(target=worker, args=(number,)) for number in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(endpoint, concurrency, duration, latencies, errors[0], status_codes)
+
+
+def prepare_context(url, cookie):
+    """Facts about the dataset the scenarios need (largest complaint ID, images)."""
+    client = Client(url, cookie)
+    status, _, body = client.request('GET', '/complaints?limit=1&fields=id')
+    client.close()
+    if status != 200:
+        raise SystemExit(f"GET /complaints failed (HTTP {status}); is the app running and seeded?")
+    complaints = json.loads(body).get('data') or []
+    rng = random.Random(0)
+    return {
+        'max_id': complaints[0]['id'] if complaints else 1,
+        'images': [png_bytes(640, 480, [rng.randrange(256) for _ in range(3)]) for _ in range(8)],
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# ============================================
+# COMPARING RUNS
+# ============================================
+
+def compare(results, baseline, max_regression):
+    """
+    Print p95 latency and throughput against an earlier run.
+    Returns the (endpoint, concurrency) pairs whose p95 got more than
+    `max_regression` percent worse.
+    """
+    before = {(row['endpoint'], row['concurrency']): row for row in baseline['results']}
+    regressions = []
+    print(f"\n{'endpoint':<22} {'conc':>4} {'p95 before':>11} {'p95 now':>9} {'change':>8} "
+          f"{'rps before':>11} {'rps now':>9}")
+    for row in results:
+        key = (row['endpoint'], row['concurrency'])
+        old = before.get(key)
+        if not old or old['latency_ms']['p95'] is None or row['latency_ms']['p95'] is None:
+            continue
+        p95_old, p95_new = old['latency_ms']['p95'], row['latency_ms']['p95']
+        change = (p95_new - p95_old) / p95_old * 100 if p95_old else 0.0
+        flag = '  <-- slower' if change > max_regression else ''
+        if flag:
+            regressions.append(key)
+        print(f"{key[0]:<22} {key[1]:>4} {p95_old:>11.1f} {p95_new:>9.1f} {change:>+7.1f}% "
+              f"{old['throughput_rps']:>11.1f} {row['throughput_rps']:>9.1f}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the app endpoint by endpoint.')
+    parser.add_argument('--url', default='http://127.0.0.1:5000', help='base URL of the running app')
+    parser.add_argument('--endpoints', default=','.join(SCENARIOS),
+                        help=f"comma separated, from: {', '.join(SCENARIOS)}")
+    parser.add_argument('--concurrency', default='1,8,32', help='comma separated client counts')
+    parser.add_argument('--duration', type=float, default=10, help='measured seconds per endpoint')
+    parser.add_argument('--warmup', type=float, default=2, help='unmeasured seconds before each run')
+    parser.add_argument('--username', default='admin')
+    parser.add_argument('--password', default='admin123')
+    parser.add_argument('--output', help='write the JSON results to this file (default: stdout)')
+    parser.add_argument('--baseline', help='earlier JSON results to compare with')
+    parser.add_argument('--max-regression', type=float, default=20,
+                        help='percent of p95 slowdown that fails the comparison')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    endpoints = [name.strip() for name in args.endpoints.split(',') if name.strip()]
+    unknown = [name for name in endpoints if name not in SCENARIOS]
+    if unknown:
+        raise SystemExit(f"Unknown endpoints: {', '.join(unknown)}")
+    levels = [int(value) for value in args.concurrency.split(',')]
+
+    url = args.url.rstrip('/')
+    cookie = login(url, args.username, args.password)
+    context = prepare_context(url, cookie)
+
+    results = []
+    for endpoint in endpoints:
+        for concurrency in levels:
+            result = run_endpoint(url, cookie, endpoint, concurrency, args.duration, args.warmup,
+                                  context, args.seed)
+            results.append(result)
+            latency = result['latency_ms']
+            print(f"{endpoint:<22} c={concurrency:<3} {result['throughput_rps']:>8.1f} req/s  "
+                  f"p50 {latency['p50']} ms  p95 {latency['p95']} ms  p99 {latency['p99']} ms  "
+                  f"errors {result['errors']}", file=sys.stderr)
+
+    report = {
+        'meta': {
+            'url': url,
+            'started_at': datetime.now().isoformat(timespec='seconds'),
+            'git_commit': git_commit(),
+            'python': platform.python_version(),
+            'host': platform.node(),
+            'duration_s': args.duration,
+            'warmup_s': args.warmup,
+            'max_complaint_id': context['max_id'],
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file), args.max_regression)
+        if regressions:
+            raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,245 @@
+"""
+============================================
+Benchmark Dataset Seeder
+Web Based Smart Waste Management System
+============================================
+Fills a MySQL database with synthetic complaints for the load
+test (bench/load.py):
+
+  - coordinates scattered around the real Patna localities of
+    the report form, busy areas getting most complaints, and
+    about one complaint in ten without GPS
+  - descriptions built from common complaint phrases, so the
+    full-text search has realistic words to find
+  - creation dates over the last --days days; older complaints
+    are mostly Cleaned, with a cleaned_at some hours later
+  - a small pool of generated PNG images stored the way
+    uploads are (content-addressed, counted in image_blobs)
+    and shared by about a third of the complaints
+
+The schema is created with the normal migrations first, and
+the map clusters and analytics rollups are rebuilt at the end,
+so the app sees the same state as after real traffic. The
+spatial, FULLTEXT and ON DUPLICATE KEY queries need a real
+MySQL 8 server: use a local, throwaway database.
+
+    python bench/seed.py --rows 100000
+    python bench/seed.py --rows 1000000 --reset --database waste_bench
+============================================
+"""
+
+import argparse
+import hashlib
+import os
+import random
+import struct
+import sys
+import time
+import zlib
+from datetime import datetime, timedelta
+
+import mysql.connector
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import http_cache  # noqa: E402
+import migrations  # noqa: E402
+import storage  # noqa: E402
+
+# Locality centres (lat, lng) and relative complaint volume
+AREAS = {
+    'Patna Junction': (25.6022, 85.1376, 10),
+    'Gandhi Maidan': (25.6196, 85.1446, 8),
+    'Kankarbagh': (25.5941, 85.1642, 9),
+    'Boring Road': (25.6167, 85.1103, 7),
+    'Fraser Road': (25.6113, 85.1378, 6),
+    'Exhibition Road': (25.6094, 85.1399, 5),
+    'Ashok Rajpath': (25.6201, 85.1650, 6),
+    'Bailey Road': (25.6094, 85.0900, 5),
+    'Danapur': (25.6280, 85.0470, 4),
+    'Patliputra Colony': (25.6236, 85.1000, 4),
+    'Rajendra Nagar': (25.6040, 85.1600, 5),
+    'Kadamkuan': (25.6080, 85.1520, 4),
+    'Bankipur': (25.6180, 85.1400, 3),
+    'Anisabad': (25.5880, 85.1020, 3),
+    'Phulwari Sharif': (25.5760, 85.0800, 3),
+    'Digha': (25.6440, 85.0850, 2),
+    'Khagaul': (25.5790, 85.0440, 2),
+    'Sampatchak': (25.5650, 85.1900, 1),
+}
+
+# Spread of complaints around a locality centre (about 600 m)
+AREA_SPREAD_DEG = 0.006
+
+PROBLEMS = (
+    'Garbage pile', 'Overflowing dustbin', 'Plastic waste dumped', 'Dead animal',
+    'Construction debris', 'Blocked drain full of waste', 'Burning garbage',
+    'Rotting vegetables', 'Medical waste', 'Household waste thrown',
+)
+PLACES = (
+    'near the school gate', 'behind the market', 'next to the hospital',
+    'at the bus stop', 'outside the temple', 'near the railway crossing',
+    'on the main road', 'in the park', 'beside the water tank', 'near the petrol pump',
+)
+DETAILS = (
+    '', 'Bad smell all day.', 'Stray dogs spreading it on the road.',
+    'Not collected for a week.', 'Blocking the footpath.', 'Mosquitoes breeding.',
+)
+NAMES = ('Aman', 'Priya', 'Rahul', 'Sneha', 'Vikash', 'Anjali', 'Rohit', 'Pooja', 'Suresh', 'Neha')
+
+# Distinct images shared by the seeded complaints
+IMAGE_COUNT = 50
+IMAGE_SHARE = 0.35
+
+INSERT_SQL = """
+    INSERT INTO complaints
+        (name, area, description, latitude, longitude, location,
+         image_path, status, created_at, report_count, cleaned_at)
+    VALUES
+"""
+ROW_SQL = "(%s, %s, %s, %s, %s, ST_PointFromText(%s, 4326, 'axis-order=lat-long'), %s, %s, %s, %s, %s)"
+
+
+def png_bytes(width, height, colour):
+    """A valid solid-colour RGB PNG, without needing Pillow."""
+    def chunk(kind, data):
+        return (struct.pack('>I', len(data)) + kind + data
+                + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff))
+    row = b'\x00' + bytes(colour) * width
+    return (b'\x89PNG\r\n\x1a\n'
+            + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(row * height, 6))
+            + chunk(b'IEND', b''))
+
+
+def write_images(upload_folder, rng):
+    """Store IMAGE_COUNT distinct images; returns their image paths."""
+    paths = []
+    for _ in range(IMAGE_COUNT):
+        data = png_bytes(320, 240, [rng.randrange(256) for _ in range(3)])
+        path = storage.blob_path(hashlib.sha256(data).hexdigest(), 'png')
+        target = os.path.join(upload_folder, path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'wb') as file:
+            file.write(data)
+        paths.append(path)
+    return paths
+
+
+def random_complaint(rng, now, days, images, names, weights):
+    area = rng.choices(names, weights)[0]
+    lat, lng, _ = AREAS[area]
+    if rng.random() < 0.1:
+        latitude = longitude = None
+        point = migrations.NO_LOCATION_WKT
+    else:
+        latitude = round(rng.gauss(lat, AREA_SPREAD_DEG), 7)
+        longitude = round(rng.gauss(lng, AREA_SPREAD_DEG), 7)
+        point = f"POINT({latitude} {longitude})"
+
+    age = timedelta(seconds=rng.uniform(0, days * 86400))
+    created_at = now - age
+    # Recent complaints are mostly still pending
+    cleaned_at = None
+    status = 'Pending'
+    if rng.random() < min(0.9, age.days / 14 + 0.1):
+        cleaned_at = min(now, created_at + timedelta(hours=rng.expovariate(1 / 30)))
+        status = 'Cleaned'
+
+    description = f"{rng.choice(PROBLEMS)} {rng.choice(PLACES)}. {rng.choice(DETAILS)}".strip()
+    image_path = rng.choice(images) if images and rng.random() < IMAGE_SHARE else None
+    report_count = 1 if rng.random() < 0.8 else rng.randint(2, 6)
+    return (rng.choice(NAMES), area, description, latitude, longitude, point,
+            image_path, status, created_at.replace(microsecond=0), report_count,
+            cleaned_at.replace(microsecond=0) if cleaned_at else None)
+
+
+def reset_data(connection):
+    """Empty the complaint tables the seeder fills."""
+    cursor = connection.cursor()
+    for table in ('complaints', 'complaints_archive', 'image_blobs', 'complaint_clusters',
+                  'complaint_daily_stats', 'cleaning_daily_stats'):
+        cursor.execute(f"TRUNCATE TABLE {table}")
+    cursor.close()
+
+
+def insert_complaints(connection, rows, batch_size, rng, days, images):
+    names = list(AREAS)
+    weights = [AREAS[name][2] for name in names]
+    now = datetime.now()
+    cursor = connection.cursor()
+    started = time.monotonic()
+    inserted = 0
+    while inserted < rows:
+        count = min(batch_size, rows - inserted)
+        values = []
+        for _ in range(count):
+            values.extend(random_complaint(rng, now, days, images, names, weights))
+        cursor.execute(INSERT_SQL + ', '.join([ROW_SQL] * count), values)
+        connection.commit()
+        inserted += count
+        rate = inserted / max(time.monotonic() - started, 1e-9)
+        print(f"   ... {inserted} / {rows} complaints ({rate:.0f} rows/s)")
+    cursor.close()
+
+
+def count_images(connection):
+    """Set the image_blobs reference counts from the complaints table."""
+    cursor = connection.cursor()
+    cursor.execute("""
+        INSERT INTO image_blobs (path, ref_count)
+        SELECT image_path, COUNT(*) FROM complaints
+        WHERE image_path IS NOT NULL AND image_path <> ''
+        GROUP BY image_path
+        ON DUPLICATE KEY UPDATE ref_count = VALUES(ref_count)
+    """)
+    http_cache.bump_data_version(cursor)
+    connection.commit()
+    cursor.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Seed a database with synthetic complaints.')
+    parser.add_argument('--rows', type=int, default=100000, help='complaints to insert')
+    parser.add_argument('--days', type=int, default=365, help='spread creation dates over this many days')
+    parser.add_argument('--database', help='database name (default: WASTE_DB_NAME or the one in app.py)')
+    parser.add_argument('--reset', action='store_true',
+                        help='empty the complaint tables first (destroys their data)')
+    parser.add_argument('--batch-size', type=int, default=2000, help='rows per INSERT')
+    parser.add_argument('--no-images', action='store_true', help='seed complaints without images')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    from app import DB_CONFIG, UPLOAD_FOLDER
+
+    db_config = dict(DB_CONFIG)
+    if args.database:
+        db_config['database'] = args.database
+    rng = random.Random(args.seed)
+
+    if not migrations.run_migrations(db_config):
+        raise SystemExit("Migrations failed")
+    connection = mysql.connector.connect(**db_config)
+    if args.reset:
+        print(f"Emptying complaint tables in {db_config['database']}")
+        reset_data(connection)
+
+    images = []
+    if not args.no_images:
+        upload_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', UPLOAD_FOLDER)
+        images = write_images(upload_folder, rng)
+        print(f"Wrote {len(images)} images to {UPLOAD_FOLDER}/")
+
+    print(f"Inserting {args.rows} complaints into {db_config['database']}")
+    insert_complaints(connection, args.rows, args.batch_size, rng, args.days, images)
+    count_images(connection)
+
+    print("Rebuilding map clusters and analytics rollups")
+    migrations.rebuild_clusters(connection, pause=0)
+    migrations.rebuild_analytics(connection, pause=0)
+    connection.close()
+    print("Done")
+
+
+if __name__ == '__main__':
+    main()
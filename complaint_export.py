@@ -0,0 +1,103 @@
+"""
+============================================
+Streaming Complaint Export
+Web Based Smart Waste Management System
+============================================
+Generators used by the /complaints/export route to send
+the complaints table as NDJSON or CSV without loading it
+into memory.
+
+Rows are read from an unbuffered (server-side) cursor in
+fetchmany() batches, encoded batch by batch and optionally
+gzip-compressed on the fly, so memory use depends on the
+batch size only - not on the size of the table.
+============================================
+"""
+
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from decimal import Decimal
+
+from mysql.connector import errors
+
+from complaint_queries import DATETIME_FORMAT
+
+# Rows fetched from MySQL per round trip
+EXPORT_BATCH_SIZE = 1000
+
+# Supported formats: name -> (mimetype, file extension)
+EXPORT_FORMATS = {
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'csv': ('text/csv', 'csv'),
+}
+
+
+def _plain(value):
+    """Convert MySQL values to plain JSON/CSV friendly values."""
+    if isinstance(value, datetime):
+        return value.strftime(DATETIME_FORMAT)
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def iter_batches(connection, query, params, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Execute the query on an unbuffered cursor and yield lists of
+    row tuples. If the consumer stops early (client disconnected)
+    the rest of the result is left unread: close this generator
+    while the connection is still borrowed, then cancel the query
+    and discard the connection (see the export route) instead of
+    returning it to the pool, whose rollback would read millions
+    of remaining rows first.
+    """
+    cursor = connection.cursor(buffered=False)
+    try:
+        cursor.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        try:
+            cursor.close()
+        except errors.Error:
+            pass
+
+
+def ndjson_chunks(fields, batches):
+    """Encode row batches as newline-delimited JSON."""
+    for rows in batches:
+        lines = [
+            json.dumps({name: _plain(value) for name, value in zip(fields, row)})
+            for row in rows
+        ]
+        yield ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+def csv_chunks(fields, batches):
+    """Encode row batches as CSV, starting with a header row."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    yield buffer.getvalue().encode('utf-8')
+
+    for rows in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([_plain(value) for value in row] for row in rows)
+        yield buffer.getvalue().encode('utf-8')
+
+
+def gzip_chunks(chunks, level=6):
+    """Compress a stream of byte chunks into one gzip stream."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # 31 = gzip header
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,305 @@
+"""
+============================================
+Complaint Query Helpers
+Web Based Smart Waste Management System
+============================================
+Shared helpers for building SELECT queries over the
+complaints table from request parameters:
+
+  - Filters     : status, area, date_from, date_to
+  - Projection  : fields=id,area,status,...
+  - Pagination  : keyset (created_at, id) with an opaque cursor
+  - Sorting     : newest or oldest first (admin dashboard)
+
+Keyset pagination reads "the next N rows after this one"
+instead of using OFFSET, so every page costs the same no
+matter how deep the client has scrolled.
+============================================
+"""
+
+import base64
+import json
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+
+import storage
+
+# Columns a client is allowed to request with ?fields=
+COMPLAINT_FIELDS = (
+    'id', 'name', 'area', 'description', 'latitude', 'longitude',
+    'image_path', 'status', 'created_at', 'report_count', 'cleaned_at',
+)
+
+# Columns every page needs to build the next cursor
+CURSOR_FIELDS = ('id', 'created_at')
+
+# Page size limits for list endpoints
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Columns shown on the admin dashboard (everything except the binary location)
+DASHBOARD_FIELDS = COMPLAINT_FIELDS
+
+# Sort orders for list pages: name -> ORDER BY. Both walk the
+# (created_at, id) keyset, so the same cursor format serves both.
+SORT_ORDERS = {
+    'newest': "created_at DESC, id DESC",
+    'oldest': "created_at ASC, id ASC",
+}
+DEFAULT_SORT = 'newest'
+
+# Insert used by every submission route. The location POINT is built
+# from "POINT(lat lng)" text; complaints without GPS get POINT(0 0)
+# and keep NULL latitude / longitude (see migrations.py).
+INSERT_COMPLAINT_SQL = """
+    INSERT INTO complaints
+        (name, area, description, latitude, longitude, location, image_path, status, idempotency_key)
+    VALUES (%s, %s, %s, %s, %s, ST_PointFromText(%s, 4326, 'axis-order=lat-long'), %s, 'Pending', %s)
+"""
+
+# Longest accepted values (match the column sizes)
+MAX_NAME_LENGTH = 100
+MAX_AREA_LENGTH = 100
+MAX_IDEMPOTENCY_KEY_LENGTH = 64
+MAX_DESCRIPTION_BYTES = 65535  # TEXT
+MAX_IMAGE_PATH_LENGTH = 255
+
+UNKNOWN_IMAGE_MESSAGE = "image_path must be the path of an uploaded image"
+
+
+def validate_complaint(item):
+    """
+    Check one submitted complaint (a dict).
+    Returns an error message, or None if it is valid.
+    """
+    if not isinstance(item, dict):
+        return "Each complaint must be a JSON object"
+    name = item.get('name')
+    area = item.get('area')
+    if not name or not isinstance(name, str):
+        return "name is required"
+    if not area or not isinstance(area, str):
+        return "area is required"
+    if len(name) > MAX_NAME_LENGTH:
+        return f"name must be at most {MAX_NAME_LENGTH} characters"
+    if len(area) > MAX_AREA_LENGTH:
+        return f"area must be at most {MAX_AREA_LENGTH} characters"
+    description = item.get('description')
+    if description is not None and not isinstance(description, str):
+        return "description must be text"
+    if description and len(description.encode('utf-8')) > MAX_DESCRIPTION_BYTES:
+        return f"description must be at most {MAX_DESCRIPTION_BYTES} bytes"
+    key = item.get('idempotency_key')
+    if key is not None and (not isinstance(key, str) or not 0 < len(key) <= MAX_IDEMPOTENCY_KEY_LENGTH):
+        return f"idempotency_key must be a string of 1-{MAX_IDEMPOTENCY_KEY_LENGTH} characters"
+    image_path = item.get('image_path')
+    if image_path and not storage.is_stored_path(image_path):
+        return UNKNOWN_IMAGE_MESSAGE
+    if image_path and len(image_path) > MAX_IMAGE_PATH_LENGTH:
+        return f"image_path must be at most {MAX_IMAGE_PATH_LENGTH} characters"
+    return None
+
+
+def parse_coordinate(value, limit):
+    """
+    Convert a latitude / longitude from the form or JSON into a
+    Decimal, or None if it is missing or not a valid coordinate.
+    """
+    if value is None or str(value).strip() == '':
+        return None
+    try:
+        number = Decimal(str(value).strip())
+    except InvalidOperation:
+        return None
+    if not number.is_finite() or abs(number) > limit:
+        return None
+    return number.quantize(Decimal('0.0000001'))
+
+
+def insert_params(name, area, description, latitude, longitude, image_path, idempotency_key=None):
+    """
+    Build the parameters for INSERT_COMPLAINT_SQL, validating the
+    coordinates on the way.
+    """
+    lat = parse_coordinate(latitude, 90)
+    lng = parse_coordinate(longitude, 180)
+    if lat is None or lng is None:
+        lat = lng = None
+        point = 'POINT(0 0)'
+    else:
+        point = f"POINT({lat} {lng})"
+    return (name, area, description, lat, lng, point, image_path, idempotency_key)
+
+
+def parse_fields(value, allowed=COMPLAINT_FIELDS):
+    """
+    Parse the ?fields= projection into a list of column names
+    (from `allowed`). Unknown names raise ValueError. The cursor
+    columns are always included so the next page can be requested.
+    """
+    if not value:
+        return list(allowed)
+
+    fields = []
+    for name in value.split(','):
+        name = name.strip()
+        if not name:
+            continue
+        if name not in allowed:
+            raise ValueError(f"Unknown field: {name}")
+        if name not in fields:
+            fields.append(name)
+
+    for name in CURSOR_FIELDS:
+        if name not in fields:
+            fields.append(name)
+    return fields
+
+
+def parse_limit(value, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """Parse ?limit= and clamp it to 1..maximum."""
+    if value in (None, ''):
+        return default
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ValueError("limit must be an integer")
+    return max(1, min(limit, maximum))
+
+
+def parse_id_list(value, maximum):
+    """Parse a comma separated ?ids= list into unique integer IDs."""
+    try:
+        ids = sorted({int(part) for part in (value or '').split(',') if part.strip()})
+    except ValueError:
+        raise ValueError("ids must be integers")
+    if len(ids) > maximum:
+        raise ValueError(f"At most {maximum} ids")
+    return ids
+
+
+def parse_sort(value):
+    """Parse ?sort= (newest / oldest)."""
+    if not value:
+        return DEFAULT_SORT
+    if value not in SORT_ORDERS:
+        raise ValueError(f"sort must be one of: {', '.join(SORT_ORDERS)}")
+    return value
+
+
+def _parse_date(value, name):
+    """Accept 'YYYY-MM-DD' or 'YYYY-MM-DD HH:MM:SS'."""
+    for fmt in (DATETIME_FORMAT, '%Y-%m-%d'):
+        try:
+            return datetime.strptime(value, fmt), fmt
+        except ValueError:
+            pass
+    raise ValueError(f"{name} must be YYYY-MM-DD or YYYY-MM-DD HH:MM:SS")
+
+
+def parse_filters(args):
+    """
+    Build WHERE conditions from request arguments.
+
+    Supported arguments:
+      status    : one status or a comma separated list
+      area      : exact area name
+      date_from : created_at >= date_from
+      date_to   : created_at <= date_to (a plain date includes the whole day)
+
+    Returns (conditions, params) ready to be joined with AND.
+    """
+    conditions = []
+    params = []
+
+    status = args.get('status')
+    if status:
+        statuses = [s.strip() for s in status.split(',') if s.strip()]
+        placeholders = ', '.join(['%s'] * len(statuses))
+        conditions.append(f"status IN ({placeholders})")
+        params.extend(statuses)
+
+    area = args.get('area')
+    if area:
+        conditions.append("area = %s")
+        params.append(area)
+
+    date_from = args.get('date_from')
+    if date_from:
+        start, _ = _parse_date(date_from, 'date_from')
+        conditions.append("created_at >= %s")
+        params.append(start)
+
+    date_to = args.get('date_to')
+    if date_to:
+        end, fmt = _parse_date(date_to, 'date_to')
+        if fmt == '%Y-%m-%d':
+            # A plain date means "up to the end of that day"
+            conditions.append("created_at < %s")
+            params.append(end + timedelta(days=1))
+        else:
+            conditions.append("created_at <= %s")
+            params.append(end)
+
+    return conditions, params
+
+
+def encode_cursor(row):
+    """Turn the last row of a page into an opaque next_cursor token."""
+    created_at = row['created_at']
+    if isinstance(created_at, datetime):
+        created_at = created_at.strftime(DATETIME_FORMAT)
+    raw = json.dumps([created_at, row['id']]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    """Decode a next_cursor token back to (created_at, id)."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        created_at, complaint_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.strptime(created_at, DATETIME_FORMAT), int(complaint_id)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+
+def keyset_condition(cursor_token, sort=DEFAULT_SORT):
+    """
+    WHERE condition selecting rows after the cursor, for the
+    ordering SORT_ORDERS[sort] (by default created_at DESC, id DESC).
+    """
+    created_at, complaint_id = decode_cursor(cursor_token)
+    op = '>' if sort == 'oldest' else '<'
+    condition = f"(created_at {op} %s OR (created_at = %s AND id {op} %s))"
+    return condition, [created_at, created_at, complaint_id]
+
+
+def build_select_query(fields, conditions, table='complaints', sort=DEFAULT_SORT):
+    """Build a SELECT over the given columns, newest first by default."""
+    columns = ', '.join(fields)
+    query = f"SELECT {columns} FROM {table}"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    return query + " ORDER BY " + SORT_ORDERS[sort]
+
+
+def build_page_query(fields, conditions, params, limit, table='complaints', sort=DEFAULT_SORT):
+    """
+    Build the SELECT for one page, newest first by default.
+    One extra row is fetched to know whether another page exists.
+    """
+    query = build_select_query(fields, conditions, table, sort) + " LIMIT %s"
+    return query, list(params) + [limit + 1]
+
+
+def serialize_complaint(row):
+    """Convert one database row to JSON-friendly values."""
+    for key in ('created_at', 'cleaned_at', 'archived_at'):
+        if isinstance(row.get(key), datetime):
+            row[key] = row[key].strftime(DATETIME_FORMAT)
+    for key in ('latitude', 'longitude'):
+        if isinstance(row.get(key), Decimal):
+            row[key] = str(row[key])
+    return row
@@ -0,0 +1,289 @@
+"""
+============================================
+MySQL Connection Pool
+Web Based Smart Waste Management System
+============================================
+Opening a new MySQL connection costs a TCP handshake plus
+authentication, which is often slower than the query itself.
+This module keeps a small set of open connections and lends
+them to routes for the duration of one request.
+
+Features:
+  - pool_size     : connections kept open while idle
+  - max_overflow  : extra connections opened during bursts
+                    (closed again when they are returned)
+  - timeout       : seconds to wait for a free connection
+  - recycle       : connections older than this are reopened
+  - health check  : every borrowed connection is pinged and
+                    reconnected if the server dropped it
+  - stats()       : in-use, idle, wait time, checkout failures
+  - fork safety   : a process forked from the pool's process
+                    (a pre-forking server's worker) starts with
+                    no connections and opens its own
+
+Usage:
+    pool = ConnectionPool(DB_CONFIG, pool_size=5)
+    with pool.connection() as connection:
+        cursor = connection.cursor()
+        ...
+============================================
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import mysql.connector
+from mysql.connector import errors
+
+
+class PoolError(errors.PoolError):
+    """
+    Raised when no connection could be borrowed from the pool,
+    either because the checkout timed out or MySQL is unreachable.
+    Subclasses mysql.connector's PoolError so existing
+    `except mysql.connector.Error` handlers still catch it.
+    """
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of mysql.connector connections.
+    Idle connections are reused newest-first so that rarely
+    used ones age out through `recycle`.
+    """
+
+    def __init__(self, db_config, pool_size=5, max_overflow=10, timeout=5.0,
+                 recycle=1800, connect_retries=2, retry_delay=0.2):
+        self.db_config = dict(db_config)
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.recycle = recycle
+        self.connect_retries = connect_retries
+        self.retry_delay = retry_delay
+
+        # Idle connections are stored as (connection, opened_at)
+        self._idle = deque()
+        self._cond = threading.Condition()
+        self._open = 0       # Connections currently open (idle + in use)
+        self._in_use = 0     # Connections currently lent out
+        self._waiting = 0    # Threads blocked waiting for a connection
+
+        # Counters reported by stats()
+        self._checkouts = 0
+        self._checkout_failures = 0
+        self._reconnects = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+        # Connections inherited from the parent process (see _after_fork)
+        self._inherited = []
+        if hasattr(os, 'register_at_fork'):  # Not on Windows
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        """
+        Runs in a forked child before anything else. The idle
+        connections share their sockets with the parent, so the child
+        must never use or close them (closing shuts the socket down
+        for the parent too). They are kept referenced so they are not
+        garbage collected, and the child starts with an empty pool.
+        """
+        self._inherited.extend(connection for connection, _ in self._idle)
+        self._idle = deque()
+        self._cond = threading.Condition()
+        self._open = self._in_use = self._waiting = 0
+        self._checkouts = self._checkout_failures = self._reconnects = 0
+        self._wait_total = self._wait_max = 0.0
+
+    # ----------------------------------------
+    # Opening and checking connections
+    # ----------------------------------------
+    def _connect(self):
+        """
+        Open a new connection, retrying a few times with a short
+        back-off so that a brief MySQL restart does not fail requests.
+        """
+        last_error = None
+        for attempt in range(self.connect_retries + 1):
+            try:
+                return mysql.connector.connect(**self.db_config), time.monotonic()
+            except errors.Error as err:
+                last_error = err
+                if attempt < self.connect_retries:
+                    time.sleep(self.retry_delay * (2 ** attempt))
+        raise PoolError(f"Could not connect to MySQL: {last_error}") from last_error
+
+    def _ensure_healthy(self, connection, opened_at):
+        """
+        Health check on borrow: recycle old connections and ping the
+        rest, reconnecting if the server closed the connection.
+        """
+        if self.recycle and time.monotonic() - opened_at > self.recycle:
+            self._close_quietly(connection)
+            return self._connect()
+        try:
+            connection.ping(reconnect=True, attempts=self.connect_retries + 1,
+                            delay=self.retry_delay)
+        except errors.Error:
+            self._close_quietly(connection)
+            with self._cond:
+                self._reconnects += 1
+            return self._connect()
+        return connection, opened_at
+
+    @staticmethod
+    def _close_quietly(connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    # ----------------------------------------
+    # Borrow / return
+    # ----------------------------------------
+    def acquire(self):
+        """
+        Borrow a connection, waiting up to `timeout` seconds.
+        Returns (connection, opened_at); pass both back to release().
+        """
+        started = time.monotonic()
+        deadline = started + self.timeout
+        entry = None
+
+        with self._cond:
+            self._waiting += 1
+            try:
+                while True:
+                    if self._idle:
+                        entry = self._idle.pop()
+                        break
+                    if self._open < self.pool_size + self.max_overflow:
+                        # Reserve a slot; the connection is opened outside the lock
+                        self._open += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._checkout_failures += 1
+                        raise PoolError(
+                            f"Timed out after {self.timeout}s waiting for a database connection"
+                        )
+                    self._cond.wait(remaining)
+                self._in_use += 1
+            finally:
+                self._waiting -= 1
+
+        try:
+            if entry is None:
+                entry = self._connect()
+            else:
+                entry = self._ensure_healthy(*entry)
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._in_use -= 1
+                self._checkout_failures += 1
+                self._cond.notify()
+            raise
+
+        waited = time.monotonic() - started
+        with self._cond:
+            self._checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        return entry
+
+    def release(self, connection, opened_at, discard=False):
+        """
+        Return a borrowed connection. Any open transaction is rolled
+        back so the next borrower does not see a stale snapshot.
+        Overflow connections and broken connections are closed.
+        """
+        if not discard:
+            try:
+                connection.rollback()
+            except errors.Error:
+                discard = True
+
+        with self._cond:
+            self._in_use -= 1
+            if discard or len(self._idle) >= self.pool_size:
+                self._open -= 1
+                keep = False
+            else:
+                self._idle.append((connection, opened_at))
+                keep = True
+            self._cond.notify()
+
+        if not keep:
+            self._close_quietly(connection)
+
+    def cancel_query(self, connection):
+        """
+        Stop the statement running on a borrowed connection, from
+        another connection (KILL QUERY). Used before discarding a
+        connection whose unbuffered result will not be read: closing
+        it would otherwise read the rest of the result first.
+        """
+        try:
+            thread_id = connection.connection_id
+            with self.connection() as other:
+                cursor = other.cursor()
+                cursor.execute("KILL QUERY %s", (int(thread_id),))
+                cursor.close()
+        except (PoolError, errors.Error, TypeError) as err:
+            print(f"Could not cancel query: {err}")
+
+    @contextmanager
+    def connection(self):
+        """
+        Context manager used by the routes:
+
+            with pool.connection() as connection:
+                ...
+
+        The connection always goes back to the pool, even if the
+        block raises. It is discarded if MySQL reported it broken.
+        """
+        connection, opened_at = self.acquire()
+        discard = False
+        try:
+            yield connection
+        except (errors.OperationalError, errors.InterfaceError):
+            discard = True
+            raise
+        finally:
+            self.release(connection, opened_at, discard=discard)
+
+    def close_all(self):
+        """Close every idle connection (used on shutdown)."""
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._open -= len(idle)
+        for connection, _ in idle:
+            self._close_quietly(connection)
+
+    # ----------------------------------------
+    # Statistics
+    # ----------------------------------------
+    def stats(self):
+        """Return a snapshot of pool usage for monitoring."""
+        with self._cond:
+            return {
+                'pool_size': self.pool_size,
+                'max_overflow': self.max_overflow,
+                'open': self._open,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'waiting': self._waiting,
+                'checkouts': self._checkouts,
+                'checkout_failures': self._checkout_failures,
+                'reconnects': self._reconnects,
+                'wait_time_total': round(self._wait_total, 6),
+                'wait_time_max': round(self._wait_max, 6),
+                'wait_time_avg': round(self._wait_total / self._checkouts, 6) if self._checkouts else 0.0,
+            }
@@ -0,0 +1,150 @@
+"""
+============================================
+Duplicate Report Index
+Web Based Smart Waste Management System
+============================================
+When one garbage pile is visible from a busy road, many
+citizens report it within a short time. Before inserting a
+new complaint the app asks this index: "is there an open
+complaint within RADIUS metres reported in the last WINDOW
+hours?" If so, the new report is merged into that complaint
+(its report_count goes up) instead of creating a new row.
+
+The index is an in-memory grid: open complaints are bucketed
+into square cells about `radius_m` wide, so a lookup checks
+only the few cells around the point instead of scanning the
+table. It is loaded from MySQL on first use, kept in sync by
+the write routes, and topped up every `refresh_interval`
+seconds with complaints inserted by other worker processes.
+============================================
+"""
+
+import math
+import threading
+import time
+from datetime import datetime, timedelta
+
+import geo
+
+METRES_PER_DEGREE = 111320.0
+
+
+class DuplicateIndex:
+    """Grid index of recent open complaints with GPS coordinates."""
+
+    def __init__(self, radius_m=50, window_hours=24, refresh_interval=60):
+        self.radius_m = radius_m
+        self.window = timedelta(hours=window_hours)
+        self.refresh_interval = refresh_interval
+        self._cell_deg = radius_m / METRES_PER_DEGREE  # Cell height in degrees
+        self._lock = threading.Lock()
+        self._entries = {}   # id -> (lat, lng, created_at, cell)
+        self._cells = {}     # cell -> set of ids
+        self._loaded_until = None   # created_at of the newest loaded row
+        self._next_refresh = 0.0
+
+    # ----------------------------------------
+    # Grid helpers
+    # ----------------------------------------
+    def _cell(self, lat, lng):
+        return (math.floor(lat / self._cell_deg), math.floor(lng / self._cell_deg))
+
+    def _nearby_cells(self, lat, lng):
+        """Cells overlapping the search circle around a point."""
+        d_lat = self.radius_m / METRES_PER_DEGREE
+        # Longitude degrees shrink towards the poles
+        d_lng = d_lat / max(math.cos(math.radians(lat)), 0.01)
+        row_low, col_low = self._cell(lat - d_lat, lng - d_lng)
+        row_high, col_high = self._cell(lat + d_lat, lng + d_lng)
+        for row in range(row_low, row_high + 1):
+            for col in range(col_low, col_high + 1):
+                yield (row, col)
+
+    # ----------------------------------------
+    # Keeping the index in sync
+    # ----------------------------------------
+    def add(self, complaint_id, lat, lng, created_at=None):
+        """Index an open complaint (ignored if it has no coordinates)."""
+        if lat is None or lng is None:
+            return
+        lat, lng = float(lat), float(lng)
+        created_at = created_at or datetime.now()
+        cell = self._cell(lat, lng)
+        with self._lock:
+            self._remove_locked(complaint_id)
+            self._entries[complaint_id] = (lat, lng, created_at, cell)
+            self._cells.setdefault(cell, set()).add(complaint_id)
+
+    def remove(self, complaint_id):
+        """Drop a complaint that was cleaned or deleted."""
+        with self._lock:
+            self._remove_locked(complaint_id)
+
+    def _remove_locked(self, complaint_id):
+        entry = self._entries.pop(complaint_id, None)
+        if entry:
+            ids = self._cells.get(entry[3])
+            if ids:
+                ids.discard(complaint_id)
+                if not ids:
+                    del self._cells[entry[3]]
+
+    def needs_refresh(self):
+        """True when the index should be (re)loaded from MySQL."""
+        return time.monotonic() >= self._next_refresh
+
+    def load(self, cursor):
+        """
+        Load open complaints from MySQL: everything inside the time
+        window on first use, afterwards only rows newer than the
+        last load (inserted by other workers).
+        """
+        since = datetime.now() - self.window
+        if self._loaded_until and self._loaded_until > since:
+            since = self._loaded_until
+        cursor.execute("""
+            SELECT id, latitude, longitude, created_at FROM complaints
+            WHERE status = 'Pending' AND created_at >= %s AND latitude IS NOT NULL
+        """, (since,))
+        for complaint_id, lat, lng, created_at in cursor.fetchall():
+            self.add(complaint_id, lat, lng, created_at)
+            if self._loaded_until is None or created_at > self._loaded_until:
+                self._loaded_until = created_at
+        self._next_refresh = time.monotonic() + self.refresh_interval
+        self._prune()
+
+    def _prune(self):
+        """Forget complaints that have left the time window."""
+        cutoff = datetime.now() - self.window
+        with self._lock:
+            expired = [cid for cid, entry in self._entries.items() if entry[2] < cutoff]
+            for complaint_id in expired:
+                self._remove_locked(complaint_id)
+
+    # ----------------------------------------
+    # Lookup
+    # ----------------------------------------
+    def candidates(self, lat, lng):
+        """
+        IDs of open complaints within radius_m of the point and
+        inside the time window, nearest first.
+        """
+        if lat is None or lng is None:
+            return []
+        lat, lng = float(lat), float(lng)
+        cutoff = datetime.now() - self.window
+        found = []
+        with self._lock:
+            for cell in self._nearby_cells(lat, lng):
+                for complaint_id in self._cells.get(cell, ()):
+                    other_lat, other_lng, created_at, _ = self._entries[complaint_id]
+                    if created_at < cutoff:
+                        continue
+                    distance = geo.haversine_m(lat, lng, other_lat, other_lng)
+                    if distance <= self.radius_m:
+                        found.append((distance, complaint_id))
+        found.sort()
+        return [complaint_id for _, complaint_id in found]
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,442 @@
+"""
+============================================
+Live Dashboard Events (Server-Sent Events)
+Web Based Smart Waste Management System
+============================================
+The admin dashboard used to change only on a full reload,
+and wall screens were left auto-refreshing: every reload
+re-ran the full complaints SELECT and re-rendered every row.
+
+Now the write routes publish small events after they commit:
+
+  created  {"ids": [...]}               new complaints
+  updated  {"ids": [...], "status": s}  status changed
+  updated  {"ids": [...]}               repeat report merged
+                                        (report_count changed)
+  deleted  {"ids": [...]}               complaints removed
+
+EventBroker fans each event out to every open
+/admin/events stream. Events are kept in a ring buffer with
+increasing IDs, so a browser that reconnects (EventSource
+sends Last-Event-ID) receives what it missed. If it cannot
+be caught up (it was away so long that the events were
+dropped from the buffer, or the server restarted) it is
+told to reload instead.
+
+With several worker processes, a complaint may be changed
+by one worker while the dashboard's stream is served by
+another. The app therefore gives its broker an EventTable:
+events are written to the complaint_events table, and each
+worker with open streams reads the new rows every
+POLL_INTERVAL seconds (at once for its own events) and fans
+them out in-process. Event IDs are then the table's row IDs,
+the same in every worker, so a browser may reconnect to any
+worker. Without a table (one process) IDs carry a random
+per-process epoch instead.
+
+AUTO_INCREMENT ids are handed out at INSERT but become
+visible at COMMIT, so row 41 can appear after row 42 has
+been read. A missing id below the newest one read is kept
+as a gap for GAP_GRACE seconds and re-read on each poll;
+if it shows up it is delivered late (with the stream's
+newest id, so Last-Event-ID never goes backwards). Ids that
+never show up were rolled back and are forgotten.
+
+Streams spend nearly all their time waiting. A stream holds
+no database connection, and each one is closed after
+STREAM_MAX_AGE seconds (the browser reconnects on its own
+and resumes from Last-Event-ID). On a thread-based server
+(Flask's development server, gunicorn's gthread worker)
+every open stream occupies one thread, so the number of
+streams per process is capped at MAX_SUBSCRIBERS. The
+production server runs gevent workers (gunicorn.conf.py):
+the waits below then block a greenlet, not a thread, and an
+idle dashboard costs one socket and a few kilobytes.
+============================================
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+
+# Events kept for reconnecting clients
+RING_SIZE = 1000
+
+# Most complaint IDs carried by one event; bigger changes are split
+MAX_EVENT_IDS = 500
+
+# Most open streams per process
+MAX_SUBSCRIBERS = 200
+
+# Seconds between keep-alive comments on an idle stream (proxies
+# close connections that stay silent for too long)
+HEARTBEAT_INTERVAL = 15
+
+# Seconds after which a stream is closed and the browser reconnects
+STREAM_MAX_AGE = 300
+
+# Milliseconds the browser waits before reconnecting
+RETRY_MS = 3000
+
+# Seconds between reads of complaint_events while streams are open
+POLL_INTERVAL = 1
+
+# Seconds a missing event id is waited for (its INSERT may not
+# have committed yet), and most missing ids tracked at once
+GAP_GRACE = 10
+MAX_GAPS = 1000
+
+# Rows kept in complaint_events, and seconds between clean-ups
+TABLE_KEEP = 10 * RING_SIZE
+PRUNE_INTERVAL = 600
+
+
+class SubscriberLimitReached(Exception):
+    """Raised when MAX_SUBSCRIBERS streams are already open."""
+
+
+class EventTable:
+    """
+    The complaint_events table (migration 012), shared by all
+    worker processes. `connect` is a function returning a
+    context manager that yields a database connection (the
+    app's get_db). Events are numbered by the table's
+    AUTO_INCREMENT id.
+    """
+
+    def __init__(self, connect, keep=TABLE_KEEP, prune_interval=PRUNE_INTERVAL):
+        self.connect = connect
+        self.keep = keep
+        self.prune_interval = prune_interval
+        self._next_prune = 0
+
+    def append(self, events):
+        """Store a list of (event_type, data_json) in one transaction."""
+        with self.connect() as connection:
+            cursor = connection.cursor()
+            cursor.executemany("INSERT INTO complaint_events (event_type, data) VALUES (%s, %s)", events)
+            connection.commit()
+            if time.monotonic() >= self._next_prune:
+                self._next_prune = time.monotonic() + self.prune_interval
+                self.prune(cursor)
+                connection.commit()
+            cursor.close()
+
+    def prune(self, cursor):
+        """Delete all but the newest `keep` events."""
+        cursor.execute("SELECT MAX(id) FROM complaint_events")
+        newest = cursor.fetchone()[0]
+        if newest is not None and newest > self.keep:
+            cursor.execute("DELETE FROM complaint_events WHERE id <= %s", (newest - self.keep,))
+
+    def read(self, after, limit):
+        """
+        Up to `limit` events as (number, type, data_json), oldest
+        first: those after event number `after`, or the newest
+        ones if `after` is None.
+        """
+        with self.connect() as connection:
+            cursor = connection.cursor()
+            if after is None:
+                cursor.execute("""
+                    SELECT id, event_type, data FROM complaint_events
+                    ORDER BY id DESC LIMIT %s
+                """, (limit,))
+                rows = cursor.fetchall()[::-1]
+            else:
+                cursor.execute("""
+                    SELECT id, event_type, data FROM complaint_events
+                    WHERE id > %s ORDER BY id LIMIT %s
+                """, (after, limit))
+                rows = cursor.fetchall()
+            connection.commit()  # Ends the snapshot, so the next read sees new rows
+            cursor.close()
+        return [(int(number), event_type, data) for number, event_type, data in rows]
+
+
+class EventBroker:
+    """
+    Publish / subscribe with a ring buffer of recent events,
+    in-process or (with an EventTable) across processes.
+    Thread-safe; publish() never blocks on slow clients.
+    """
+
+    def __init__(self, ring_size=RING_SIZE, max_subscribers=MAX_SUBSCRIBERS, table=None,
+                 poll_interval=POLL_INTERVAL):
+        self.events = deque(maxlen=ring_size)  # (seq, number, type, data_json)
+        self.max_subscribers = max_subscribers
+        self.table = table
+        self.poll_interval = poll_interval
+        self.condition = threading.Condition()
+        self._reset()
+        if hasattr(os, 'register_at_fork'):  # Not on Windows
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _reset(self):
+        # Event IDs are "<epoch>-<number>", or the table's row IDs.
+        # Events are buffered in arrival order, counted by seq; without
+        # a table seq and number are the same.
+        self.epoch = None if self.table else uuid.uuid4().hex[:8]
+        self.last_id = 0   # Highest event number buffered
+        self.last_seq = 0
+        self.complete_after = 0  # Every event after this number is buffered
+        self.complete_seq = 0    # ... and every event after this seq
+        self.gaps = {}  # Missing event number -> monotonic time to give up
+        self.primed = self.table is None  # Buffer loaded from the table
+        self.subscribers = 0
+        self.published = 0
+        self.poll_errors = 0
+        self._poll_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._poller = None
+
+    def _after_fork(self):
+        """
+        Runs in a forked child (a pre-forking server loads the app
+        once and forks its workers). Every worker numbers its events
+        on its own, so it needs its own epoch: otherwise a browser
+        reconnecting to another worker would resume at a foreign
+        event number and miss events instead of reloading. The
+        poller thread is not inherited; it restarts on first use.
+        """
+        self.events.clear()
+        self.condition = threading.Condition()
+        self._reset()
+
+    def publish(self, event_type, data):
+        """
+        Add an event for every subscriber. `data` must be JSON
+        serialisable; lists of IDs longer than MAX_EVENT_IDS are
+        published as several events. With a table, an error
+        storing the event is printed, not raised: the change it
+        describes is already committed.
+        """
+        ids = data.get('ids')
+        if ids is not None and len(ids) > MAX_EVENT_IDS:
+            batches = [dict(data, ids=ids[start:start + MAX_EVENT_IDS])
+                       for start in range(0, len(ids), MAX_EVENT_IDS)]
+        else:
+            batches = [data]
+        events = [(event_type, json.dumps(batch, default=str)) for batch in batches]
+
+        if self.table is None:
+            with self.condition:
+                self._add([(self.last_id + n, event_type, payload)
+                           for n, (event_type, payload) in enumerate(events, 1)])
+            return
+        try:
+            self.table.append(events)
+        except Exception as err:
+            print(f"Live event error: {err}")
+            return
+        self._wakeup.set()  # Deliver to this worker's streams without waiting
+
+    def _add(self, events):
+        """
+        Buffer (number, type, data_json) events and wake the streams.
+        Numbers skipped over become gaps. Call with self.condition held.
+        """
+        for number, event_type, payload in events:
+            if number in self.gaps:
+                del self.gaps[number]  # Committed late
+            elif number > self.last_id + 1 and len(self.gaps) < MAX_GAPS:
+                deadline = time.monotonic() + GAP_GRACE
+                for missing in range(self.last_id + 1, min(number, self.last_id + 1 + MAX_GAPS)):
+                    self.gaps[missing] = deadline
+            if len(self.events) == self.events.maxlen:
+                # About to be dropped
+                self.complete_seq = self.events[0][0]
+                self.complete_after = max(self.complete_after, self.events[0][1])
+            self.last_seq += 1
+            self.events.append((self.last_seq, number, event_type, payload))
+            self.last_id = max(self.last_id, number)
+            self.published += 1
+        if events:
+            self.condition.notify_all()
+
+    # ----------------------------------------
+    # Reading the shared table
+    # ----------------------------------------
+    def poll(self):
+        """
+        Read new events from the table into the buffer, starting
+        below the oldest gap still waited for. The first read loads
+        the newest RING_SIZE events. Raises the database error if
+        the table cannot be read.
+        """
+        with self._poll_lock:
+            limit = self.events.maxlen
+            if not self.primed:
+                events = self.table.read(None, limit)
+                with self.condition:
+                    self.events.clear()
+                    self.gaps.clear()
+                    if events:
+                        self.last_id = self.complete_after = events[0][0] - 1
+                    else:
+                        self.complete_after = self.last_id
+                    self.complete_seq = self.last_seq
+                    self._add(events)
+                    self.primed = True
+                return
+            with self.condition:
+                now = time.monotonic()
+                for number in [number for number, deadline in self.gaps.items() if deadline < now]:
+                    del self.gaps[number]  # Rolled back: the id is never used
+                after = min(self.gaps) - 1 if self.gaps else self.last_id
+            while True:
+                rows = self.table.read(after, limit)
+                with self.condition:
+                    self._add([row for row in rows if row[0] > self.last_id or row[0] in self.gaps])
+                if len(rows) < limit:
+                    return
+                after = rows[-1][0]
+
+    def _start_poller(self):
+        with self.condition:
+            if self._poller is None:
+                self._poller = threading.Thread(target=self._poll_loop, name='live-events', daemon=True)
+                self._poller.start()
+
+    def _poll_loop(self):
+        while True:
+            with self.condition:
+                while self.subscribers == 0:
+                    # Nobody listening: stop reading, reload the buffer later
+                    self.primed = False
+                    self.condition.wait()
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+            try:
+                self.poll()
+            except Exception as err:
+                self.poll_errors += 1
+                print(f"Live events poll error: {err}")
+                time.sleep(self.poll_interval)
+
+    # ----------------------------------------
+    # Streams
+    # ----------------------------------------
+    def event_id(self, number):
+        return f"{self.epoch}-{number}" if self.epoch else str(number)
+
+    def events_after(self, seq):
+        """
+        Events buffered after `seq`, or None if some of them have
+        already been dropped from the ring buffer.
+        Call with self.condition held.
+        """
+        if seq >= self.last_seq:
+            return []
+        if seq < self.complete_seq:
+            return None
+        return [event for event in self.events if event[0] > seq]
+
+    def _seq_after(self, number):
+        """
+        Buffer position to resume from for a client that has seen
+        event `number`, or -1 if events after it were dropped.
+        Call with self.condition held.
+        """
+        if number < self.complete_after:
+            return -1
+        for seq, event_number, _, _ in self.events:
+            if event_number > number:
+                return seq - 1
+        return self.last_seq
+
+    def _resume_position(self, last_event_id):
+        """
+        Event number to continue after for a Last-Event-ID, or None
+        if it was issued by another broker (a restarted or different
+        process, or a table that was emptied). Call with
+        self.condition held.
+        """
+        if self.epoch:
+            epoch, _, number = last_event_id.partition('-')
+            if epoch != self.epoch:
+                return None
+        else:
+            number = last_event_id
+        if not number.isdigit() or int(number) > self.last_id:
+            return None
+        return int(number)
+
+    def stream(self, last_event_id=None):
+        """
+        Generator of SSE text for one client, starting after
+        `last_event_id` (or with new events only). Raises
+        SubscriberLimitReached before yielding anything if the
+        process already serves MAX_SUBSCRIBERS streams, and the
+        database error if the table cannot be read.
+        """
+        if self.table is not None:
+            self._start_poller()
+            if not self.primed or (last_event_id and last_event_id.isdigit()
+                                   and int(last_event_id) > self.last_id):
+                self.poll()  # Another worker may be ahead of this one
+        with self.condition:
+            if self.subscribers >= self.max_subscribers:
+                raise SubscriberLimitReached()
+            if last_event_id:
+                number = self._resume_position(last_event_id)
+                if number is None:
+                    position = -1  # Cannot catch up: send reload first
+                else:
+                    position = self._seq_after(number)
+            else:
+                number = self.last_id
+                position = self.last_seq
+        return self._stream(position, number or 0)
+
+    def _stream(self, position, sent_number):
+        # Counted once the server starts sending, so a response that is
+        # dropped before that does not hold a place
+        with self.condition:
+            self.subscribers += 1
+            self.condition.notify_all()  # Starts the poller reading
+        closes_at = time.monotonic() + STREAM_MAX_AGE
+        try:
+            yield f"retry: {RETRY_MS}\n\n"
+            while time.monotonic() < closes_at:
+                with self.condition:
+                    events = self.events_after(position) if position >= 0 else None
+                    if events == []:
+                        self.condition.wait(HEARTBEAT_INTERVAL)
+                        events = self.events_after(position)
+
+                if events is None:
+                    # Missed events are gone: the page must be reloaded
+                    with self.condition:
+                        position, sent_number = self.last_seq, self.last_id
+                    yield f"id: {self.event_id(sent_number)}\nevent: reload\ndata: {{}}\n\n"
+                elif events:
+                    position = events[-1][0]
+                    chunk = []
+                    for _, number, event_type, payload in events:
+                        # A late event keeps the newest id already sent
+                        sent_number = max(sent_number, number)
+                        chunk.append(f"id: {self.event_id(sent_number)}\nevent: {event_type}\n"
+                                     f"data: {payload}\n\n")
+                    yield ''.join(chunk)
+                else:
+                    yield ": keep-alive\n\n"
+        finally:
+            with self.condition:
+                self.subscribers -= 1
+
+    def stats(self):
+        """Counters for monitoring."""
+        with self.condition:
+            return {
+                'subscribers': self.subscribers,
+                'max_subscribers': self.max_subscribers,
+                'published': self.published,
+                'last_event_id': self.event_id(self.last_id),
+                'buffered': len(self.events),
+                'gaps': len(self.gaps),
+                'poll_errors': self.poll_errors,
+            }
@@ -0,0 +1,154 @@
+"""
+============================================
+Geospatial Helpers
+Web Based Smart Waste Management System
+============================================
+Distance, bounding box and map-tile helpers used by the
+"complaints near me" and map clustering APIs.
+
+Map clustering uses precomputed counts. Every complaint with
+GPS coordinates is counted in one grid cell per level in
+CLUSTER_LEVELS (a cell at level z is one web-map tile at zoom
+z). The complaint_clusters table holds, per (level, status,
+x, y), the number of complaints and the sum of their
+coordinates, so a cluster marker can be placed at the
+centroid. Write routes adjust these counts in the same
+transaction as the complaint change.
+============================================
+"""
+
+import math
+
+EARTH_RADIUS_M = 6371008.8
+
+# Mercator tiles stop at this latitude
+MAX_TILE_LATITUDE = 85.05112878
+
+# Tile zoom levels at which cluster counts are kept
+CLUSTER_LEVELS = (6, 8, 10, 12, 14, 16, 18)
+
+# A cluster cell is this many zoom levels finer than the map, so a
+# 256px map tile is split into (2**2) x (2**2) = 16 cluster cells
+CLUSTER_CELL_OFFSET = 2
+
+
+def haversine_m(lat1, lng1, lat2, lng2):
+    """Great-circle distance in metres between two points."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lng2 - lng1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_box(lat, lng, radius_m):
+    """
+    Smallest latitude / longitude box containing the circle.
+    Returns (min_lat, min_lng, max_lat, max_lng).
+    """
+    d_lat = math.degrees(radius_m / EARTH_RADIUS_M)
+    cos_lat = math.cos(math.radians(lat))
+    if cos_lat < 1e-9 or d_lat / cos_lat >= 180.0:
+        min_lng, max_lng = -180.0, 180.0  # Circle around a pole: every longitude
+    else:
+        d_lng = d_lat / cos_lat
+        min_lng, max_lng = max(-180.0, lng - d_lng), min(180.0, lng + d_lng)
+    return (max(-90.0, lat - d_lat), min_lng, min(90.0, lat + d_lat), max_lng)
+
+
+def point_wkt(lat, lng):
+    """WKT for a point, in lat-long axis order."""
+    return f"POINT({lat} {lng})"
+
+
+def box_wkt(min_lat, min_lng, max_lat, max_lng):
+    """WKT polygon for a bounding box, in lat-long axis order."""
+    return (f"POLYGON(({min_lat} {min_lng}, {max_lat} {min_lng}, {max_lat} {max_lng}, "
+            f"{min_lat} {max_lng}, {min_lat} {min_lng}))")
+
+
+def parse_bbox(args):
+    """
+    Read min_lat, min_lng, max_lat, max_lng from request arguments.
+    Returns None if none are given; raises ValueError if incomplete.
+    """
+    names = ('min_lat', 'min_lng', 'max_lat', 'max_lng')
+    values = [args.get(name) for name in names]
+    if all(value in (None, '') for value in values):
+        return None
+    try:
+        min_lat, min_lng, max_lat, max_lng = (float(value) for value in values)
+    except (TypeError, ValueError):
+        raise ValueError("min_lat, min_lng, max_lat and max_lng must all be numbers")
+    if not (-90 <= min_lat <= max_lat <= 90 and -180 <= min_lng <= max_lng <= 180):
+        raise ValueError("Invalid bounding box")
+    return min_lat, min_lng, max_lat, max_lng
+
+
+# ============================================
+# MAP TILES AND CLUSTER CELLS
+# ============================================
+
+def tile_xy(lat, lng, level):
+    """Web-map tile (x, y) containing a point at a zoom level."""
+    lat = max(-MAX_TILE_LATITUDE, min(MAX_TILE_LATITUDE, lat))
+    n = 2 ** level
+    x = int((lng + 180.0) / 360.0 * n)
+    lat_rad = math.radians(lat)
+    y = int((1.0 - math.log(math.tan(lat_rad) + 1.0 / math.cos(lat_rad)) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def cluster_level(zoom):
+    """Pick the precomputed cluster level for a map zoom level."""
+    wanted = zoom + CLUSTER_CELL_OFFSET
+    for level in CLUSTER_LEVELS:
+        if level >= wanted:
+            return level
+    return CLUSTER_LEVELS[-1]
+
+
+def _tile_index_sql(value, level):
+    """Clamp a tile index to 0 .. 2**level - 1, as tile_xy() does."""
+    return f"LEAST(GREATEST({value}, 0), POW(2, {level}) - 1)"
+
+
+def _tile_x_sql(lng, level):
+    return _tile_index_sql(f"FLOOR(({lng} + 180) / 360 * POW(2, {level}))", level)
+
+
+def _tile_y_sql(lat, level):
+    clamped = f"LEAST(GREATEST({lat}, -{MAX_TILE_LATITUDE}), {MAX_TILE_LATITUDE})"
+    return _tile_index_sql(f"FLOOR((1 - LN(TAN(RADIANS({clamped})) + 1 / COS(RADIANS({clamped}))) / PI()) "
+                           f"/ 2 * POW(2, {level}))", level)
+
+
+def cluster_adjust_sql(where_sql, sign):
+    """
+    SQL that adds (sign=+1) or removes (sign=-1) the complaints
+    matching `where_sql` from complaint_clusters at every level,
+    using each complaint's current status and coordinates.
+
+    Run it in the same transaction as the insert / update / delete:
+    +1 after inserting, -1 before deleting, and -1 / +1 around a
+    status change.
+    """
+    levels = ' UNION ALL '.join(f"SELECT {level} AS level" for level in CLUSTER_LEVELS)
+    x = _tile_x_sql('c.longitude', 'l.level')
+    y = _tile_y_sql('c.latitude', 'l.level')
+    return f"""
+        INSERT INTO complaint_clusters (level, status, x, y, count, sum_lat, sum_lng)
+        SELECT * FROM (
+            SELECT l.level, c.status, {x} AS cx, {y} AS cy,
+                   {sign} * COUNT(*) AS d_count,
+                   {sign} * SUM(c.latitude) AS d_lat,
+                   {sign} * SUM(c.longitude) AS d_lng
+            FROM complaints c CROSS JOIN ({levels}) l
+            WHERE c.latitude IS NOT NULL AND c.longitude IS NOT NULL AND ({where_sql})
+            GROUP BY l.level, c.status, cx, cy
+        ) AS delta
+        ON DUPLICATE KEY UPDATE
+            count = complaint_clusters.count + delta.d_count,
+            sum_lat = complaint_clusters.sum_lat + delta.d_lat,
+            sum_lng = complaint_clusters.sum_lng + delta.d_lng
+    """
@@ -0,0 +1,111 @@
+"""
+============================================
+Production Server Settings (gunicorn)
+Web Based Smart Waste Management System
+============================================
+`python app.py` runs Flask's development server: one process,
+with the debugger and auto-reloader, meant for one developer.
+In production run the app on gunicorn, a pre-forking server
+(Linux / macOS):
+
+    pip install gunicorn gevent
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+  1. The master process applies the schema migrations once
+     (`python migrations.py`), before any worker starts.
+  2. It forks WORKERS worker processes. Each is a gevent
+     worker: requests run in greenlets, up to
+     WORKER_CONNECTIONS at a time, and a request waiting on
+     MySQL or on a live dashboard stream lets the others run.
+  3. Every worker loads the app and opens its own database
+     connections, journal flusher and image threads on first
+     use.
+
+Live dashboards (/admin/events) are the reason for gevent:
+each open dashboard keeps a request open for minutes, mostly
+idle. On gevent it costs a socket and a greenlet, and each
+worker accepts WASTE_MAX_LIVE_STREAMS of them (three quarters
+of WORKER_CONNECTIONS by default, the rest is kept for other
+requests), so the server takes WORKERS x that many in total.
+Events reach every worker through the complaint_events table
+(see events.py).
+
+With WASTE_WORKER_CLASS=gthread the workers use THREADS
+threads instead and load the app once in the master
+(preload_app; the connection pool and event broker reset
+themselves in the forked child). Every open dashboard then
+holds a thread, so only THREADS / 2 dashboards are accepted
+per worker and the rest get 503 until one closes.
+
+Settings (environment variables):
+
+    WASTE_BIND            address to listen on (0.0.0.0:8000)
+    WASTE_WORKERS         worker processes (2 x CPUs + 1)
+    WASTE_WORKER_CLASS    gevent (default), or gthread
+    WASTE_WORKER_CONNECTIONS  requests at a time per gevent
+                          worker (1000)
+    WASTE_THREADS         threads per gthread worker (8)
+    WASTE_MIGRATE_ON_START  0 to run migrations.py yourself
+    WASTE_ACCESS_LOG      '-' to log every request to stdout
+
+Each worker keeps its own in-process caches and /metrics
+numbers.
+============================================
+"""
+
+import multiprocessing
+import os
+import subprocess
+import sys
+
+import settings
+
+bind = settings.get('BIND', '0.0.0.0:8000')
+workers = settings.get_int('WORKERS', multiprocessing.cpu_count() * 2 + 1)
+worker_class = settings.get('WORKER_CLASS', 'gevent')
+worker_connections = settings.get_int('WORKER_CONNECTIONS', 1000)
+threads = settings.get_int('THREADS', 8)
+
+# gevent patches the standard library in each worker after the fork,
+# so with gevent the app must not be imported by the master
+preload_app = worker_class != 'gevent'
+
+# A worker silent for this many seconds is restarted
+timeout = 60
+graceful_timeout = 30
+keepalive = 5
+
+errorlog = '-'
+accesslog = settings.get('ACCESS_LOG')  # Off by default: /metrics counts requests
+
+if worker_class == 'gevent':
+    # Keep a quarter of each worker's connections for other requests
+    os.environ.setdefault('WASTE_MAX_LIVE_STREAMS', str(max(1, worker_connections * 3 // 4)))
+else:
+    # Every open live dashboard holds one thread; keep at least half
+    # of each worker's threads free for other requests
+    os.environ.setdefault('WASTE_MAX_LIVE_STREAMS', str(max(1, threads // 2)))
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def on_starting(server):
+    """
+    Runs once in the master before the workers are forked. Migrations
+    run in a child process, so no database connection (or thread)
+    exists in the master when it forks.
+    """
+    if not settings.get_bool('MIGRATE_ON_START', True):
+        return
+    server.log.info("Applying database migrations")
+    result = subprocess.run([sys.executable, os.path.join(APP_DIR, 'migrations.py')], cwd=APP_DIR)
+    if result.returncode != 0:
+        # Keep serving: submissions are journaled while MySQL is unreachable
+        server.log.error("Database migrations failed; starting anyway")
+
+
+def worker_exit(server, worker):
+    """Close the worker's idle database connections on shutdown."""
+    app_module = sys.modules.get('app')
+    if app_module is not None:
+        app_module.db_pool.close_all()
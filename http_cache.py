@@ -0,0 +1,125 @@
+"""
+============================================
+HTTP Caching Helpers
+Web Based Smart Waste Management System
+============================================
+The mobile app polls /complaints constantly, although the
+data rarely changes between two polls. A one-row table,
+data_version, holds a counter that every write transaction
+bumps. Read routes turn it into an ETag (and Last-Modified),
+so a client polling with If-None-Match gets an empty
+304 Not Modified until something actually changes.
+
+The version is read in the same transaction (and so the same
+snapshot) as the data, so an ETag never describes a payload
+other than the one it was sent with.
+
+Uploaded images are stored under their content hash (see
+storage.py), so their URLs never change content and can be
+cached by browsers and proxies forever ("immutable").
+============================================
+"""
+
+import hashlib
+import math
+import re
+
+# Seconds browsers may cache content-addressed images (one year)
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+# Images stored before content addressing may in theory be replaced
+LEGACY_IMAGE_MAX_AGE = 24 * 3600
+
+# ab/cd/<sha256>.<ext>, as written by storage.blob_path()
+CONTENT_ADDRESSED_PATH = re.compile(r'^[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.[a-z]+$')
+
+# Bump the counter; run it last in a write transaction, just before
+# commit, so the row lock is held as briefly as possible
+BUMP_VERSION_SQL = """
+    UPDATE data_version
+    SET version = version + 1, changed_at = CURRENT_TIMESTAMP(6)
+    WHERE id = 1
+"""
+
+READ_VERSION_SQL = """
+    SELECT version, UNIX_TIMESTAMP(changed_at), UNIX_TIMESTAMP(NOW(6))
+    FROM data_version WHERE id = 1
+"""
+
+
+def bump_data_version(cursor):
+    """Record that the complaints changed (in the caller's transaction)."""
+    cursor.execute(BUMP_VERSION_SQL)
+
+
+def read_data_version(cursor):
+    """
+    Return (version, changed_at, db_now) with both times as Unix
+    timestamps from the database clock. Works with tuple and
+    dictionary cursors.
+    """
+    cursor.execute(READ_VERSION_SQL)
+    row = cursor.fetchone()
+    if isinstance(row, dict):
+        row = tuple(row.values())
+    version, changed_at, db_now = row
+    return int(version), float(changed_at), float(db_now)
+
+
+def make_etag(version, args):
+    """
+    ETag for a response built from data version `version` and the
+    request's query arguments (each filter / page is its own entity).
+    """
+    query = '&'.join(f"{key}={value}" for key, value in sorted(args.items(multi=True)))
+    digest = hashlib.sha1(query.encode('utf-8')).hexdigest()[:16]
+    return f"{version}-{digest}"
+
+
+def last_modified(changed_at, db_now):
+    """
+    Last-Modified value (Unix seconds) for the data, or None.
+
+    HTTP dates have whole-second resolution, so the change time is
+    rounded up. The header is only sent once that second has passed;
+    otherwise a second write within the same second would carry the
+    same date and a client using If-Modified-Since would miss it.
+    """
+    rounded = math.ceil(changed_at)
+    return rounded if rounded <= db_now else None
+
+
+def is_not_modified(request, etag, modified):
+    """
+    True if the client's copy is current. If-None-Match takes
+    precedence; If-Modified-Since is used only without it.
+    """
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    if modified is not None and request.if_modified_since is not None:
+        return modified <= request.if_modified_since.timestamp()
+    return False
+
+
+def set_validators(response, etag, modified):
+    """Add ETag / Last-Modified and make clients revalidate every time."""
+    response.set_etag(etag)
+    if modified is not None:
+        response.last_modified = modified
+    response.cache_control.no_cache = True
+    return response
+
+
+def cache_image(response, image_path):
+    """
+    Cache headers for an uploaded image (or one of its variants).
+    Content-addressed files never change, so they are immutable.
+    """
+    response.cache_control.no_cache = None  # Set by send_file without max_age
+    response.cache_control.public = True
+    if CONTENT_ADDRESSED_PATH.match(image_path):
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.max_age = LEGACY_IMAGE_MAX_AGE
+    return response
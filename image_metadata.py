@@ -0,0 +1,242 @@
+"""
+============================================
+Image Metadata Removal
+Web Based Smart Waste Management System
+============================================
+Phone photos carry metadata: EXIF with the GPS position,
+the time and the camera serial number, XMP, IPTC, comments
+and sometimes whole extra images (MPF previews, motion photo
+videos appended after the picture). Uploaded originals are
+served publicly under /uploads/, so every upload is cleaned
+before it is stored (see storage.BlobStore.stage).
+
+The image data itself is copied byte for byte, not
+re-encoded, so there is no quality loss and Pillow is not
+needed:
+
+  - JPEG: APPn and COM segments are dropped, except JFIF,
+    the ICC colour profile and the Adobe colour transform,
+    which decoders need. The EXIF orientation is kept in a
+    minimal EXIF segment, so photos are not shown sideways.
+    Anything after the end-of-image marker is dropped.
+  - PNG: eXIf, tEXt, zTXt, iTXt and tIME chunks are dropped,
+    and anything after IEND.
+  - GIF: comments and application extensions other than the
+    animation loop count are dropped, and anything after the
+    trailer.
+
+Clean uploads stored before this existed (in place):
+    python image_worker.py --strip-originals
+============================================
+"""
+
+import struct
+
+# JPEG markers without a length field: TEM, RST0-7, SOI
+JPEG_STANDALONE = {0x01, 0xD8} | set(range(0xD0, 0xD8))
+JPEG_EOI = 0xD9
+JPEG_SOS = 0xDA
+JPEG_COM = 0xFE
+
+# APPn segments kept, by marker and payload prefix
+JPEG_KEEP_APP = {
+    0xE0: b'JFIF\x00',         # JFIF header
+    0xE2: b'ICC_PROFILE\x00',  # Colour profile
+    0xEE: b'Adobe',            # Colour transform of CMYK / YCCK images
+}
+
+EXIF_HEADER = b'Exif\x00\x00'
+EXIF_ORIENTATION_TAG = 0x0112
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+PNG_DROP_CHUNKS = {b'eXIf', b'tEXt', b'zTXt', b'iTXt', b'tIME'}
+
+# GIF application extensions kept (animation loop count)
+GIF_KEEP_APPLICATIONS = {b'NETSCAPE2.0', b'ANIMEXTS1.0'}
+
+
+def strip_metadata(data, extension):
+    """
+    Return the image bytes `data` without metadata. `extension`
+    is the type detected by storage.py (jpg / png / gif); other
+    types are returned unchanged. Raises ValueError if the file
+    is not a well-formed image of that type.
+    """
+    try:
+        if extension == 'jpg':
+            return strip_jpeg(data)
+        if extension == 'png':
+            return strip_png(data)
+        if extension == 'gif':
+            return strip_gif(data)
+    except (IndexError, struct.error):
+        raise ValueError(f"Damaged {extension.upper()} file")
+    return data
+
+
+# ============================================
+# JPEG
+# ============================================
+
+def exif_orientation(exif):
+    """Orientation (1-8) from the first IFD of an EXIF payload, or None."""
+    tiff = exif[len(EXIF_HEADER):]
+    if tiff[:4] == b'II*\x00':
+        order = '<'
+    elif tiff[:4] == b'MM\x00*':
+        order = '>'
+    else:
+        return None
+    try:
+        ifd = struct.unpack_from(order + 'I', tiff, 4)[0]
+        count = struct.unpack_from(order + 'H', tiff, ifd)[0]
+        for entry in range(ifd + 2, ifd + 2 + 12 * count, 12):
+            tag, kind = struct.unpack_from(order + 'HH', tiff, entry)
+            if tag == EXIF_ORIENTATION_TAG and kind == 3:  # SHORT
+                value = struct.unpack_from(order + 'H', tiff, entry + 8)[0]
+                return value if 1 <= value <= 8 else None
+    except struct.error:
+        pass
+    return None
+
+
+def orientation_segment(orientation):
+    """APP1 segment holding an EXIF block with only the orientation."""
+    tiff = (b'MM\x00*' + struct.pack('>I', 8)           # Header, first IFD at 8
+            + struct.pack('>H', 1)                       # One entry
+            + struct.pack('>HHIHH', EXIF_ORIENTATION_TAG, 3, 1, orientation, 0)
+            + struct.pack('>I', 0))                      # No next IFD
+    payload = EXIF_HEADER + tiff
+    return b'\xff\xe1' + struct.pack('>H', len(payload) + 2) + payload
+
+
+def _next_jpeg_marker(data, pos):
+    """Position of the next marker in entropy-coded data, or -1."""
+    while True:
+        pos = data.find(b'\xff', pos)
+        if pos == -1 or pos + 1 >= len(data):
+            return -1
+        following = data[pos + 1]
+        if following == 0x00 or 0xD0 <= following <= 0xD7:
+            pos += 2  # Stuffed 0xFF byte or restart marker: still image data
+        elif following == 0xFF:
+            pos += 1  # Fill byte before a marker
+        else:
+            return pos
+
+
+def strip_jpeg(data):
+    if not data.startswith(b'\xff\xd8'):
+        raise ValueError("Not a JPEG file")
+    parts = [data[:2]]
+    exif_index = orientation = None
+    pos = 2
+    while pos < len(data):
+        if data[pos] != 0xFF:
+            raise ValueError("Damaged JPEG file")
+        marker = data[pos + 1]
+        if marker == 0xFF:
+            pos += 1
+            continue
+        if marker == JPEG_EOI:
+            parts.append(data[pos:pos + 2])
+            break  # Drop anything appended after the image
+        if marker in JPEG_STANDALONE:
+            parts.append(data[pos:pos + 2])
+            pos += 2
+            continue
+
+        end = pos + 2 + struct.unpack_from('>H', data, pos + 2)[0]
+        if end > len(data):
+            raise ValueError("Damaged JPEG file")
+        payload = data[pos + 4:end]
+        if 0xE0 <= marker <= 0xEF or marker == JPEG_COM:
+            if marker == 0xE1 and orientation is None and payload.startswith(EXIF_HEADER):
+                orientation = exif_orientation(payload)
+                exif_index = len(parts)
+            prefix = JPEG_KEEP_APP.get(marker)
+            if prefix is not None and payload.startswith(prefix):
+                parts.append(data[pos:end])
+        else:
+            parts.append(data[pos:end])
+        pos = end
+
+        if marker == JPEG_SOS:
+            # Image data runs up to the next marker
+            scan_end = _next_jpeg_marker(data, pos)
+            if scan_end == -1:
+                parts.append(data[pos:])  # Truncated: keep what there is
+                break
+            parts.append(data[pos:scan_end])
+            pos = scan_end
+
+    if orientation is not None and orientation != 1:
+        parts.insert(exif_index, orientation_segment(orientation))
+    return b''.join(parts)
+
+
+# ============================================
+# PNG
+# ============================================
+
+def strip_png(data):
+    if not data.startswith(PNG_SIGNATURE):
+        raise ValueError("Not a PNG file")
+    parts = [PNG_SIGNATURE]
+    pos = len(PNG_SIGNATURE)
+    while pos < len(data):
+        length, kind = struct.unpack_from('>I4s', data, pos)
+        end = pos + 12 + length  # Length, type, data, CRC
+        if end > len(data):
+            raise ValueError("Damaged PNG file")
+        if kind not in PNG_DROP_CHUNKS:
+            parts.append(data[pos:end])
+        pos = end
+        if kind == b'IEND':
+            break
+    return b''.join(parts)
+
+
+# ============================================
+# GIF
+# ============================================
+
+def _gif_sub_blocks_end(data, pos):
+    """End of a chain of data sub-blocks starting at `pos`."""
+    while True:
+        size = data[pos]
+        pos += 1 + size
+        if size == 0:
+            return pos
+
+
+def strip_gif(data):
+    if not data[:6] in (b'GIF87a', b'GIF89a'):
+        raise ValueError("Not a GIF file")
+    flags = data[10]
+    pos = 13 + (3 << ((flags & 7) + 1) if flags & 0x80 else 0)  # Global colour table
+    parts = [data[:pos]]
+    while True:
+        block = data[pos]
+        if block == 0x3B:  # Trailer
+            parts.append(data[pos:pos + 1])
+            break
+        if block == 0x21:  # Extension
+            label = data[pos + 1]
+            end = _gif_sub_blocks_end(data, pos + 2)
+            keep = label not in (0xFE, 0xFF)  # Comment, application
+            if label == 0xFF:
+                keep = data[pos + 3:pos + 14] in GIF_KEEP_APPLICATIONS
+            if keep:
+                parts.append(data[pos:end])
+        elif block == 0x2C:  # Image
+            flags = data[pos + 9]
+            end = pos + 10 + (3 << ((flags & 7) + 1) if flags & 0x80 else 0)
+            end = _gif_sub_blocks_end(data, end + 1)  # After the LZW code size
+            parts.append(data[pos:end])
+        else:
+            raise ValueError("Damaged GIF file")
+        if end > len(data):
+            raise ValueError("Damaged GIF file")
+        pos = end
+    return b''.join(parts)
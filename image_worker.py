@@ -0,0 +1,231 @@
+"""
+============================================
+Background Image Processing
+Web Based Smart Waste Management System
+============================================
+Phone photos are several megabytes each. After an upload is
+saved, a small pool of background threads creates smaller
+variants so the dashboard does not download the originals:
+
+  - thumb  : 240 px, for the complaints table
+  - medium : 1024 px, for the full-size image popup
+
+Variants are re-encoded as WebP without any metadata. The
+original is stored with its metadata already removed (EXIF
+GPS position and camera details, see image_metadata.py) but
+its pixels unchanged. The request thread only queues the
+work; until a variant exists the dashboard shows the original.
+
+Requires Pillow (pip install Pillow). Without it processing is
+switched off and originals are always served.
+
+Create variants for images uploaded before this existed:
+    python image_worker.py --backfill
+Remove metadata from originals stored before uploads were cleaned
+(also run it with --uploads archive_uploads):
+    python image_worker.py --strip-originals
+============================================
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import image_metadata
+import settings
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional
+    Image = None
+
+# Variant name -> longest side in pixels
+VARIANTS = {
+    'thumb': 240,
+    'medium': 1024,
+}
+
+VARIANT_FORMAT = 'WEBP'
+VARIANT_EXTENSION = 'webp'
+VARIANT_QUALITY = 80
+
+# Variants live under uploads/variants/<variant>/
+VARIANTS_DIR = 'variants'
+
+
+def variant_name(image_path):
+    """Relative path of a variant file for an uploaded image."""
+    stem = os.path.splitext(image_path)[0]
+    return f"{stem}.{VARIANT_EXTENSION}"
+
+
+def variant_path(upload_folder, image_path, variant):
+    """Absolute path of a variant file for an uploaded image."""
+    return os.path.join(upload_folder, VARIANTS_DIR, variant, variant_name(image_path))
+
+
+def create_variants(upload_folder, image_path):
+    """
+    Create every variant of one uploaded image.
+    Each file is written to a temporary name and renamed into place,
+    so a half-written variant is never served.
+    """
+    source = os.path.join(upload_folder, image_path)
+    with Image.open(source) as original:
+        # Apply the EXIF rotation before the metadata is dropped
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+
+        for variant, size in VARIANTS.items():
+            target = variant_path(upload_folder, image_path, variant)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            resized = image.copy()
+            resized.thumbnail((size, size), Image.LANCZOS)
+            temp_target = f"{target}.tmp"
+            # No exif= argument, so no metadata is written
+            resized.save(temp_target, VARIANT_FORMAT, quality=VARIANT_QUALITY, method=4)
+            os.replace(temp_target, target)
+
+
+def remove_variants(upload_folder, image_path):
+    """Delete the variants of an image that is being removed."""
+    for variant in VARIANTS:
+        target = variant_path(upload_folder, image_path, variant)
+        if os.path.exists(target):
+            os.remove(target)
+
+
+class ImageProcessor:
+    """
+    Thread pool that creates image variants in the background.
+    The pool is started on first use, so every worker process
+    started by a pre-forking server gets its own threads.
+    """
+
+    def __init__(self, upload_folder, workers=2):
+        self.upload_folder = upload_folder
+        self.workers = workers
+        self.enabled = Image is not None
+        self._executor = None
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._done = 0
+        self._failed = 0
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                if settings.gevent_patched():
+                    # Patched threads are greenlets, and resizing would stall
+                    # every request of the worker: use real threads
+                    from gevent.threadpool import ThreadPoolExecutor as NativeThreadPoolExecutor
+                    self._executor = NativeThreadPoolExecutor(max_workers=self.workers)
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                        thread_name_prefix='image-worker')
+            return self._executor
+
+    def submit(self, image_path):
+        """Queue an uploaded image for processing and return immediately."""
+        if not self.enabled or not image_path:
+            return
+        with self._lock:
+            self._queued += 1
+        self._get_executor().submit(self._process, image_path)
+
+    def _process(self, image_path):
+        try:
+            create_variants(self.upload_folder, image_path)
+            with self._lock:
+                self._done += 1
+        except Exception as e:
+            print(f"Image processing error for {image_path}: {e}")
+            with self._lock:
+                self._failed += 1
+
+    def has_variant(self, image_path, variant):
+        """True once the variant of an image has been created."""
+        return os.path.exists(variant_path(self.upload_folder, image_path, variant))
+
+    def stats(self):
+        """Counts of queued, finished and failed images."""
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'queued': self._queued,
+                'done': self._done,
+                'failed': self._failed,
+                'backlog': self._queued - self._done - self._failed,
+            }
+
+
+def stored_originals(upload_folder):
+    """Relative paths of the uploaded images (not variants or temp files)."""
+    for folder, dirs, files in os.walk(upload_folder):
+        dirs[:] = [d for d in dirs
+                   if not d.startswith('.') and not (folder == upload_folder and d == VARIANTS_DIR)]
+        for filename in files:
+            if not filename.startswith('.'):
+                yield os.path.relpath(os.path.join(folder, filename), upload_folder)
+
+
+def strip_original(upload_folder, image_path):
+    """
+    Remove the metadata from an original stored before uploads
+    were cleaned. The file keeps its path, so the complaints
+    pointing to it are unchanged. Returns True if it was rewritten.
+    """
+    source = os.path.join(upload_folder, image_path)
+    with open(source, 'rb') as file:
+        data = file.read()
+    extension = os.path.splitext(image_path)[1].lstrip('.').lower()
+    cleaned = image_metadata.strip_metadata(data, extension)
+    if cleaned == data:
+        return False
+    temp_path = os.path.join(os.path.dirname(source), f".{os.path.basename(source)}.part")
+    with open(temp_path, 'wb') as file:
+        file.write(cleaned)
+    os.replace(temp_path, source)
+    return True
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Create image variants for uploaded images.')
+    parser.add_argument('--backfill', action='store_true',
+                        help='create missing variants for every uploaded image')
+    parser.add_argument('--strip-originals', action='store_true',
+                        help='remove metadata from originals uploaded before it was removed on upload')
+    parser.add_argument('--uploads', default='uploads', help='uploads folder')
+    args = parser.parse_args()
+
+    if args.strip_originals:
+        stripped = 0
+        for image_path in stored_originals(args.uploads):
+            try:
+                if strip_original(args.uploads, image_path):
+                    stripped += 1
+                    print(f"✅ {image_path}")
+            except (OSError, ValueError) as e:
+                print(f"❌ {image_path}: {e}")
+        print(f"Removed metadata from {stripped} images")
+    if not args.backfill:
+        if not args.strip_originals:
+            parser.print_help()
+        raise SystemExit(0)
+    if Image is None:
+        raise SystemExit("Pillow is not installed: pip install Pillow")
+
+    created = 0
+    for image_path in stored_originals(args.uploads):
+        if all(os.path.exists(variant_path(args.uploads, image_path, v)) for v in VARIANTS):
+            continue
+        try:
+            create_variants(args.uploads, image_path)
+            created += 1
+            print(f"✅ {image_path}")
+        except Exception as e:
+            print(f"❌ {image_path}: {e}")
+    print(f"Created variants for {created} images")
@@ -0,0 +1,502 @@
+"""
+============================================
+Write-Behind Complaint Journal
+Web Based Smart Waste Management System
+============================================
+Citizens' reports must not be lost when MySQL is down, and
+during the morning peak a submission should not wait for its
+own database commit. Instead the complaint is appended to a
+local, append-only journal file and the citizen gets an
+answer at once. A background flusher thread then stores the
+journaled complaints in MySQL, many per transaction.
+
+  - Durability: a record is fsynced before submit() returns.
+    Concurrent submissions share one fsync (group commit).
+  - Replay: records not yet stored are read back when the
+    app starts, so nothing is lost by a restart or crash.
+  - Outages: while MySQL is unreachable the flusher retries
+    with a growing delay; the journal simply grows.
+  - Exactly once: every record carries an idempotency key,
+    so a batch that was stored just before a crash (but not
+    yet checkpointed) is recognised and not inserted twice.
+  - Bad records: if a batch fails with an error that is not
+    an outage, its records are stored one at a time and any
+    record that still fails is moved to the dead-letter file,
+    so one bad record cannot hold up the ones behind it.
+
+Layout (one "slot" directory per worker process):
+
+    journal/slot-0/segment-000000000001.log   JSON lines
+    journal/slot-0/checkpoint                 last stored seq
+    journal/slot-0/files/                     images of records
+                                              not yet stored
+    journal/slot-0/lock                       held by the owner
+    journal/dead-letter.log                   records MySQL refused
+    journal/dead-letter-files/                their images
+
+A worker claims the first free slot. Slots left behind by
+workers that no longer run are adopted and drained by the
+others. (Without fcntl, e.g. on Windows, only slot-0 is used,
+which suits the single-process development server.)
+============================================
+"""
+
+import collections
+import json
+import os
+import shutil
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# Start a new segment file once the current one is this large
+SEGMENT_BYTES = 8 * 1024 * 1024
+
+# Most records stored in one MySQL transaction
+FLUSH_BATCH_SIZE = 200
+
+# Delay before retrying a failed flush; doubles up to the maximum
+RETRY_DELAY = 1.0
+MAX_RETRY_DELAY = 30.0
+
+# Seconds between scans for slots left by exited workers
+ADOPT_INTERVAL = 30.0
+
+DEAD_LETTER_FILE = 'dead-letter.log'
+DEAD_LETTER_FILES_DIR = 'dead-letter-files'
+
+
+def _fsync_directory(directory):
+    """Make a new / renamed file's directory entry durable (POSIX only)."""
+    if os.name != 'posix':
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class JournalSlot:
+    """One journal directory, owned by one process at a time."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.files_dir = os.path.join(directory, 'files')
+        os.makedirs(self.files_dir, exist_ok=True)
+        self.last_seq = 0
+        self.pending = collections.deque()  # Records not yet stored, in seq order
+        self._lock_file = None
+        self._segment = None
+
+    # ----------------------------------------
+    # Ownership
+    # ----------------------------------------
+    def try_lock(self):
+        """Claim the slot; False if another process owns it."""
+        lock_file = open(os.path.join(self.directory, 'lock'), 'a')
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                return False
+        self._lock_file = lock_file
+        return True
+
+    def unlock(self):
+        if self._segment is not None:
+            self._segment.close()
+            self._segment = None
+        if self._lock_file is not None:
+            self._lock_file.close()  # Releases the flock
+            self._lock_file = None
+
+    # ----------------------------------------
+    # Reading
+    # ----------------------------------------
+    def _segments(self):
+        """(first seq, path) of every segment file, oldest first."""
+        names = sorted(name for name in os.listdir(self.directory)
+                       if name.startswith('segment-') and name.endswith('.log'))
+        return [(int(name[8:-4]), os.path.join(self.directory, name)) for name in names]
+
+    def read_checkpoint(self):
+        try:
+            with open(os.path.join(self.directory, 'checkpoint')) as f:
+                return int(f.read().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def load(self):
+        """Read back the records not yet stored in MySQL; returns their number."""
+        checkpoint = self.read_checkpoint()
+        self.last_seq = checkpoint
+        for _, path in self._segments():
+            with open(path, 'rb') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # Torn last line of a crash; it was never acknowledged
+                    self.last_seq = max(self.last_seq, record['seq'])
+                    if record['seq'] > checkpoint:
+                        self.pending.append(record)
+        return len(self.pending)
+
+    # ----------------------------------------
+    # Writing
+    # ----------------------------------------
+    def append(self, record):
+        """
+        Write one record to the newest segment (not yet fsynced).
+        Each process start writes to a fresh segment, so a torn
+        line left by a crash is never appended to.
+        """
+        if self._segment is None or self._segment.tell() >= SEGMENT_BYTES:
+            self._open_segment(self.last_seq + 1)
+        self.last_seq += 1
+        record['seq'] = self.last_seq
+        self._segment.write(json.dumps(record).encode('utf-8') + b'\n')
+        self._segment.flush()
+        return self.last_seq
+
+    def _open_segment(self, first_seq):
+        if self._segment is not None:
+            self.sync()
+            self._segment.close()
+        self._segment = open(os.path.join(self.directory, f"segment-{first_seq:012d}.log"), 'ab')
+        _fsync_directory(self.directory)
+
+    def sync(self):
+        """fsync everything appended so far."""
+        if self._segment is not None:
+            os.fsync(self._segment.fileno())
+
+    def checkpoint(self, seq):
+        """Record that every record up to `seq` is stored in MySQL."""
+        path = os.path.join(self.directory, 'checkpoint')
+        with open(f"{path}.tmp", 'w') as f:
+            f.write(str(seq))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(f"{path}.tmp", path)
+
+        # Drop segments whose records are all stored (never the newest)
+        segments = self._segments()
+        for (_, path), (next_first, _) in zip(segments, segments[1:]):
+            if next_first - 1 <= seq:
+                os.remove(path)
+
+    def clear(self):
+        """Delete every segment, the checkpoint and kept files of a drained slot."""
+        paths = [path for _, path in self._segments()]
+        paths += [os.path.join(self.files_dir, name) for name in os.listdir(self.files_dir)]
+        paths.append(os.path.join(self.directory, 'checkpoint'))
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
+
+
+class WriteBehindJournal:
+    """
+    Durable queue of submitted complaints in front of MySQL.
+
+    `sink(records, files_dir)` stores a list of records in MySQL in
+    one transaction and raises on failure; it is called from the
+    background flusher thread. `is_outage(error)` tells a failure
+    worth retrying (database unreachable) from a record the
+    database refuses; by default every failure is retried.
+    """
+
+    def __init__(self, directory, sink, batch_size=FLUSH_BATCH_SIZE,
+                 retry_delay=RETRY_DELAY, max_retry_delay=MAX_RETRY_DELAY, is_outage=None):
+        self.directory = directory
+        self.sink = sink
+        self.is_outage = is_outage or (lambda error: True)
+        self.batch_size = batch_size
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self._start_lock = threading.Lock()
+        self._pid = None
+
+    def start(self):
+        """
+        Claim a slot, read back unstored records and start the flusher.
+        Called lazily, so each worker of a pre-forking server starts
+        its own; calling it again is cheap.
+        """
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._write_lock = threading.Lock()   # Appends and fsyncs
+            self._sync_lock = threading.Lock()    # One fsync leader at a time
+            self._cond = threading.Condition()    # Guards the pending queues
+            self._synced_seq = 0
+            self._adopted = []
+            self._appended = 0
+            self._flushed = 0
+            self._fsyncs = 0
+            self._failures = 0
+            self._dead_letters = 0
+            self._last_error = None
+            self._last_flush_at = None
+
+            os.makedirs(self.directory, exist_ok=True)
+            self._slot = self._claim_slot()
+            replayed = self._slot.load()
+            self._synced_seq = self._slot.last_seq
+            if replayed:
+                print(f"Journal: replaying {replayed} complaints from {self._slot.directory}")
+            self._adopt_orphans()
+
+            thread = threading.Thread(target=self._run, name='journal-flusher', daemon=True)
+            thread.start()
+            self._pid = os.getpid()
+
+    def _slot_dirs(self):
+        names = sorted((name for name in os.listdir(self.directory) if name.startswith('slot-')),
+                       key=lambda name: int(name[5:]))
+        return [os.path.join(self.directory, name) for name in names]
+
+    def _claim_slot(self):
+        index = 0
+        while True:
+            slot = JournalSlot(os.path.join(self.directory, f"slot-{index}"))
+            if slot.try_lock():
+                return slot
+            index += 1
+
+    def _adopt_orphans(self):
+        """Take over slots of workers that exited with records left."""
+        if fcntl is None:
+            return
+        owned = {self._slot.directory} | {slot.directory for slot in self._adopted}
+        for directory in self._slot_dirs():
+            if directory in owned:
+                continue
+            slot = JournalSlot(directory)
+            if not slot.try_lock():
+                continue
+            if slot.load():
+                print(f"Journal: adopting {len(slot.pending)} complaints from {directory}")
+                with self._cond:
+                    self._adopted.append(slot)
+                    self._cond.notify()
+            else:
+                slot.unlock()
+
+    # ----------------------------------------
+    # Submitting
+    # ----------------------------------------
+    def submit(self, item, upload=None):
+        """
+        Durably journal one complaint (a dict as accepted by
+        insert_complaints_batch) and return its seq. `upload` is a
+        staged storage.HashingUpload; the image is kept in the
+        journal until the complaint is stored.
+        """
+        self.start()
+        item = dict(item)
+        if upload is not None:
+            kept = os.path.join(self._slot.files_dir, os.path.basename(upload.blob_path))
+            upload.sync()
+            if os.path.exists(kept):
+                upload.close()  # Same photo already waiting in the journal
+            else:
+                upload.move_to(kept)
+            item['image_path'] = upload.blob_path
+            item['image_size'] = upload.size
+        record = {'received_at': time.time(), 'item': item}
+
+        with self._write_lock:
+            seq = self._slot.append(record)
+            with self._cond:
+                self._slot.pending.append(record)
+                self._appended += 1
+        self._sync(seq)
+        return seq
+
+    def _sync(self, seq):
+        """
+        Group commit: the first waiting thread fsyncs everything
+        appended so far; threads whose records it covered return
+        without an fsync of their own.
+        """
+        with self._sync_lock:
+            if self._synced_seq >= seq:
+                return
+            with self._write_lock:
+                target = self._slot.last_seq
+                self._slot.sync()
+            with self._cond:
+                self._synced_seq = target
+                self._fsyncs += 1
+                self._cond.notify()
+
+    # ----------------------------------------
+    # Flushing to MySQL
+    # ----------------------------------------
+    def _next_batch(self):
+        """Wait up to a second for records; returns (slot, records)."""
+        with self._cond:
+            for _ in range(2):
+                for slot in [self._slot] + self._adopted:
+                    # Only fsynced records of the active slot may be stored,
+                    # or a crash could lose a record the database already has
+                    limit = self._synced_seq if slot is self._slot else float('inf')
+                    batch = []
+                    for record in slot.pending:
+                        if record['seq'] > limit or len(batch) >= self.batch_size:
+                            break
+                        batch.append(record)
+                    if batch:
+                        return slot, batch
+                self._cond.wait(timeout=1.0)
+        return None, []
+
+    def _run(self):
+        delay = self.retry_delay
+        next_adopt = time.monotonic() + ADOPT_INTERVAL
+        while True:
+            if time.monotonic() >= next_adopt:
+                try:
+                    self._adopt_orphans()
+                except OSError as e:
+                    print(f"Journal: could not scan for orphaned slots: {e}")
+                next_adopt = time.monotonic() + ADOPT_INTERVAL
+
+            slot, batch = self._next_batch()
+            if not batch:
+                continue
+            dead_before = self._dead_letters
+            done, error = self._store(slot, batch)
+            if error is not None:
+                with self._cond:
+                    self._failures += 1
+                    self._last_error = str(error)
+            if not done:
+                print(f"Journal flush failed, retrying in {delay:.0f}s: {error}")
+                time.sleep(delay)
+                delay = min(delay * 2, self.max_retry_delay)
+                continue
+            if error is None:
+                delay = self.retry_delay
+
+            with self._cond:
+                for _ in done:
+                    slot.pending.popleft()
+                self._flushed += len(done) - (self._dead_letters - dead_before)
+                self._last_flush_at = time.time()
+                if error is None:
+                    self._last_error = None
+                still_needed = {os.path.basename(record['item']['image_path'])
+                                for record in slot.pending if record['item'].get('image_path')}
+            try:
+                slot.checkpoint(done[-1]['seq'])
+                self._remove_kept_files(slot, done, still_needed)
+                if slot is not self._slot and not slot.pending:
+                    slot.clear()
+            except OSError as e:
+                # The records are stored; if the checkpoint was not
+                # written they are replayed and found by their keys
+                print(f"Journal: could not checkpoint {slot.directory}: {e}")
+                with self._cond:
+                    self._last_error = str(e)
+            if slot is not self._slot and not slot.pending:
+                slot.unlock()
+                with self._cond:
+                    self._adopted.remove(slot)
+
+    def _store(self, slot, batch):
+        """
+        Pass a batch to the sink. Returns (done, error): the leading
+        records that are finished with (stored or dead-lettered) and
+        the last error seen, or None.
+        If the whole batch fails for a reason other than an outage,
+        its records are retried one at a time and those the database
+        refuses on their own are dead-lettered.
+        """
+        try:
+            self.sink(batch, slot.files_dir)
+            return batch, None
+        except Exception as e:
+            error = e
+        if self.is_outage(error):
+            return [], error
+        done = []
+        for record in batch:
+            try:
+                self.sink([record], slot.files_dir)
+            except Exception as e:
+                error = e
+                if self.is_outage(e):
+                    break
+                try:
+                    self._dead_letter(slot, record, e)
+                except OSError as write_error:
+                    print(f"Journal: could not write dead letter: {write_error}")
+                    break
+            done.append(record)
+        return done, error
+
+    def _dead_letter(self, slot, record, error):
+        """Set a record (and its kept image) aside in the dead-letter file."""
+        print(f"Journal: complaint {record['seq']} refused by the database, "
+              f"moved to {DEAD_LETTER_FILE}: {error}")
+        image_path = record['item'].get('image_path')
+        kept = os.path.join(slot.files_dir, os.path.basename(image_path)) if image_path else None
+        if kept and os.path.exists(kept):
+            files_dir = os.path.join(self.directory, DEAD_LETTER_FILES_DIR)
+            os.makedirs(files_dir, exist_ok=True)
+            shutil.copyfile(kept, os.path.join(files_dir, os.path.basename(kept)))
+        line = dict(record, error=str(error), dead_at=time.time())
+        with open(os.path.join(self.directory, DEAD_LETTER_FILE), 'ab') as f:
+            f.write(json.dumps(line, default=str).encode('utf-8') + b'\n')
+            f.flush()
+            os.fsync(f.fileno())
+        with self._cond:
+            self._dead_letters += 1
+
+    @staticmethod
+    def _remove_kept_files(slot, batch, still_needed):
+        """Delete journal copies of images once their complaints are stored."""
+        for record in batch:
+            image_path = record['item'].get('image_path')
+            if not image_path or os.path.basename(image_path) in still_needed:
+                continue
+            kept = os.path.join(slot.files_dir, os.path.basename(image_path))
+            if os.path.exists(kept):
+                os.remove(kept)
+
+    # ----------------------------------------
+    # Metrics
+    # ----------------------------------------
+    def stats(self):
+        """Queue depth, lag of the oldest unstored record and counters."""
+        if self._pid != os.getpid():
+            return {'running': False}
+        with self._cond:
+            slots = [self._slot] + self._adopted
+            depth = sum(len(slot.pending) for slot in slots)
+            oldest = min((slot.pending[0]['received_at'] for slot in slots if slot.pending),
+                         default=None)
+            return {
+                'running': True,
+                'depth': depth,
+                'lag_seconds': round(time.time() - oldest, 3) if oldest else 0.0,
+                'appended': self._appended,
+                'flushed': self._flushed,
+                'fsyncs': self._fsyncs,
+                'flush_failures': self._failures,
+                'dead_letters': self._dead_letters,
+                'last_error': self._last_error,
+                'last_flush_at': self._last_flush_at,
+                'slots': len(slots),
+            }
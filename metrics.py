@@ -0,0 +1,456 @@
+"""
+============================================
+Request and Query Metrics
+Web Based Smart Waste Management System
+============================================
+Shows where the time of a slow page goes: waiting for a
+pooled connection, running SQL, rendering the template or
+receiving and storing an upload. Every request and every SQL
+statement is timed and counted in Prometheus histograms,
+served as text at /metrics:
+
+  http_requests_total             requests by endpoint and status
+  http_request_duration_seconds   time to answer, by endpoint
+  http_request_db_seconds         pool wait + SQL time per request
+  db_pool_checkout_seconds        time to borrow a connection
+  db_query_duration_seconds       per statement type, including
+                                  reading the rows
+  template_render_seconds         Jinja render time per template
+  upload_bytes                    size of each uploaded image
+  upload_receive_seconds          receiving + hashing an upload
+  upload_store_seconds            moving it to its final path
+
+plus the counters of the connection pool, write journal,
+image worker and live event broker.
+
+A query slower than slow_query_ms is printed with its SQL and
+parameters; a request slower than slow_request_ms is printed
+with its time split into pool wait, SQL, rendering and upload,
+and its slowest query.
+
+Recording a value costs a bucket lookup and a short lock, so
+the metrics stay on in production. Label values are route
+names, statement types and template names only, never URLs or
+SQL text, so the number of series stays small. Streamed
+responses (exports, /admin/events) are timed until the
+response starts. Every worker process keeps its own numbers.
+============================================
+"""
+
+import bisect
+import math
+import threading
+import time
+
+# Latency buckets (seconds) of the timing histograms
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Upload size buckets (bytes)
+SIZE_BUCKETS = (16384, 65536, 262144, 1048576, 2097152, 5242880, 10485760)
+
+# Queries / requests slower than this (milliseconds) are logged; 0 turns the log off
+SLOW_QUERY_MS = 200
+SLOW_REQUEST_MS = 1000
+
+# Longest SQL text and parameter list printed in the slow log
+MAX_LOGGED_SQL = 1000
+MAX_LOGGED_PARAMS = 300
+
+# Statement types counted separately; others are counted as OTHER
+STATEMENT_TYPES = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+# ============================================
+# METRIC TYPES
+# ============================================
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+               for value in labels.values())
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + '}'
+
+
+class Counter:
+    """A total that only goes up, per combination of label values."""
+
+    kind = 'counter'
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def families(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        samples = [(self.name, dict(zip(self.labels, key)), value) for key, value in items]
+        return [(self.name, self.kind, self.help, samples)]
+
+
+class Histogram:
+    """Observations counted in cumulative buckets, per combination of label values."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [count per bucket..., count above, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def families(self):
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        samples = []
+        for key, series in items:
+            labels = dict(zip(self.labels, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), series):
+                cumulative += count
+                samples.append((f"{self.name}_bucket", dict(labels, le=_format_value(float(bound))),
+                                cumulative))
+            samples.append((f"{self.name}_sum", labels, round(series[-1], 6)))
+            samples.append((f"{self.name}_count", labels, cumulative))
+        return [(self.name, self.kind, self.help, samples)]
+
+
+class StatsGauges:
+    """
+    Exposes the numbers of a stats() dict (db_pool, journal, ...)
+    read at scrape time: keys listed in `counters` as counters, the
+    rest as gauges. Text values are skipped.
+    """
+
+    def __init__(self, prefix, help_text, read_stats, counters=()):
+        self.prefix = prefix
+        self.help = help_text
+        self.read_stats = read_stats
+        self.counters = counters
+
+    def families(self):
+        families = []
+        for key, value in self.read_stats().items():
+            if isinstance(value, bool):
+                value = int(value)
+            if not isinstance(value, (int, float)):
+                continue
+            name = f"{self.prefix}_{key}"
+            kind = 'gauge'
+            if key in self.counters:
+                kind = 'counter'
+                name = name if name.endswith('_total') else f"{name}_total"
+            families.append((name, kind, f"{self.help}: {key}", [(name, {}, value)]))
+        return families
+
+
+class Registry:
+    """The metrics served at /metrics, in registration order."""
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Everything in the Prometheus text exposition format."""
+        lines = []
+        for metric in self.metrics:
+            for name, kind, help_text, samples in metric.families():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                lines.extend(f"{sample}{_format_labels(labels)} {_format_value(value)}"
+                             for sample, labels, value in samples)
+        return '\n'.join(lines) + '\n'
+
+
+# ============================================
+# TIMED CONNECTIONS AND CURSORS
+# ============================================
+
+class TimedCursor:
+    """
+    Wraps a mysql.connector cursor. The time of each statement is
+    its execute() plus the fetches that read its rows; it is
+    reported once the rows are read, the next statement starts or
+    the cursor is closed. Everything else is passed through.
+    """
+
+    def __init__(self, cursor, on_query):
+        self._cursor = cursor
+        self._on_query = on_query
+        self._pending = None  # [sql, params, seconds] of the last statement
+
+    def report(self):
+        if self._pending is not None:
+            operation, params, seconds = self._pending
+            self._pending = None
+            self._on_query(operation, params, seconds)
+
+    def _run(self, method, operation, params, *args, **kwargs):
+        self.report()
+        started = time.perf_counter()
+        try:
+            return method(operation, params, *args, **kwargs)
+        finally:
+            self._pending = [operation, params, time.perf_counter() - started]
+
+    def _fetch(self, method, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            if self._pending is not None:
+                self._pending[2] += time.perf_counter() - started
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        return self._run(self._cursor.execute, operation, params, *args, **kwargs)
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        return self._run(self._cursor.executemany, operation, seq_params, *args, **kwargs)
+
+    def fetchall(self):
+        rows = self._fetch(self._cursor.fetchall)
+        self.report()
+        return rows
+
+    def fetchmany(self, *args, **kwargs):
+        rows = self._fetch(self._cursor.fetchmany, *args, **kwargs)
+        if not rows:
+            self.report()
+        return rows
+
+    def fetchone(self):
+        row = self._fetch(self._cursor.fetchone)
+        if row is None:
+            self.report()
+        return row
+
+    def close(self):
+        self.report()
+        return self._cursor.close()
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class TimedConnection:
+    """
+    Wraps a mysql.connector connection so its cursors are timed.
+    Call finish() when giving the connection back, to report
+    statements whose cursor was never closed.
+    """
+
+    def __init__(self, connection, on_query):
+        self._connection = connection
+        self._on_query = on_query
+        self._cursors = []
+
+    def cursor(self, *args, **kwargs):
+        cursor = TimedCursor(self._connection.cursor(*args, **kwargs), self._on_query)
+        self._cursors.append(cursor)
+        return cursor
+
+    def finish(self):
+        for cursor in self._cursors:
+            cursor.report()
+        self._cursors = []
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+
+def statement_type(operation):
+    """SELECT / INSERT / UPDATE / DELETE / REPLACE, or OTHER."""
+    words = operation.split(None, 1)
+    keyword = words[0].upper() if words else ''
+    return keyword if keyword in STATEMENT_TYPES else 'OTHER'
+
+
+def format_sql(operation):
+    """SQL on one line, shortened for the log."""
+    text = ' '.join(operation.split())
+    return text if len(text) <= MAX_LOGGED_SQL else text[:MAX_LOGGED_SQL] + '...'
+
+
+def format_params(params):
+    text = repr(params)
+    return text if len(text) <= MAX_LOGGED_PARAMS else text[:MAX_LOGGED_PARAMS] + '...'
+
+
+# ============================================
+# APPLICATION METRICS
+# ============================================
+
+class AppMetrics:
+    """
+    The app's histograms and counters, and the per-request time
+    breakdown used by the slow request log. Thread-safe; the
+    breakdown of the request being served is kept per thread.
+    """
+
+    def __init__(self, slow_query_ms=SLOW_QUERY_MS, slow_request_ms=SLOW_REQUEST_MS):
+        self.slow_query_ms = slow_query_ms
+        self.slow_request_ms = slow_request_ms
+        self._local = threading.local()
+
+        registry = self.registry = Registry()
+        self.requests = registry.register(Counter(
+            'http_requests_total', 'HTTP requests answered', ('method', 'endpoint', 'status')))
+        self.request_seconds = registry.register(Histogram(
+            'http_request_duration_seconds', 'Time to answer a request', ('method', 'endpoint')))
+        self.request_db_seconds = registry.register(Histogram(
+            'http_request_db_seconds', 'Pool wait plus SQL time per request', ('endpoint',)))
+        self.slow_requests = registry.register(Counter(
+            'http_slow_requests_total', 'Requests slower than the slow request limit', ('endpoint',)))
+        self.checkout_seconds = registry.register(Histogram(
+            'db_pool_checkout_seconds', 'Time to borrow a pooled database connection'))
+        self.query_seconds = registry.register(Histogram(
+            'db_query_duration_seconds', 'SQL statement time including reading the rows', ('statement',)))
+        self.slow_queries = registry.register(Counter(
+            'db_slow_queries_total', 'SQL statements slower than the slow query limit', ('statement',)))
+        self.render_seconds = registry.register(Histogram(
+            'template_render_seconds', 'Jinja template render time', ('template',)))
+        self.upload_bytes = registry.register(Histogram(
+            'upload_bytes', 'Size of uploaded images', buckets=SIZE_BUCKETS))
+        self.upload_receive_seconds = registry.register(Histogram(
+            'upload_receive_seconds', 'Time to receive and hash a multipart upload'))
+        self.upload_store_seconds = registry.register(Histogram(
+            'upload_store_seconds', 'Time to move an upload to its content-addressed path'))
+
+    def add_stats(self, prefix, help_text, read_stats, counters=()):
+        """Also expose the numbers of a component's stats() dict."""
+        self.registry.register(StatsGauges(prefix, help_text, read_stats, counters))
+
+    def render(self):
+        return self.registry.render()
+
+    def _current(self):
+        return getattr(self._local, 'request', None)
+
+    # ----------------------------------------
+    # Requests
+    # ----------------------------------------
+    def start_request(self):
+        self._local.request = {
+            'started': time.perf_counter(), 'checkout': 0.0, 'db': 0.0, 'queries': 0,
+            'render': 0.0, 'upload': 0.0, 'slowest': None,
+        }
+        self._local.renders = []
+
+    def finish_request(self, method, endpoint, status, path):
+        current = self._current()
+        self._local.request = None
+        if current is None:
+            return
+        seconds = time.perf_counter() - current['started']
+        self.requests.inc(method, endpoint, str(status))
+        self.request_seconds.observe(seconds, method, endpoint)
+        self.request_db_seconds.observe(current['checkout'] + current['db'], endpoint)
+
+        if self.slow_request_ms and seconds * 1000 >= self.slow_request_ms:
+            self.slow_requests.inc(endpoint)
+            message = (f"Slow request: {method} {path} {status} in {seconds * 1000:.0f} ms "
+                       f"(pool wait {current['checkout'] * 1000:.0f} ms, "
+                       f"SQL {current['db'] * 1000:.0f} ms in {current['queries']} queries, "
+                       f"render {current['render'] * 1000:.0f} ms, "
+                       f"upload {current['upload'] * 1000:.0f} ms)")
+            if current['slowest']:
+                query_seconds, operation, params = current['slowest']
+                message += (f"; slowest query {query_seconds * 1000:.0f} ms: "
+                            f"{format_sql(operation)} params={format_params(params)}")
+            print(message)
+
+    # ----------------------------------------
+    # Database
+    # ----------------------------------------
+    def instrument(self, connection):
+        """Wrap a pooled connection so its statements are timed."""
+        return TimedConnection(connection, self.observe_query)
+
+    def observe_checkout(self, seconds):
+        self.checkout_seconds.observe(seconds)
+        current = self._current()
+        if current is not None:
+            current['checkout'] += seconds
+
+    def observe_query(self, operation, params, seconds):
+        statement = statement_type(operation)
+        self.query_seconds.observe(seconds, statement)
+        current = self._current()
+        if current is not None:
+            current['db'] += seconds
+            current['queries'] += 1
+            if current['slowest'] is None or seconds > current['slowest'][0]:
+                current['slowest'] = (seconds, operation, params)
+        if self.slow_query_ms and seconds * 1000 >= self.slow_query_ms:
+            self.slow_queries.inc(statement)
+            print(f"Slow query ({seconds * 1000:.0f} ms): {format_sql(operation)} "
+                  f"params={format_params(params)}")
+
+    # ----------------------------------------
+    # Templates and uploads
+    # ----------------------------------------
+    def render_started(self):
+        renders = getattr(self._local, 'renders', None)
+        if renders is None:
+            renders = self._local.renders = []
+        renders.append(time.perf_counter())
+
+    def render_finished(self, template_name):
+        renders = getattr(self._local, 'renders', None)
+        if not renders:
+            return
+        seconds = time.perf_counter() - renders.pop()
+        self.render_seconds.observe(seconds, template_name or 'string')
+        current = self._current()
+        if current is not None and not renders:
+            current['render'] += seconds  # Only the outermost render counts
+
+    def observe_upload_received(self, seconds, sizes):
+        """A multipart request was received; `sizes` are its file sizes."""
+        self.upload_receive_seconds.observe(seconds)
+        for size in sizes:
+            self.upload_bytes.observe(size)
+        current = self._current()
+        if current is not None:
+            current['upload'] += seconds
+
+    def observe_upload_stored(self, seconds):
+        self.upload_store_seconds.observe(seconds)
+        current = self._current()
+        if current is not None:
+            current['upload'] += seconds
@@ -0,0 +1,587 @@
+"""
+============================================
+Versioned Schema Migrations
+Web Based Smart Waste Management System
+============================================
+Replaces the CREATE TABLE that used to run on every start.
+Each migration has a version number and runs exactly once;
+applied versions are recorded in the schema_migrations table.
+
+Large tables are migrated in small batches (by id range),
+each committed on its own, so rows are never locked for
+more than a moment. Every migration checks what already
+exists first, so an interrupted run can simply be started
+again and a database created from waste_management.sql is
+recognised as up to date.
+
+Run from the command line:
+    python migrations.py              # apply pending migrations
+    python migrations.py --status     # list applied versions
+    python migrations.py --batch-size 2000
+    python migrations.py --rebuild-analytics   # recompute rollups
+============================================
+"""
+
+import argparse
+import time
+
+import mysql.connector
+
+import analytics
+import archive
+import geo
+
+# Name used with GET_LOCK() so only one process migrates at a time
+MIGRATION_LOCK_NAME = 'waste_management_migrations'
+
+# Rows updated per batch during backfills
+DEFAULT_BATCH_SIZE = 5000
+
+# Seconds to sleep between batches, giving other queries room
+DEFAULT_BATCH_PAUSE = 0.05
+
+# Numeric latitude / longitude, as accepted by the backfill
+COORDINATE_PATTERN = r'^-?[0-9]{1,3}(\.[0-9]+)?$'
+
+# Complaints without GPS coordinates get this point so that the
+# location column can be NOT NULL (required for a SPATIAL index).
+# Their latitude / longitude stay NULL.
+NO_LOCATION_WKT = 'POINT(0 0)'
+
+
+# ============================================
+# SCHEMA INSPECTION HELPERS
+# ============================================
+
+def column_info(cursor, table, column):
+    """Return (data_type, is_nullable) for a column, or None."""
+    cursor.execute("""
+        SELECT DATA_TYPE, IS_NULLABLE FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s
+    """, (table, column))
+    row = cursor.fetchone()
+    return (row[0].lower(), row[1] == 'YES') if row else None
+
+
+def index_exists(cursor, table, index):
+    """Check whether an index exists on a table."""
+    cursor.execute("""
+        SELECT 1 FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s
+        LIMIT 1
+    """, (table, index))
+    return cursor.fetchone() is not None
+
+
+def table_exists(cursor, table):
+    """Check whether a table exists in the current database."""
+    cursor.execute("""
+        SELECT 1 FROM information_schema.TABLES
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+    """, (table,))
+    return cursor.fetchone() is not None
+
+
+def backfill_in_batches(connection, table, update_sql, params=(), batch_size=DEFAULT_BATCH_SIZE,
+                        pause=DEFAULT_BATCH_PAUSE):
+    """
+    Run `update_sql` over consecutive id ranges of `table`.
+    The last two placeholders of update_sql must be the range,
+    e.g. "WHERE id BETWEEN %s AND %s". Each batch is its own
+    transaction so locks are held only briefly.
+    """
+    cursor = connection.cursor()
+    cursor.execute(f"SELECT MIN(id), MAX(id) FROM {table}")
+    low, high = cursor.fetchone()
+    if low is None:
+        cursor.close()
+        return 0
+
+    updated = 0
+    for start in range(low, high + 1, batch_size):
+        end = start + batch_size - 1
+        cursor.execute(update_sql, tuple(params) + (start, end))
+        updated += cursor.rowcount
+        connection.commit()
+        print(f"   ... {table}: ids {start}-{min(end, high)} of {high}")
+        if pause:
+            time.sleep(pause)
+    cursor.close()
+    return updated
+
+
+# ============================================
+# MIGRATIONS
+# ============================================
+
+def migration_001_create_complaints(connection, batch_size, pause):
+    """Create the original complaints table (no-op if it exists)."""
+    cursor = connection.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS complaints (
+            id INT PRIMARY KEY AUTO_INCREMENT,
+            name VARCHAR(100) NOT NULL,
+            area VARCHAR(100) NOT NULL,
+            description TEXT,
+            latitude VARCHAR(50),
+            longitude VARCHAR(50),
+            image_path VARCHAR(255),
+            status VARCHAR(50) DEFAULT 'Pending',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.close()
+
+
+def migration_002_filter_indexes(connection, batch_size, pause):
+    """
+    Secondary indexes for the list, export and dashboard queries.
+    Built online (LOCK=NONE) so inserts continue during the build.
+    """
+    cursor = connection.cursor()
+    indexes = {
+        'idx_created': '(created_at)',
+        'idx_status_created': '(status, created_at)',
+        'idx_area_created': '(area, created_at)',
+    }
+    for name, columns in indexes.items():
+        if not index_exists(cursor, 'complaints', name):
+            print(f"   Adding index {name} {columns}")
+            cursor.execute(f"ALTER TABLE complaints ADD INDEX {name} {columns}, "
+                           f"ALGORITHM=INPLACE, LOCK=NONE")
+    cursor.close()
+
+
+def migration_003_typed_coordinates(connection, batch_size, pause):
+    """
+    Move latitude / longitude from VARCHAR(50) to DECIMAL(10,7)
+    and add a POINT column (SRID 4326) with a SPATIAL index.
+
+    Steps (each skipped if already done):
+      1. add lat_decimal / lng_decimal / location columns (instant)
+      2. backfill them in id batches
+      3. swap the new columns in place of the old ones (online rebuild)
+      4. make location NOT NULL and add the SPATIAL index
+    """
+    cursor = connection.cursor()
+    latitude = column_info(cursor, 'complaints', 'latitude')
+    old_text_columns = latitude is not None and latitude[0] == 'varchar'
+
+    # Step 1: new columns next to the old ones
+    if old_text_columns and column_info(cursor, 'complaints', 'lat_decimal') is None:
+        print("   Adding lat_decimal / lng_decimal columns")
+        cursor.execute("""
+            ALTER TABLE complaints
+                ADD COLUMN lat_decimal DECIMAL(10,7) NULL,
+                ADD COLUMN lng_decimal DECIMAL(10,7) NULL
+        """)
+    if column_info(cursor, 'complaints', 'location') is None:
+        print("   Adding location POINT column")
+        cursor.execute("ALTER TABLE complaints ADD COLUMN location POINT SRID 4326 NULL")
+
+    # Step 2: batched backfill of rows that have no location yet
+    if old_text_columns:
+        print("   Backfilling typed coordinates")
+        lat_column, lng_column = 'lat_decimal', 'lng_decimal'
+        backfill_in_batches(connection, 'complaints', f"""
+            UPDATE complaints SET
+                lat_decimal = CASE WHEN TRIM(latitude) REGEXP %s
+                                   THEN CAST(TRIM(latitude) AS DECIMAL(10,7)) END,
+                lat_decimal = IF(lat_decimal BETWEEN -90 AND 90, lat_decimal, NULL),
+                lng_decimal = CASE WHEN TRIM(longitude) REGEXP %s
+                                   THEN CAST(TRIM(longitude) AS DECIMAL(10,7)) END,
+                lng_decimal = IF(lng_decimal BETWEEN -180 AND 180, lng_decimal, NULL),
+                location = {location_expression(lat_column, lng_column)}
+            WHERE id BETWEEN %s AND %s AND location IS NULL
+        """, (COORDINATE_PATTERN, COORDINATE_PATTERN), batch_size, pause)
+    else:
+        backfill_in_batches(connection, 'complaints', f"""
+            UPDATE complaints SET location = {location_expression('latitude', 'longitude')}
+            WHERE id BETWEEN %s AND %s AND location IS NULL
+        """, (), batch_size, pause)
+
+    # Step 3: swap columns (in-place rebuild, reads and writes continue)
+    if old_text_columns:
+        print("   Replacing VARCHAR coordinates with DECIMAL columns")
+        cursor.execute("""
+            ALTER TABLE complaints
+                DROP COLUMN latitude,
+                DROP COLUMN longitude,
+                RENAME COLUMN lat_decimal TO latitude,
+                RENAME COLUMN lng_decimal TO longitude,
+                ALGORITHM=INPLACE, LOCK=NONE
+        """)
+
+    # Step 4: NOT NULL location + SPATIAL index
+    if column_info(cursor, 'complaints', 'location')[1]:
+        # Catch rows inserted by older code while the backfill ran
+        backfill_in_batches(connection, 'complaints', f"""
+            UPDATE complaints SET location = {location_expression('latitude', 'longitude')}
+            WHERE id BETWEEN %s AND %s AND location IS NULL
+        """, (), batch_size, 0)
+        print("   Making location NOT NULL")
+        cursor.execute("ALTER TABLE complaints MODIFY location POINT NOT NULL SRID 4326, "
+                       "ALGORITHM=INPLACE, LOCK=NONE")
+    if not index_exists(cursor, 'complaints', 'idx_location'):
+        # Spatial indexes cannot be built with LOCK=NONE; writes wait
+        # for the build, reads continue
+        print("   Adding SPATIAL index idx_location")
+        cursor.execute("ALTER TABLE complaints ADD SPATIAL INDEX idx_location (location), "
+                       "ALGORITHM=INPLACE, LOCK=SHARED")
+    cursor.close()
+
+
+def location_expression(lat_column, lng_column):
+    """SQL expression building the location POINT from two columns."""
+    return (
+        f"IF({lat_column} IS NULL OR {lng_column} IS NULL, "
+        f"ST_PointFromText('{NO_LOCATION_WKT}', 4326), "
+        f"ST_PointFromText(CONCAT('POINT(', {lat_column}, ' ', {lng_column}, ')'), "
+        f"4326, 'axis-order=lat-long'))"
+    )
+
+
+def rebuild_clusters(connection, batch_size=DEFAULT_BATCH_SIZE, pause=DEFAULT_BATCH_PAUSE):
+    """
+    Recompute the map cluster counts from the complaints table.
+    Used by migration 004 and by `python migrations.py --rebuild-clusters`.
+    """
+    cursor = connection.cursor()
+    cursor.execute("TRUNCATE TABLE complaint_clusters")
+    cursor.close()
+    backfill_in_batches(connection, 'complaints',
+                        geo.cluster_adjust_sql("c.id BETWEEN %s AND %s", 1),
+                        (), batch_size, pause)
+
+
+def migration_004_complaint_clusters(connection, batch_size, pause):
+    """
+    Precomputed map cluster counts per (level, status, tile x, tile y).
+    See geo.py for how cells are computed and maintained.
+    """
+    cursor = connection.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS complaint_clusters (
+            level TINYINT NOT NULL,
+            status VARCHAR(50) NOT NULL,
+            x INT NOT NULL,
+            y INT NOT NULL,
+            count INT NOT NULL DEFAULT 0,
+            sum_lat DOUBLE NOT NULL DEFAULT 0,
+            sum_lng DOUBLE NOT NULL DEFAULT 0,
+            PRIMARY KEY (level, status, x, y)
+        )
+    """)
+    cursor.close()
+    print("   Computing cluster counts")
+    rebuild_clusters(connection, batch_size, pause)
+
+
+def migration_005_report_count(connection, batch_size, pause):
+    """
+    Number of citizen reports merged into a complaint
+    (1 = reported once). Added instantly, no table rebuild.
+    """
+    cursor = connection.cursor()
+    if column_info(cursor, 'complaints', 'report_count') is None:
+        print("   Adding report_count column")
+        cursor.execute("ALTER TABLE complaints ADD COLUMN report_count INT NOT NULL DEFAULT 1")
+    cursor.close()
+
+
+def migration_006_idempotency_keys(connection, batch_size, pause):
+    """
+    Client-supplied idempotency keys for batch submissions, so a
+    retried sync returns the original complaint IDs instead of
+    inserting again. Keys of reports merged into an existing
+    complaint are kept in merged_reports.
+    """
+    cursor = connection.cursor()
+    if column_info(cursor, 'complaints', 'idempotency_key') is None:
+        print("   Adding idempotency_key column")
+        cursor.execute("""
+            ALTER TABLE complaints
+                ADD COLUMN idempotency_key VARCHAR(64) NULL,
+                ADD UNIQUE INDEX idx_idempotency_key (idempotency_key),
+                ALGORITHM=INPLACE, LOCK=NONE
+        """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS merged_reports (
+            idempotency_key VARCHAR(64) PRIMARY KEY,
+            complaint_id INT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.close()
+
+
+def migration_007_image_blobs(connection, batch_size, pause):
+    """
+    Reference counts for content-addressed image files (see
+    storage.py). Images uploaded before this are counted too, so
+    a file shared by several complaints is kept until the last
+    of them is deleted.
+    """
+    cursor = connection.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS image_blobs (
+            path VARCHAR(255) PRIMARY KEY,
+            ref_count INT NOT NULL DEFAULT 1,
+            size_bytes BIGINT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    print("   Counting existing images")
+    cursor.execute("""
+        INSERT IGNORE INTO image_blobs (path, ref_count)
+        SELECT image_path, COUNT(*) FROM complaints
+        WHERE image_path IS NOT NULL AND image_path <> ''
+        GROUP BY image_path
+    """)
+    cursor.close()
+
+
+def migration_008_data_version(connection, batch_size, pause):
+    """
+    One-row change counter bumped by every write transaction and
+    used for ETag / Last-Modified on the JSON API (see http_cache.py).
+    """
+    cursor = connection.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS data_version (
+            id TINYINT PRIMARY KEY,
+            version BIGINT NOT NULL DEFAULT 0,
+            changed_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6)
+        )
+    """)
+    cursor.execute("INSERT IGNORE INTO data_version (id, version) VALUES (1, 0)")
+    cursor.close()
+
+
+def rebuild_analytics(connection, batch_size=DEFAULT_BATCH_SIZE, pause=DEFAULT_BATCH_PAUSE):
+    """
+    Recompute the analytics rollups from the complaints table and
+    the archive (archived complaints stay counted).
+    Used by migration 009 and by `python migrations.py --rebuild-analytics`.
+    """
+    cursor = connection.cursor()
+    cursor.execute("TRUNCATE TABLE complaint_daily_stats")
+    cursor.execute("TRUNCATE TABLE cleaning_daily_stats")
+    tables = ['complaints']
+    if table_exists(cursor, 'complaints_archive'):
+        tables.append('complaints_archive')
+    cursor.close()
+    for table in tables:
+        backfill_in_batches(connection, table,
+                            analytics.daily_adjust_sql("c.id BETWEEN %s AND %s", 1, table),
+                            (), batch_size, pause)
+        backfill_in_batches(connection, table,
+                            analytics.cleaning_adjust_sql("c.id BETWEEN %s AND %s", 1, table),
+                            (), batch_size, pause)
+
+
+def migration_009_analytics_rollups(connection, batch_size, pause):
+    """
+    cleaned_at (set when a complaint is marked Cleaned), the daily
+    analytics rollups (see analytics.py) and an index for reading
+    the busiest map cells. Complaints cleaned before this have no
+    cleaned_at and are left out of the time-to-clean figures.
+    """
+    cursor = connection.cursor()
+    if column_info(cursor, 'complaints', 'cleaned_at') is None:
+        print("   Adding cleaned_at column")
+        cursor.execute("ALTER TABLE complaints ADD COLUMN cleaned_at TIMESTAMP NULL DEFAULT NULL")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS complaint_daily_stats (
+            day DATE NOT NULL,
+            area VARCHAR(100) NOT NULL,
+            status VARCHAR(50) NOT NULL,
+            complaints INT NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, area, status)
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS cleaning_daily_stats (
+            day DATE NOT NULL,
+            area VARCHAR(100) NOT NULL,
+            cleaned INT NOT NULL DEFAULT 0,
+            clean_seconds BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, area)
+        )
+    """)
+    if not index_exists(cursor, 'complaint_clusters', 'idx_level_status_count'):
+        print("   Adding index idx_level_status_count")
+        cursor.execute("ALTER TABLE complaint_clusters ADD INDEX idx_level_status_count "
+                       "(level, status, count), ALGORITHM=INPLACE, LOCK=NONE")
+    cursor.close()
+    print("   Computing analytics rollups")
+    rebuild_analytics(connection, batch_size, pause)
+
+
+def migration_010_fulltext_search(connection, batch_size, pause):
+    """
+    FULLTEXT index on (area, description) for /api/search.
+    The first FULLTEXT index on a table rebuilds it once to add the
+    hidden FTS_DOC_ID column; reads continue, writes wait.
+    """
+    cursor = connection.cursor()
+    if not index_exists(cursor, 'complaints', 'idx_fulltext'):
+        print("   Adding FULLTEXT index idx_fulltext (area, description)")
+        cursor.execute("ALTER TABLE complaints ADD FULLTEXT INDEX idx_fulltext (area, description), "
+                       "ALGORITHM=INPLACE, LOCK=SHARED")
+    cursor.close()
+
+
+def migration_011_complaints_archive(connection, batch_size, pause):
+    """
+    complaints_archive, where archive.py moves complaints cleaned
+    long ago (compressed, partitioned by year), and an index for
+    finding them by cleaning time.
+    """
+    cursor = connection.cursor()
+    if not table_exists(cursor, 'complaints_archive'):
+        print("   Creating complaints_archive")
+        cursor.execute(archive.create_table_sql(time.localtime().tm_year + 1))
+    if not index_exists(cursor, 'complaints', 'idx_status_cleaned'):
+        print("   Adding index idx_status_cleaned")
+        cursor.execute("ALTER TABLE complaints ADD INDEX idx_status_cleaned (status, cleaned_at), "
+                       "ALGORITHM=INPLACE, LOCK=NONE")
+    cursor.close()
+
+
+def migration_012_complaint_events(connection, batch_size, pause):
+    """
+    complaint_events, the live dashboard events shared by all
+    worker processes (see events.py). The app keeps only the
+    newest rows.
+    """
+    cursor = connection.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS complaint_events (
+            id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            event_type VARCHAR(16) NOT NULL,
+            data TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.close()
+
+
+# Ordered list of (version, name, function)
+MIGRATIONS = [
+    (1, 'create_complaints', migration_001_create_complaints),
+    (2, 'filter_indexes', migration_002_filter_indexes),
+    (3, 'typed_coordinates', migration_003_typed_coordinates),
+    (4, 'complaint_clusters', migration_004_complaint_clusters),
+    (5, 'report_count', migration_005_report_count),
+    (6, 'idempotency_keys', migration_006_idempotency_keys),
+    (7, 'image_blobs', migration_007_image_blobs),
+    (8, 'data_version', migration_008_data_version),
+    (9, 'analytics_rollups', migration_009_analytics_rollups),
+    (10, 'fulltext_search', migration_010_fulltext_search),
+    (11, 'complaints_archive', migration_011_complaints_archive),
+    (12, 'complaint_events', migration_012_complaint_events),
+]
+
+
+# ============================================
+# RUNNER
+# ============================================
+
+def applied_versions(cursor):
+    """Return the set of migration versions already applied."""
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def run_migrations(db_config, batch_size=DEFAULT_BATCH_SIZE, pause=DEFAULT_BATCH_PAUSE):
+    """
+    Create the database if needed and apply pending migrations.
+    Returns True on success, False on a database error.
+    """
+    database = db_config['database']
+    server_config = {key: value for key, value in db_config.items() if key != 'database'}
+
+    try:
+        connection = mysql.connector.connect(**server_config)
+        cursor = connection.cursor()
+        cursor.execute(f"CREATE DATABASE IF NOT EXISTS {database}")
+        cursor.execute(f"USE {database}")
+
+        # Only one process may migrate at a time
+        cursor.execute("SELECT GET_LOCK(%s, 300)", (MIGRATION_LOCK_NAME,))
+        if cursor.fetchone()[0] != 1:
+            print("❌ Could not acquire the migration lock")
+            return False
+
+        try:
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                    version INT PRIMARY KEY,
+                    name VARCHAR(100) NOT NULL,
+                    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            done = applied_versions(cursor)
+
+            for version, name, migrate in MIGRATIONS:
+                if version in done:
+                    continue
+                print(f"➡️  Applying migration {version:03d}_{name}")
+                started = time.monotonic()
+                migrate(connection, batch_size, pause)
+                cursor.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                               (version, name))
+                connection.commit()
+                print(f"✅ Migration {version:03d}_{name} applied in {time.monotonic() - started:.1f}s")
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (MIGRATION_LOCK_NAME,))
+            cursor.fetchone()
+
+        cursor.close()
+        connection.close()
+        return True
+    except mysql.connector.Error as err:
+        print(f"❌ Migration error: {err}")
+        return False
+
+
+def show_status(db_config):
+    """Print which migrations are applied and which are pending."""
+    connection = mysql.connector.connect(**db_config)
+    cursor = connection.cursor()
+    done = applied_versions(cursor) if table_exists(cursor, 'schema_migrations') else set()
+    for version, name, _ in MIGRATIONS:
+        state = 'applied' if version in done else 'pending'
+        print(f"{version:03d}_{name:<30} {state}")
+    cursor.close()
+    connection.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Apply database schema migrations.')
+    parser.add_argument('--status', action='store_true', help='list applied and pending migrations')
+    parser.add_argument('--rebuild-clusters', action='store_true',
+                        help='recompute the map cluster counts from the complaints table')
+    parser.add_argument('--rebuild-analytics', action='store_true',
+                        help='recompute the analytics rollups from the complaints and archive tables')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help='rows per backfill batch')
+    parser.add_argument('--pause', type=float, default=DEFAULT_BATCH_PAUSE,
+                        help='seconds to sleep between batches')
+    args = parser.parse_args()
+
+    from app import DB_CONFIG
+
+    if args.status:
+        show_status(DB_CONFIG)
+    elif args.rebuild_clusters:
+        connection = mysql.connector.connect(**DB_CONFIG)
+        rebuild_clusters(connection, args.batch_size, args.pause)
+        connection.close()
+    elif args.rebuild_analytics:
+        connection = mysql.connector.connect(**DB_CONFIG)
+        rebuild_analytics(connection, args.batch_size, args.pause)
+        connection.close()
+    else:
+        raise SystemExit(0 if run_migrations(DB_CONFIG, args.batch_size, args.pause) else 1)
@@ -0,0 +1,294 @@
+"""
+============================================
+Collection Route Planning
+Web Based Smart Waste Management System
+============================================
+Plans truck routes over the pending complaints, instead of
+exporting them and planning by hand in a spreadsheet.
+
+Given a depot, a number of vehicles and a capacity (the most
+complaints one vehicle can collect on a trip):
+
+  1. Distances: a vectorised NumPy haversine matrix (float32,
+     computed a block of rows at a time) over the depot and
+     every stop.
+  2. Cluster first: stops are swept by their angle around the
+     depot and cut into one group per vehicle, so each truck
+     works its own sector of the city.
+  3. Route second: each group is ordered by nearest neighbour
+     from the depot, then improved with 2-opt (reversing a
+     stretch of the route whenever that makes it shorter).
+
+Routes start and end at the depot. This is a heuristic: it is
+fast (a few thousand stops in about a second) and usually
+close to, but not guaranteed to be, the shortest plan.
+
+Command line (uses the database settings from app.py):
+    python routing.py --depot 25.6093,85.1376 --vehicles 3 --capacity 40
+    python routing.py --depot 25.6093,85.1376 --area Kankarbagh --json
+
+Benchmark: python bench/bench_routing.py
+============================================
+"""
+
+import math
+import time
+
+import numpy as np
+
+EARTH_RADIUS_M = 6371008.8
+
+# Most stops planned in one request (the distance matrix of
+# 2000 stops takes 16 MB)
+MAX_ROUTE_STOPS = 2000
+
+# Matrix rows computed at a time: the float64 temporaries are
+# MATRIX_ROW_BLOCK x N instead of N x N
+MATRIX_ROW_BLOCK = 256
+
+# Most vehicles in one plan
+MAX_VEHICLES = 100
+
+# Seconds allowed for 2-opt improvement over all routes
+DEFAULT_TIME_LIMIT = 2.0
+
+# 2-opt stops after this many passes without reaching the time limit
+MAX_TWO_OPT_PASSES = 50
+
+PENDING_STOPS_QUERY = """
+    SELECT id, area, latitude, longitude, report_count
+    FROM complaints
+    WHERE status = 'Pending' AND latitude IS NOT NULL AND longitude IS NOT NULL
+"""
+
+
+def load_pending_stops(cursor, areas=None, limit=MAX_ROUTE_STOPS):
+    """
+    Pending complaints with GPS coordinates, optionally only in
+    `areas`. Returns at most limit + 1 rows so the caller can tell
+    when there are too many. Works with a dictionary cursor.
+    """
+    query = PENDING_STOPS_QUERY
+    params = []
+    if areas:
+        query += f" AND area IN ({', '.join(['%s'] * len(areas))})"
+        params.extend(areas)
+    query += " ORDER BY id LIMIT %s"
+    params.append(limit + 1)
+    cursor.execute(query, params)
+    return cursor.fetchall()
+
+
+# ============================================
+# DISTANCES
+# ============================================
+
+def haversine_matrix(lats, lngs):
+    """
+    Great-circle distances in metres between every pair of points,
+    as an N x N float32 array, filled MATRIX_ROW_BLOCK rows at a
+    time so the float64 working arrays stay small.
+    """
+    lat = np.radians(np.asarray(lats, dtype=np.float64))
+    lng = np.radians(np.asarray(lngs, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    dist = np.empty((len(lat), len(lat)), dtype=np.float32)
+
+    for start in range(0, len(lat), MATRIX_ROW_BLOCK):
+        rows = slice(start, start + MATRIX_ROW_BLOCK)
+        a = np.subtract.outer(lat[rows], lat)
+        a *= 0.5
+        np.sin(a, out=a)
+        a *= a
+
+        b = np.subtract.outer(lng[rows], lng)
+        b *= 0.5
+        np.sin(b, out=b)
+        b *= b
+        b *= cos_lat[rows, None]
+        b *= cos_lat[None, :]
+
+        a += b
+        np.clip(a, 0.0, 1.0, out=a)
+        np.sqrt(a, out=a)
+        np.arcsin(a, out=a)
+        a *= 2 * EARTH_RADIUS_M
+        dist[rows] = a
+    return dist
+
+
+def route_length(dist, tour):
+    """Total length of a tour (array of matrix indices) in metres."""
+    tour = np.asarray(tour)
+    return float(dist[tour[:-1], tour[1:]].astype(np.float64).sum())
+
+
+# ============================================
+# HEURISTICS
+# ============================================
+
+def sweep_groups(lats, lngs, depot_lat, depot_lng, groups):
+    """
+    Split stops into `groups` angular sectors around the depot,
+    returned as arrays of stop positions of (nearly) equal size.
+    The sweep starts at the widest empty angle, so no sector
+    straddles a gap.
+    """
+    x = (np.asarray(lngs) - depot_lng) * math.cos(math.radians(depot_lat))
+    y = np.asarray(lats) - depot_lat
+    angles = np.arctan2(y, x)
+    order = np.argsort(angles, kind='stable')
+    if len(order) > 1:
+        sorted_angles = angles[order]
+        gaps = np.diff(np.append(sorted_angles, sorted_angles[0] + 2 * math.pi))
+        order = np.roll(order, -((int(np.argmax(gaps)) + 1) % len(order)))
+    return [group for group in np.array_split(order, groups) if len(group)]
+
+
+def nearest_neighbour(dist, nodes, start=0):
+    """Order `nodes` (matrix indices) greedily from `start`."""
+    nodes = np.asarray(nodes)
+    visited = np.zeros(len(nodes), dtype=bool)
+    route = np.empty(len(nodes), dtype=nodes.dtype)
+    current = start
+    for step in range(len(nodes)):
+        distances = np.where(visited, np.inf, dist[current, nodes])
+        nearest = int(np.argmin(distances))
+        visited[nearest] = True
+        route[step] = current = nodes[nearest]
+    return route
+
+
+def two_opt(dist, tour, deadline, max_passes=MAX_TWO_OPT_PASSES):
+    """
+    Improve a closed tour (first and last entries are the depot)
+    with 2-opt moves until no move helps, the pass limit is reached
+    or time.monotonic() passes `deadline`. For each edge the best
+    move over all later edges is found with one vectorised step.
+    """
+    tour = np.array(tour)
+    n = len(tour)
+    for _ in range(max_passes):
+        improved = False
+        for i in range(n - 3):
+            a, b = tour[i], tour[i + 1]
+            c, d = tour[i + 2:n - 1], tour[i + 3:n]
+            delta = dist[a, c] + dist[b, d] - dist[a, b] - dist[c, d]
+            j = int(np.argmin(delta))
+            if delta[j] < -1e-3:
+                j += i + 2
+                tour[i + 1:j + 1] = tour[i + 1:j + 1][::-1].copy()
+                improved = True
+            if time.monotonic() > deadline:
+                return tour
+        if not improved:
+            break
+    return tour
+
+
+def plan_routes(stops, depot_lat, depot_lng, vehicles, capacity, time_limit=DEFAULT_TIME_LIMIT):
+    """
+    Plan collection routes.
+
+    `stops` is a list of dicts with id, latitude and longitude (and
+    optionally area, report_count). At most vehicles x capacity stops
+    are served; if there are more, the most-reported complaints and
+    those closest to the depot are served first and the rest are
+    returned as unassigned.
+
+    Returns {'routes': [{'vehicle', 'stops', 'distance_m'}, ...],
+             'total_distance_m', 'unassigned', 'timings_ms'}.
+    """
+    started = time.monotonic()
+    lats = np.array([float(stop['latitude']) for stop in stops], dtype=np.float64)
+    lngs = np.array([float(stop['longitude']) for stop in stops], dtype=np.float64)
+
+    # Matrix index 0 is the depot, stop k is index k + 1
+    dist = haversine_matrix(np.append(depot_lat, lats), np.append(depot_lng, lngs))
+    matrix_done = time.monotonic()
+
+    served = np.arange(len(stops))
+    unassigned = []
+    if len(stops) > vehicles * capacity:
+        reports = np.array([stop.get('report_count') or 1 for stop in stops])
+        priority = np.lexsort((dist[0, 1:], -reports))
+        served = np.sort(priority[:vehicles * capacity])
+        unassigned = [stops[k]['id'] for k in np.sort(priority[vehicles * capacity:])]
+
+    routes = []
+    if len(served):
+        groups = sweep_groups(lats[served], lngs[served], depot_lat, depot_lng,
+                              min(vehicles, len(served)))
+        tours = [np.concatenate(([0], nearest_neighbour(dist, served[group] + 1), [0]))
+                 for group in groups]
+        heuristic_done = time.monotonic()
+
+        # Share the improvement time between routes by their size
+        for vehicle, tour in enumerate(tours, start=1):
+            budget = time_limit * (len(tour) - 2) / len(served)
+            tour = two_opt(dist, tour, time.monotonic() + budget)
+            routes.append({
+                'vehicle': vehicle,
+                'stops': [stops[index - 1] for index in tour[1:-1]],
+                'distance_m': round(route_length(dist, tour), 1),
+            })
+    else:
+        heuristic_done = time.monotonic()
+    finished = time.monotonic()
+
+    return {
+        'routes': routes,
+        'total_distance_m': round(sum(route['distance_m'] for route in routes), 1),
+        'unassigned': unassigned,
+        'timings_ms': {
+            'matrix': round((matrix_done - started) * 1000, 1),
+            'construction': round((heuristic_done - matrix_done) * 1000, 1),
+            'two_opt': round((finished - heuristic_done) * 1000, 1),
+            'total': round((finished - started) * 1000, 1),
+        },
+    }
+
+
+if __name__ == '__main__':
+    import argparse
+    import json
+
+    import mysql.connector
+
+    parser = argparse.ArgumentParser(description='Plan collection routes over pending complaints.')
+    parser.add_argument('--depot', required=True, help='depot location as LAT,LNG')
+    parser.add_argument('--vehicles', type=int, default=1, help='number of vehicles')
+    parser.add_argument('--capacity', type=int, default=50, help='most complaints per vehicle')
+    parser.add_argument('--area', action='append', help='only this area (repeatable)')
+    parser.add_argument('--time-limit', type=float, default=DEFAULT_TIME_LIMIT,
+                        help='seconds for route improvement')
+    parser.add_argument('--json', action='store_true', help='print the plan as JSON')
+    args = parser.parse_args()
+
+    depot_lat, depot_lng = (float(value) for value in args.depot.split(','))
+
+    from app import DB_CONFIG
+
+    connection = mysql.connector.connect(**DB_CONFIG)
+    cursor = connection.cursor(dictionary=True)
+    stops = load_pending_stops(cursor, args.area)
+    cursor.close()
+    connection.close()
+    if len(stops) > MAX_ROUTE_STOPS:
+        raise SystemExit(f"More than {MAX_ROUTE_STOPS} pending complaints; filter with --area")
+
+    plan = plan_routes(stops, depot_lat, depot_lng, args.vehicles, args.capacity, args.time_limit)
+    if args.json:
+        print(json.dumps(plan, default=str, indent=2))
+        raise SystemExit(0)
+
+    for route in plan['routes']:
+        print(f"Vehicle {route['vehicle']}: {len(route['stops'])} stops, "
+              f"{route['distance_m'] / 1000:.1f} km")
+        for number, stop in enumerate(route['stops'], start=1):
+            print(f"  {number:>3}. #{stop['id']} {stop['area']} "
+                  f"({stop['latitude']}, {stop['longitude']})")
+    if plan['unassigned']:
+        print(f"Not assigned (over capacity): {len(plan['unassigned'])} complaints")
+    print(f"Total {plan['total_distance_m'] / 1000:.1f} km, "
+          f"planned in {plan['timings_ms']['total']:.0f} ms")
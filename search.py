@@ -0,0 +1,107 @@
+"""
+============================================
+Full-Text Complaint Search
+Web Based Smart Waste Management System
+============================================
+Search over complaint descriptions and areas ("dead animal",
+"near school", a street name) backed by a MySQL FULLTEXT
+index on (area, description). InnoDB keeps the index up to
+date on every insert, update and delete, so the write routes
+need no extra work, and a search reads only the index
+entries of its words however large the table grows.
+
+  - Every word must match (words may be prefixes:
+    "hosp" finds "hospital"); "quoted text" must match as a
+    phrase.
+  - Results are ranked by MySQL's relevance score, best
+    first, and combine with the status / area / date filters
+    of /complaints.
+
+Words shorter than MIN_WORD_LENGTH are not indexed by InnoDB
+(innodb_ft_min_token_size) and are ignored.
+============================================
+"""
+
+import base64
+import json
+import re
+
+# InnoDB's default innodb_ft_min_token_size
+MIN_WORD_LENGTH = 3
+
+# Longest search text accepted
+MAX_SEARCH_LENGTH = 200
+
+# Deepest result reachable by paging, to keep every page cheap
+MAX_SEARCH_OFFSET = 10000
+
+FULLTEXT_COLUMNS = 'area, description'
+
+_PHRASE = re.compile(r'"([^"]*)"')
+_WORD = re.compile(r'\w+', re.UNICODE)
+
+
+def parse_search_text(text):
+    """
+    Turn what the user typed into (boolean_query, natural_query):
+    the BOOLEAN MODE query that selects matches and the plain text
+    used to rank them. Operators typed by the user are not passed
+    through, so any input gives a valid query.
+    Raises ValueError if nothing searchable is left.
+    """
+    text = (text or '').strip()
+    if len(text) > MAX_SEARCH_LENGTH:
+        raise ValueError(f"q must be at most {MAX_SEARCH_LENGTH} characters")
+
+    terms = []
+    words = []
+    for phrase in _PHRASE.findall(text):
+        phrase_words = _WORD.findall(phrase)
+        if len(phrase_words) > 1:
+            terms.append('+"' + ' '.join(phrase_words) + '"')
+            words.extend(phrase_words)
+        elif phrase_words:
+            text += ' ' + phrase_words[0]  # A one-word "phrase" is just a word
+    for word in _WORD.findall(_PHRASE.sub(' ', text)):
+        if len(word) >= MIN_WORD_LENGTH:
+            terms.append(f"+{word}*")
+            words.append(word)
+
+    if not terms:
+        raise ValueError(f"q needs at least one word of {MIN_WORD_LENGTH} or more characters")
+    return ' '.join(terms), ' '.join(words)
+
+
+def encode_cursor(offset):
+    """Opaque next_cursor token for the next page of results."""
+    raw = json.dumps({'offset': offset}).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    """Decode a next_cursor token back to the result offset."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        offset = int(json.loads(base64.urlsafe_b64decode(padded))['offset'])
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Invalid cursor")
+    if not 0 <= offset <= MAX_SEARCH_OFFSET:
+        raise ValueError("Invalid cursor")
+    return offset
+
+
+def build_search_query(fields, conditions, params, boolean_query, natural_query, limit, offset):
+    """
+    Ranked search SELECT for one page (fetches limit + 1 rows so the
+    caller can tell whether another page exists).
+    """
+    where = [f"MATCH({FULLTEXT_COLUMNS}) AGAINST (%s IN BOOLEAN MODE)"] + list(conditions)
+    query = f"""
+        SELECT {', '.join(fields)},
+               MATCH({FULLTEXT_COLUMNS}) AGAINST (%s IN NATURAL LANGUAGE MODE) AS score
+        FROM complaints
+        WHERE {' AND '.join(where)}
+        ORDER BY score DESC, id DESC
+        LIMIT %s OFFSET %s
+    """
+    return query, [natural_query, boolean_query] + list(params) + [limit + 1, offset]
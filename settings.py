@@ -0,0 +1,101 @@
+"""
+============================================
+Environment Settings
+Web Based Smart Waste Management System
+============================================
+Every deployment setting can be given as an environment
+variable named WASTE_<NAME>, so the same code runs on a
+laptop, on a test server and in production without edits.
+Unset variables fall back to the defaults in app.py, which
+suit a local MySQL Workbench install.
+
+    WASTE_DB_HOST, WASTE_DB_PORT, WASTE_DB_USER,
+    WASTE_DB_PASSWORD, WASTE_DB_NAME     MySQL connection
+    WASTE_DB_POOL_SIZE, WASTE_DB_MAX_OVERFLOW
+                                         connections per worker
+    WASTE_SECRET_KEY                     session signing key
+    WASTE_ADMIN_USERNAME, WASTE_ADMIN_PASSWORD
+    WASTE_SLOW_QUERY_MS, WASTE_SLOW_REQUEST_MS
+    WASTE_MAX_LIVE_STREAMS               open dashboards per worker
+    WASTE_WRITE_BEHIND                   0 to store web form complaints
+                                         in MySQL before answering
+    WASTE_DEBUG                          development server only
+
+The production server settings (WASTE_BIND, WASTE_WORKERS,
+WASTE_WORKER_CLASS, WASTE_WORKER_CONNECTIONS, WASTE_THREADS,
+WASTE_MIGRATE_ON_START, WASTE_ACCESS_LOG) are read by
+gunicorn.conf.py.
+============================================
+"""
+
+import os
+import sys
+
+ENV_PREFIX = 'WASTE_'
+
+TRUE_VALUES = ('1', 'true', 'yes', 'on')
+FALSE_VALUES = ('0', 'false', 'no', 'off')
+
+
+def get(name, default=None):
+    """WASTE_<name> from the environment, or `default` if unset or empty."""
+    value = os.environ.get(ENV_PREFIX + name, '').strip()
+    return value if value else default
+
+
+def get_int(name, default):
+    value = get(name)
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"{ENV_PREFIX}{name} must be a whole number, not {value!r}")
+
+
+def get_bool(name, default):
+    value = get(name)
+    if value is None:
+        return default
+    if value.lower() in TRUE_VALUES:
+        return True
+    if value.lower() in FALSE_VALUES:
+        return False
+    raise ValueError(f"{ENV_PREFIX}{name} must be true or false, not {value!r}")
+
+
+def db_config(defaults):
+    """
+    MySQL connection settings: `defaults` (a DB_CONFIG dict)
+    overridden by WASTE_DB_HOST / PORT / USER / PASSWORD / NAME.
+    """
+    config = dict(defaults)
+    config['host'] = get('DB_HOST', config.get('host'))
+    config['port'] = get_int('DB_PORT', config.get('port', 3306))
+    config['user'] = get('DB_USER', config.get('user'))
+    config['password'] = os.environ.get(ENV_PREFIX + 'DB_PASSWORD', config.get('password'))
+    config['database'] = get('DB_NAME', config.get('database'))
+    return config
+
+
+def gevent_patched():
+    """
+    True in a gevent worker (gunicorn -k gevent), where the standard
+    library is patched so that waiting on a socket runs other requests.
+    """
+    if 'gevent' not in sys.modules:
+        return False
+    from gevent import monkey
+    return monkey.is_module_patched('socket')
+
+
+def run_cpu_bound(function, *args):
+    """
+    Call `function(*args)` and return its result. In a gevent worker
+    it runs on the hub's pool of native threads, so the worker's
+    other requests are served while it computes.
+    """
+    if gevent_patched():
+        import gevent
+        return gevent.get_hub().threadpool.apply(function, args)
+    return function(*args)
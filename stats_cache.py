@@ -0,0 +1,106 @@
+"""
+============================================
+Dashboard Statistics Cache
+Web Based Smart Waste Management System
+============================================
+The admin dashboard shows complaint counts per status and
+per area. Instead of running several COUNT(*) queries on
+every page view, the counts are computed by one grouped
+aggregate query and kept in memory for a short TTL.
+
+Write routes keep the cache correct:
+  - record_insert() : adds a new complaint to the cached counts
+  - invalidate()    : drops the cache after updates / deletes
+
+Each process has its own cache, so with several workers a
+change made by another worker shows up after at most `ttl`
+seconds.
+============================================
+"""
+
+import copy
+import threading
+import time
+
+# One grouped aggregate replaces the separate COUNT(*) queries
+STATS_QUERY = """
+    SELECT status, area, COUNT(*) AS count
+    FROM complaints
+    GROUP BY status, area
+"""
+
+
+def build_stats(rows):
+    """
+    Turn (status, area, count) rows into the dashboard stats:
+
+        {'total': 10, 'pending': 7, 'cleaned': 3,
+         'by_status': {'Pending': 7, 'Cleaned': 3},
+         'by_area': {'Kankarbagh': {'total': 4, 'Pending': 3, 'Cleaned': 1}}}
+    """
+    stats = {'total': 0, 'pending': 0, 'cleaned': 0, 'by_status': {}, 'by_area': {}}
+    for row in rows:
+        _add(stats, row['status'], row['area'], row['count'])
+    return stats
+
+
+def _add(stats, status, area, count):
+    """Add `count` complaints with this status and area to the stats."""
+    stats['total'] += count
+    if status == 'Pending':
+        stats['pending'] += count
+    elif status == 'Cleaned':
+        stats['cleaned'] += count
+    stats['by_status'][status] = stats['by_status'].get(status, 0) + count
+    area_stats = stats['by_area'].setdefault(area, {'total': 0})
+    area_stats['total'] += count
+    area_stats[status] = area_stats.get(status, 0) + count
+
+
+class StatsCache:
+    """In-process TTL cache for the dashboard statistics."""
+
+    def __init__(self, ttl=30):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()  # Only one thread queries MySQL at a time
+        self._stats = None
+        self._expires_at = 0.0
+        self._generation = 0  # Bumped on every write so stale loads are not stored
+
+    def get(self, loader):
+        """
+        Return cached stats, calling loader() to recompute them
+        when the cache is empty or expired.
+        """
+        with self._lock:
+            if self._stats is not None and time.monotonic() < self._expires_at:
+                return copy.deepcopy(self._stats)
+
+        with self._load_lock:
+            # Another thread may have refreshed the cache while we waited
+            with self._lock:
+                if self._stats is not None and time.monotonic() < self._expires_at:
+                    return copy.deepcopy(self._stats)
+                generation = self._generation
+
+            stats = loader()
+
+            with self._lock:
+                if generation == self._generation:
+                    self._stats = stats
+                    self._expires_at = time.monotonic() + self.ttl
+            return copy.deepcopy(stats)
+
+    def record_insert(self, area, status='Pending', count=1):
+        """Count newly inserted complaints without reloading."""
+        with self._lock:
+            self._generation += 1
+            if self._stats is not None:
+                _add(self._stats, status, area, count)
+
+    def invalidate(self):
+        """Drop the cached stats; the next get() reloads them."""
+        with self._lock:
+            self._generation += 1
+            self._stats = None
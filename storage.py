@@ -0,0 +1,325 @@
+"""
+============================================
+Content-Addressed Image Storage
+Web Based Smart Waste Management System
+============================================
+Uploaded images are stored under the SHA-256 hash of their
+content instead of a timestamped filename:
+
+    uploads/3f/a2/3fa2...9c.jpg
+
+  - two uploads can never overwrite each other
+  - the same photo uploaded twice is stored once
+  - the two-level sharded tree keeps every directory small
+
+While Werkzeug parses a multipart request, each file part is
+written straight into a HashingUpload temp file (see
+BlobStore.new_upload), which hashes the bytes, enforces the
+size limit and checks the image signature as they arrive. A
+request that is too large or not an image is aborted with
+413 / 415 before it is read to the end. Once the upload is
+complete, its metadata (EXIF GPS position, camera details,
+comments) is removed (see image_metadata.py) and the hash is
+taken of the cleaned file, which is what gets stored.
+
+The image_blobs table counts how many complaints use each
+file. A file is deleted only when its count drops to zero.
+Both the count change and the file move / delete happen
+while the image_blobs row is locked, so an upload of the
+same photo and a delete cannot race each other.
+============================================
+"""
+
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import time
+
+from werkzeug.exceptions import RequestEntityTooLarge, UnsupportedMediaType
+
+import image_metadata
+
+# Signature (magic bytes) at the start of the file -> stored extension
+IMAGE_SIGNATURES = (
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+)
+
+# Bytes needed to recognise every signature above
+SIGNATURE_LENGTH = max(len(signature) for signature, _ in IMAGE_SIGNATURES)
+
+# Upload temp files live inside the uploads folder, so the final
+# rename never crosses a filesystem
+TEMP_DIR = '.tmp'
+
+# Temp files older than this (seconds) are left over from a crash
+STALE_TEMP_AGE = 3600
+
+COPY_CHUNK_SIZE = 64 * 1024
+
+# Image paths the app stores: content-addressed (ab/cd/<sha256>.<ext>),
+# or the flat <timestamp>_<name> files uploaded before that
+BLOB_PATH_PATTERN = re.compile(r'([0-9a-f]{2})/([0-9a-f]{2})/\1\2[0-9a-f]{60}\.(?:png|jpg|gif)')
+LEGACY_PATH_PATTERN = re.compile(r'[0-9]+_[A-Za-z0-9_.-]+\.(?:png|jpe?g|gif)', re.IGNORECASE)
+
+
+def detect_image_type(head):
+    """Return the file extension for an image signature, or None."""
+    for signature, extension in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return extension
+    return None
+
+
+def blob_path(digest, extension):
+    """Relative, sharded path of a blob: ab/cd/abcd....ext"""
+    return f"{digest[:2]}/{digest[2:4]}/{digest}.{extension}"
+
+
+def is_stored_path(path):
+    """True if `path` has the form of an image path this app stores."""
+    return isinstance(path, str) and bool(BLOB_PATH_PATTERN.fullmatch(path)
+                                          or LEGACY_PATH_PATTERN.fullmatch(path))
+
+
+class HashingUpload:
+    """
+    Writable temp file for one uploaded file part.
+    Hashes and counts the bytes as they are written and aborts the
+    request as soon as the size limit is passed or the first bytes
+    are not a supported image.
+    """
+
+    def __init__(self, temp_dir, max_bytes):
+        fd, self.temp_path = tempfile.mkstemp(dir=temp_dir, prefix='upload-', suffix='.part')
+        self._file = os.fdopen(fd, 'w+b')
+        self._hash = hashlib.sha256()
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.head = b''
+        self.extension = None
+        self.published = False
+
+    def write(self, data):
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            self.close()
+            raise RequestEntityTooLarge(
+                f"Image is larger than {self.max_bytes // (1024 * 1024)} MB")
+        if len(self.head) < SIGNATURE_LENGTH:
+            self.head += data[:SIGNATURE_LENGTH - len(self.head)]
+            if len(self.head) >= SIGNATURE_LENGTH:
+                self.extension = detect_image_type(self.head)
+                if self.extension is None:
+                    self.close()
+                    raise UnsupportedMediaType("Only PNG, JPEG and GIF images are accepted")
+        self._hash.update(data)
+        return self._file.write(data)
+
+    def hexdigest(self):
+        return self._hash.hexdigest()
+
+    def strip_metadata(self):
+        """
+        Remove the image metadata from the received file and hash
+        the cleaned bytes instead. Raises ValueError if the file
+        is damaged.
+        """
+        self._file.seek(0)
+        data = self._file.read()
+        cleaned = image_metadata.strip_metadata(data, self.extension)
+        if cleaned != data:
+            self._file.seek(0)
+            self._file.truncate()
+            self._file.write(cleaned)
+            self.size = len(cleaned)
+        self._hash = hashlib.sha256(cleaned)
+
+    # Werkzeug's FileStorage reads the part back through these
+    def read(self, *args):
+        return self._file.read(*args)
+
+    def seek(self, *args):
+        return self._file.seek(*args)
+
+    def tell(self):
+        return self._file.tell()
+
+    def flush(self):
+        return self._file.flush()
+
+    def sync(self):
+        """Flush the written bytes to disk (fsync)."""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close_file(self):
+        if not self._file.closed:
+            self._file.close()
+
+    def close(self):
+        """Close the file; the temp file is removed unless it was published."""
+        self.close_file()
+        if not self.published and os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+
+    def move_to(self, target):
+        """Move the temp file to `target` (same filesystem) and keep it."""
+        self.close_file()
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(self.temp_path, target)
+        self.published = True
+
+
+class BlobStore:
+    """Sharded, content-addressed file store inside the uploads folder."""
+
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.temp_dir = os.path.join(root, TEMP_DIR)
+        os.makedirs(self.temp_dir, exist_ok=True)
+        self.remove_stale_temp_files()
+
+    def new_upload(self):
+        """Temp file for Werkzeug to stream one file part into."""
+        return HashingUpload(self.temp_dir, self.max_bytes)
+
+    def stage(self, file):
+        """
+        Return the HashingUpload holding an uploaded FileStorage,
+        with its metadata removed, or None if it is empty, too
+        short to be an image or damaged.
+        Files that did not come through new_upload() (e.g. from
+        the test client) are copied into one first.
+        """
+        upload = file.stream
+        if not isinstance(upload, HashingUpload):
+            upload = self.new_upload()
+            while True:
+                chunk = file.stream.read(COPY_CHUNK_SIZE)
+                if not chunk:
+                    break
+                upload.write(chunk)
+        if upload.size == 0 or upload.extension is None:
+            upload.close()
+            return None
+        try:
+            upload.strip_metadata()
+        except ValueError as err:
+            print(f"Upload rejected: {err}")
+            upload.close()
+            return None
+        upload.flush()
+        upload.blob_path = blob_path(upload.hexdigest(), upload.extension)
+        return upload
+
+    def publish(self, upload):
+        """
+        Move a staged upload to its content-addressed path.
+        Returns True if the file is new, False if an identical
+        file was already stored (the upload is then discarded).
+        Call it while holding the image_blobs row lock.
+        """
+        target = os.path.join(self.root, upload.blob_path)
+        if os.path.exists(target):
+            upload.close()
+            return False
+        upload.move_to(target)
+        return True
+
+    def publish_copy(self, source, path):
+        """
+        Like publish(), for a file kept elsewhere (e.g. in the write
+        journal): copy it to `path` unless that file already exists.
+        """
+        target = self.target(path)
+        if os.path.exists(target):
+            return False
+        fd, temp_path = tempfile.mkstemp(dir=self.temp_dir, prefix='copy-', suffix='.part')
+        os.close(fd)
+        shutil.copyfile(source, temp_path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(temp_path, target)
+        return True
+
+    def target(self, path):
+        """
+        Absolute path of the stored file `path`. Raises ValueError
+        for anything that is not a stored image path inside the store
+        (image paths may come from clients and old database rows).
+        """
+        if not is_stored_path(path):
+            raise ValueError(f"Not a stored image path: {path!r}")
+        root = os.path.realpath(self.root)
+        target = os.path.realpath(os.path.join(root, path))
+        if os.path.commonpath([root, target]) != root:
+            raise ValueError(f"Image path outside {self.root}: {path!r}")
+        return target
+
+    def remove(self, path):
+        """Delete a stored file if it exists."""
+        target = self.target(path)
+        if os.path.exists(target):
+            os.remove(target)
+
+    def remove_stale_temp_files(self):
+        """Delete temp files left behind by a crashed upload."""
+        cutoff = time.time() - STALE_TEMP_AGE
+        for name in os.listdir(self.temp_dir):
+            temp_path = os.path.join(self.temp_dir, name)
+            try:
+                if os.path.getmtime(temp_path) < cutoff:
+                    os.remove(temp_path)
+            except OSError:
+                pass  # Removed by another worker
+
+
+# ============================================
+# REFERENCE COUNTS (image_blobs table)
+# ============================================
+
+def add_reference(cursor, path, size_bytes):
+    """
+    Count one more complaint using a stored file (creating its
+    row for a new file). Locks the row until the transaction ends.
+    """
+    cursor.execute("""
+        INSERT INTO image_blobs (path, ref_count, size_bytes) VALUES (%s, 1, %s)
+        ON DUPLICATE KEY UPDATE ref_count = ref_count + 1
+    """, (path, size_bytes))
+
+
+def add_existing_reference(cursor, path):
+    """
+    Count one more use of a file that is already tracked. Returns
+    False (and counts nothing) if `path` is not a stored upload.
+    """
+    if not is_stored_path(path):
+        return False
+    cursor.execute("UPDATE image_blobs SET ref_count = ref_count + 1 WHERE path = %s", (path,))
+    return cursor.rowcount > 0
+
+
+def release_reference(cursor, path):
+    """
+    Count one less complaint using a file.
+    Returns True when nothing uses the file any more (its row is
+    deleted and the caller should delete the file before
+    committing), False while it is still used, and None when the
+    file is not tracked at all.
+    """
+    cursor.execute("SELECT ref_count FROM image_blobs WHERE path = %s FOR UPDATE", (path,))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    ref_count = row['ref_count'] if isinstance(row, dict) else row[0]
+    if ref_count <= 1:
+        cursor.execute("DELETE FROM image_blobs WHERE path = %s", (path,))
+        return True
+    cursor.execute("UPDATE image_blobs SET ref_count = ref_count - 1 WHERE path = %s", (path,))
+    return False
@@ -0,0 +1,102 @@
+"""
+============================================
+Test Fixtures
+Web Based Smart Waste Management System
+============================================
+The tests need no MySQL server: modules are tested with
+small fake cursors, and the Flask app is loaded with every
+connection attempt failing, as if MySQL were down.
+
+    pip install -r requirements.txt
+    python -m pytest
+============================================
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+
+class FakeCursor:
+    """
+    Records executed statements and answers SELECTs from `results`:
+    a list of (SQL fragment, rows) pairs, the first matching one wins.
+    """
+
+    def __init__(self, results=()):
+        self.results = list(results)
+        self.executed = []
+        self.rows = []
+        self.rowcount = 0
+        self.lastrowid = None
+
+    def execute(self, query, params=()):
+        self.executed.append((' '.join(query.split()), params))
+        self.rows = []
+        for fragment, rows in self.results:
+            if fragment in query:
+                self.rows = list(rows)
+                break
+        self.rowcount = len(self.rows)
+
+    def executemany(self, query, seq_params):
+        for params in seq_params:
+            self.execute(query, params)
+
+    def fetchall(self):
+        rows, self.rows = self.rows, []
+        return rows
+
+    def fetchone(self):
+        return self.rows.pop(0) if self.rows else None
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def fake_cursor():
+    return FakeCursor
+
+
+@pytest.fixture(scope='session')
+def application(tmp_path_factory):
+    """
+    The Flask app, created in a temporary directory (it creates
+    uploads/, archive_uploads/ and journal/ in the working directory)
+    with MySQL unreachable.
+    """
+    import mysql.connector
+
+    def refuse(**config):
+        raise mysql.connector.errors.InterfaceError("Can't connect to MySQL server (tests)")
+
+    mysql.connector.connect = refuse
+    os.chdir(tmp_path_factory.mktemp('app'))
+    import app
+    application = app.create_app({'TESTING': True})
+    application.extensions['db_pool'].connect_retries = 0
+    return application
+
+
+@pytest.fixture
+def app_module(application):
+    """The app module, with an app context so its helpers can be called."""
+    import app
+    with application.app_context():
+        yield app
+
+
+@pytest.fixture
+def client(application):
+    return application.test_client()
+
+
+@pytest.fixture
+def admin_client(client):
+    with client.session_transaction() as session:
+        session['admin_logged_in'] = True
+    return client
@@ -0,0 +1,105 @@
+from datetime import date, timedelta
+
+import pytest
+
+import analytics
+
+
+def test_parse_day_range_defaults_to_the_last_days():
+    date_from, date_to = analytics.parse_day_range({})
+    assert date_to == date.today()
+    assert date_to - date_from == timedelta(days=analytics.DEFAULT_RANGE_DAYS - 1)
+    assert analytics.parse_day_range({'date_from': '2024-02-01', 'date_to': ' 2024-02-05'}) == (
+        date(2024, 2, 1), date(2024, 2, 5))
+
+
+@pytest.mark.parametrize('args, message', [
+    ({'date_from': '05/02/2024'}, 'date_from'),
+    ({'date_from': '2024-02-06', 'date_to': '2024-02-05'}, 'not be after'),
+])
+def test_parse_day_range_rejects_bad_ranges(args, message):
+    with pytest.raises(ValueError, match=message):
+        analytics.parse_day_range(args)
+
+
+def test_parse_list():
+    assert analytics.parse_list(' Digha, ,Patna ') == ['Digha', 'Patna']
+    assert analytics.parse_list(None) == []
+
+
+def test_daily_counts_totals(fake_cursor):
+    cursor = fake_cursor([("FROM complaint_daily_stats", [
+        {'day': date(2024, 2, 1), 'area': 'Digha', 'status': 'Pending', 'complaints': 2},
+        {'day': date(2024, 2, 1), 'area': 'Patna', 'status': 'Cleaned', 'complaints': 1},
+        {'day': date(2024, 2, 2), 'area': 'Digha', 'status': 'Cleaned', 'complaints': 3},
+    ])])
+    rows, totals = analytics.daily_counts(cursor, date(2024, 2, 1), date(2024, 2, 2),
+                                          areas=['Digha', 'Patna'], statuses=[])
+    assert rows[0] == {'day': '2024-02-01', 'area': 'Digha', 'status': 'Pending', 'count': 2}
+    assert totals == {
+        'total': 6,
+        'by_day': {'2024-02-01': 3, '2024-02-02': 3},
+        'by_area': {'Digha': 5, 'Patna': 1},
+        'by_status': {'Pending': 2, 'Cleaned': 4},
+    }
+    query, params = cursor.executed[0]
+    assert 'area IN (%s, %s)' in query and 'status IN' not in query
+    assert params == [date(2024, 2, 1), date(2024, 2, 2), 'Digha', 'Patna']
+
+
+def test_time_to_clean_averages(fake_cursor):
+    cursor = fake_cursor([("FROM cleaning_daily_stats", [
+        {'day': date(2024, 2, 1), 'area': 'Digha', 'cleaned': 2, 'clean_seconds': 2 * 3600},
+        {'day': date(2024, 2, 1), 'area': 'Patna', 'cleaned': 1, 'clean_seconds': 7 * 3600},
+    ])])
+    data = analytics.time_to_clean(cursor, date(2024, 2, 1), date(2024, 2, 1))
+    assert data['overall'] == {'cleaned': 3, 'avg_hours_to_clean': 3.0}
+    assert data['by_area']['Digha'] == {'cleaned': 2, 'avg_hours_to_clean': 1.0}
+    assert data['by_day'] == {'2024-02-01': {'cleaned': 3, 'avg_hours_to_clean': 3.0}}
+
+    assert analytics.time_to_clean(fake_cursor(), date(2024, 2, 1), date(2024, 2, 1))['overall'] == {
+        'cleaned': 0, 'avg_hours_to_clean': None}
+
+
+def test_hotspots_weights_and_queries(fake_cursor):
+    cells = [{'x': 1, 'y': 2, 'count': 8, 'latitude': 25.6, 'longitude': 85.1},
+             {'x': 1, 'y': 3, 'count': 2, 'latitude': 25.7, 'longitude': 85.1}]
+    cursor = fake_cursor([("FROM complaint_clusters", cells)])
+    data = analytics.hotspots(cursor, 12, ['Pending'], 10)
+    assert [cell['weight'] for cell in data] == [1.0, 0.25]
+    # One status reads the index order directly, several are summed per cell
+    assert 'GROUP BY' not in cursor.executed[0][0]
+    assert cursor.executed[0][1] == (12, 'Pending', 10)
+
+    cursor = fake_cursor([("FROM complaint_clusters", cells)])
+    analytics.hotspots(cursor, 12, ['Pending', 'Cleaned'], 10)
+    assert 'GROUP BY x, y' in cursor.executed[0][0]
+    assert cursor.executed[0][1] == [12, 'Pending', 'Cleaned', 10]
+
+
+def test_adjust_sql_uses_the_sign_and_table():
+    sql = analytics.daily_adjust_sql("c.id = %s", -1, 'complaints_archive')
+    assert '-1 * COUNT(*)' in sql and 'FROM complaints_archive c' in sql
+    sql = analytics.cleaning_adjust_sql("c.id = %s", 1)
+    assert 'c.cleaned_at IS NOT NULL AND (c.id = %s)' in sql
+
+
+def test_adjust_aggregates_updates_clusters_and_rollups(app_module, fake_cursor):
+    cursor = fake_cursor()
+    app_module.adjust_aggregates(cursor, "c.id = %s", (5,), -1)
+    app_module.adjust_aggregates(cursor, "c.id = %s", (5,), 1)
+    tables = [query.split()[2] for query, _ in cursor.executed]
+    assert tables == ['complaint_clusters', 'complaint_daily_stats', 'cleaning_daily_stats'] * 2
+    assert all(params == (5,) for _, params in cursor.executed)
+
+
+@pytest.mark.parametrize('url', [
+    '/api/analytics/daily?date_from=yesterday',
+    '/api/analytics/time_to_clean?date_from=2024-02-06&date_to=2024-02-05',
+    '/api/analytics/hotspots?zoom=30',
+    '/api/analytics/hotspots?limit=0',
+])
+def test_analytics_api_rejects_bad_arguments(client, url):
+    response = client.get(url)
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
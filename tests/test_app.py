@@ -0,0 +1,87 @@
+"""The app factory and routes, with MySQL unreachable (see conftest.py)."""
+
+import app
+
+
+def test_create_app_builds_its_own_services(application, tmp_path):
+    other = app.create_app({'TESTING': True, 'UPLOAD_FOLDER': str(tmp_path / 'uploads'),
+                            'JOURNAL_FOLDER': str(tmp_path / 'journal'), 'MAX_LIVE_STREAMS': 3})
+    for name in ('db_pool', 'request_metrics', 'blob_store', 'live_events', 'write_journal',
+                 'dashboard_stats', 'duplicate_index'):
+        assert other.extensions[name] is not application.extensions[name]
+    assert other.extensions['blob_store'].root == str(tmp_path / 'uploads')
+    assert other.extensions['live_events'].max_subscribers == 3
+    with other.app_context():
+        assert app.live_events.stats()['max_subscribers'] == 3
+
+
+def test_settings_come_from_the_environment(monkeypatch):
+    monkeypatch.setenv('WASTE_SLOW_QUERY_MS', '5')
+    monkeypatch.setenv('WASTE_WRITE_BEHIND', '0')
+    configured = app.create_app({'TESTING': True})
+    assert configured.config['SLOW_QUERY_MS'] == 5
+    assert configured.config['WRITE_BEHIND'] is False
+    assert configured.extensions['request_metrics'].slow_query_ms == 5
+
+
+def test_routes_are_served_by_the_blueprint(client):
+    response = client.get('/api/pool_stats')
+    assert response.status_code == 200
+    assert response.get_json()['data']['open'] == 0
+
+
+def test_update_status_requires_login(client):
+    response = client.post('/update_status', data={'complaint_id': '1', 'status': 'Cleaned'})
+    assert response.status_code == 302
+    assert response.headers['Location'].endswith('/login')
+
+
+def test_update_status_answers_api_callers_with_401(client):
+    response = client.post('/update_status', json={'id': 1, 'status': 'Cleaned'})
+    assert response.status_code == 401
+    assert response.get_json() == {'success': False, 'message': 'Admin login required'}
+
+    response = client.post('/update_status', data={'id': '1', 'status': 'Cleaned'},
+                           headers={'Accept': 'application/json'})
+    assert response.status_code == 401
+
+
+def test_admin_requires_login(client):
+    response = client.get('/admin')
+    assert response.status_code == 302
+    assert response.headers['Location'].endswith('/login')
+
+
+def test_admin_shows_error_when_database_is_down(admin_client):
+    response = admin_client.get('/admin')
+    assert response.status_code == 200
+    page = response.get_data(as_text=True)
+    assert 'Database connection failed' in page
+    assert 'let nextCursor = null;' in page
+
+
+def test_dashboard_query_pages_in_sort_order(app_module):
+    token = app_module.complaint_queries.encode_cursor({'id': 7, 'created_at': '2024-01-02 03:04:05'})
+    query, params, limit = app_module.build_dashboard_query({'status': 'Pending', 'sort': 'oldest'}, token)
+    assert limit == app_module.ADMIN_PAGE_SIZE
+    assert 'status IN (%s)' in query
+    assert '(created_at > %s OR (created_at = %s AND id > %s))' in query
+    assert query.endswith('ORDER BY created_at ASC, id ASC LIMIT %s')
+    assert params[0] == 'Pending' and params[-1] == limit + 1
+
+    query, params, limit = app_module.build_dashboard_query({}, ids=[3, 5])
+    assert 'id IN (%s, %s)' in query and limit == 2
+
+
+def test_split_page_returns_the_next_cursor(app_module):
+    rows = [{'id': number, 'created_at': '2024-01-02 03:04:05'} for number in (9, 8, 7)]
+    assert app_module.split_page(rows, 3) == (rows, None)
+    page, next_cursor = app_module.split_page(rows, 2)
+    assert page == rows[:2]
+    assert app_module.complaint_queries.decode_cursor(next_cursor)[1] == 8
+
+
+def test_admin_rows_rejects_bad_arguments(admin_client):
+    assert admin_client.get('/admin/rows?cursor=garbage').status_code == 400
+    response = admin_client.get('/admin/rows?ids=')
+    assert response.status_code == 200 and response.get_data() == b''
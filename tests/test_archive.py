@@ -0,0 +1,116 @@
+import os
+import re
+from datetime import datetime
+
+import pytest
+
+import archive
+import storage
+
+DIGEST = 'abcd' + '0' * 60
+IMAGE = f'ab/cd/{DIGEST}.jpg'
+
+
+class FakeConnection:
+    def __init__(self, cursor):
+        self.cursor_ = cursor
+        self.events = []
+
+    def start_transaction(self, isolation_level=None):
+        self.events.append(('start', isolation_level))
+
+    def cursor(self):
+        return self.cursor_
+
+    def commit(self):
+        self.events.append('commit')
+
+    def rollback(self):
+        self.events.append('rollback')
+
+
+def test_create_table_has_a_partition_per_year():
+    sql = archive.create_table_sql(2026)
+    partitions = re.findall(r'PARTITION (p\w+) VALUES', sql)
+    assert partitions == ['p_old', 'p2024', 'p2025', 'p2026', 'p_future']
+    assert "PARTITION p2025 VALUES LESS THAN (UNIX_TIMESTAMP('2026-01-01 00:00:00'))" in sql
+    assert 'ROW_FORMAT=COMPRESSED' in sql
+
+
+def test_ensure_partitions_splits_only_missing_years(fake_cursor):
+    cursor = fake_cursor([("information_schema.PARTITIONS",
+                           [('p_old',), ('p2024',), ('p2025',), ('p_future',)])])
+    archive.ensure_partitions(cursor, 2027)
+    alter = cursor.executed[-1][0]
+    assert alter.startswith('ALTER TABLE complaints_archive REORGANIZE PARTITION p_future INTO')
+    assert 'PARTITION p2026' in alter and 'PARTITION p2027' in alter and 'p2025' not in alter
+
+    cursor = fake_cursor([("information_schema.PARTITIONS", [('p2026',), ('p2027',), ('p2024',), ('p2025',)])])
+    archive.ensure_partitions(cursor, 2027)
+    assert len(cursor.executed) == 1
+
+
+def test_archive_batch_moves_rows_and_images(tmp_path, fake_cursor):
+    hot = storage.BlobStore(str(tmp_path / 'uploads'), max_bytes=1024)
+    cold = storage.BlobStore(str(tmp_path / 'archive'), max_bytes=1024)
+    os.makedirs(os.path.join(hot.root, 'ab/cd'))
+    with open(os.path.join(hot.root, IMAGE), 'wb') as file:
+        file.write(b'image')
+
+    cursor = fake_cursor([
+        ("AND cleaned_at < %s", [(4, IMAGE), (9, None)]),
+        ("SELECT ref_count", [(1,)]),
+    ])
+    connection = FakeConnection(cursor)
+    assert archive.archive_batch(connection, datetime(2024, 1, 1), 10, hot, cold) == 2
+
+    statements = [query for query, _ in cursor.executed]
+    # Short batch: the complaints without cleaned_at are looked at too
+    assert 'cleaned_at IS NULL' in statements[1]
+    assert statements[2].startswith('INSERT INTO complaints_archive (id, name,')
+    assert 'FROM complaints WHERE id IN (%s, %s)' in statements[2]
+    assert statements[3].startswith('INSERT INTO complaint_clusters')
+    assert statements[4] == 'DELETE FROM complaints WHERE id IN (%s, %s)'
+    assert cursor.executed[4][1] == [4, 9]
+    assert statements[-1].startswith('UPDATE data_version')
+    assert connection.events == [('start', 'READ COMMITTED'), 'commit']
+
+    # The last reference moved: the image is in cold storage only
+    assert not os.path.exists(os.path.join(hot.root, IMAGE))
+    with open(os.path.join(cold.root, IMAGE), 'rb') as file:
+        assert file.read() == b'image'
+
+
+def test_archive_batch_keeps_images_still_in_use(tmp_path, fake_cursor):
+    hot = storage.BlobStore(str(tmp_path / 'uploads'), max_bytes=1024)
+    cold = storage.BlobStore(str(tmp_path / 'archive'), max_bytes=1024)
+    os.makedirs(os.path.join(hot.root, 'ab/cd'))
+    with open(os.path.join(hot.root, IMAGE), 'wb') as file:
+        file.write(b'image')
+
+    cursor = fake_cursor([("AND cleaned_at < %s", [(4, IMAGE)]), ("SELECT ref_count", [(3,)])])
+    archive.archive_batch(FakeConnection(cursor), datetime(2024, 1, 1), 1, hot, cold)
+    assert os.path.exists(os.path.join(hot.root, IMAGE))
+    assert os.path.exists(os.path.join(cold.root, IMAGE))
+
+
+def test_archive_batch_rolls_back_on_error(tmp_path, fake_cursor):
+    class FailingCursor(fake_cursor):
+        def execute(self, query, params=()):
+            if query.startswith('DELETE'):
+                raise RuntimeError('Lock wait timeout')
+            super().execute(query, params)
+
+    hot = storage.BlobStore(str(tmp_path / 'uploads'), max_bytes=1024)
+    connection = FakeConnection(FailingCursor([("AND cleaned_at < %s", [(4, None)])]))
+    with pytest.raises(RuntimeError):
+        archive.archive_batch(connection, datetime(2024, 1, 1), 1, hot, hot)
+    assert connection.events[-1] == 'rollback'
+
+
+def test_run_archive_stops_when_nothing_is_due(tmp_path, fake_cursor, monkeypatch):
+    batches = iter([500, 120, 0])
+    monkeypatch.setattr(archive, 'archive_batch', lambda *args: next(batches))
+    monkeypatch.setattr(archive, 'ensure_partitions', lambda cursor, last_year: None)
+    hot = storage.BlobStore(str(tmp_path / 'uploads'), max_bytes=1024)
+    assert archive.run_archive(FakeConnection(fake_cursor()), hot, hot, pause=0) == 620
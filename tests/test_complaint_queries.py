@@ -0,0 +1,108 @@
+from datetime import datetime
+
+import pytest
+
+import complaint_queries
+
+
+def test_cursor_round_trip():
+    row = {'id': 42, 'created_at': datetime(2024, 3, 5, 9, 30, 0)}
+    token = complaint_queries.encode_cursor(row)
+    assert '=' not in token
+    assert complaint_queries.decode_cursor(token) == (datetime(2024, 3, 5, 9, 30, 0), 42)
+
+
+@pytest.mark.parametrize('token', ['', 'not-base64!', 'WzFd', 'eyJhIjogMX0'])
+def test_decode_cursor_rejects_garbage(token):
+    with pytest.raises(ValueError, match='Invalid cursor'):
+        complaint_queries.decode_cursor(token)
+
+
+def test_keyset_condition_follows_sort_order():
+    token = complaint_queries.encode_cursor({'id': 7, 'created_at': '2024-01-02 03:04:05'})
+    created_at = datetime(2024, 1, 2, 3, 4, 5)
+
+    condition, params = complaint_queries.keyset_condition(token)
+    assert condition == "(created_at < %s OR (created_at = %s AND id < %s))"
+    assert params == [created_at, created_at, 7]
+
+    condition, _ = complaint_queries.keyset_condition(token, sort='oldest')
+    assert condition == "(created_at > %s OR (created_at = %s AND id > %s))"
+
+
+def test_parse_filters():
+    conditions, params = complaint_queries.parse_filters({
+        'status': 'Pending, Cleaned',
+        'area': 'Kankarbagh',
+        'date_from': '2024-01-01',
+        'date_to': '2024-01-31',
+    })
+    assert conditions == [
+        "status IN (%s, %s)",
+        "area = %s",
+        "created_at >= %s",
+        "created_at < %s",
+    ]
+    # A plain date_to includes the whole day
+    assert params == ['Pending', 'Cleaned', 'Kankarbagh',
+                      datetime(2024, 1, 1), datetime(2024, 2, 1)]
+
+
+def test_parse_filters_date_to_with_time_is_inclusive():
+    conditions, params = complaint_queries.parse_filters({'date_to': '2024-01-31 12:00:00'})
+    assert conditions == ["created_at <= %s"]
+    assert params == [datetime(2024, 1, 31, 12, 0, 0)]
+
+
+def test_parse_filters_rejects_bad_dates():
+    with pytest.raises(ValueError, match='date_from'):
+        complaint_queries.parse_filters({'date_from': '31/01/2024'})
+
+
+def test_parse_fields_adds_cursor_columns():
+    assert complaint_queries.parse_fields('status,area,status') == ['status', 'area', 'id', 'created_at']
+    assert complaint_queries.parse_fields('') == list(complaint_queries.COMPLAINT_FIELDS)
+    with pytest.raises(ValueError, match='Unknown field: location'):
+        complaint_queries.parse_fields('id,location')
+
+
+def test_parse_limit_clamps():
+    assert complaint_queries.parse_limit(None) == complaint_queries.DEFAULT_PAGE_SIZE
+    assert complaint_queries.parse_limit('0') == 1
+    assert complaint_queries.parse_limit('100000') == complaint_queries.MAX_PAGE_SIZE
+    with pytest.raises(ValueError):
+        complaint_queries.parse_limit('ten')
+
+
+def test_build_page_query_fetches_one_extra_row():
+    query, params = complaint_queries.build_page_query(
+        ['id', 'created_at'], ["area = %s"], ['Digha'], 50, sort='oldest')
+    assert query == ("SELECT id, created_at FROM complaints WHERE area = %s "
+                     "ORDER BY created_at ASC, id ASC LIMIT %s")
+    assert params == ['Digha', 51]
+
+
+@pytest.mark.parametrize('item, error', [
+    ({'name': 'Asha', 'area': 'Digha'}, None),
+    ({'area': 'Digha'}, 'name is required'),
+    ({'name': 'Asha', 'area': 'x' * 101}, 'area must be at most 100 characters'),
+    ({'name': 'Asha', 'area': 'Digha', 'idempotency_key': ''}, 'idempotency_key'),
+    ({'name': 'Asha', 'area': 'Digha', 'image_path': 5}, 'image_path'),
+    ({'name': 'Asha', 'area': 'Digha', 'image_path': 'ab/cd/abcd' + '0' * 60 + '.jpg'}, None),
+    ({'name': 'Asha', 'area': 'Digha', 'image_path': 'ab/cd/abcd.jpg'}, 'image_path'),
+    ({'name': 'Asha', 'area': 'Digha', 'description': 'x' * 70000}, 'description'),
+    ([], 'JSON object'),
+])
+def test_validate_complaint(item, error):
+    result = complaint_queries.validate_complaint(item)
+    if error is None:
+        assert result is None
+    else:
+        assert error in result
+
+
+def test_parse_coordinate():
+    assert str(complaint_queries.parse_coordinate(' 25.61234567 ', 90)) == '25.6123457'
+    assert complaint_queries.parse_coordinate('', 90) is None
+    assert complaint_queries.parse_coordinate('91', 90) is None
+    assert complaint_queries.parse_coordinate('nan', 90) is None
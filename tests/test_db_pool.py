@@ -0,0 +1,110 @@
+import threading
+
+import pytest
+from mysql.connector import errors
+
+import db_pool
+
+
+class FakeConnection:
+    opened = 0
+
+    def __init__(self, **config):
+        FakeConnection.opened += 1
+        self.number = FakeConnection.opened
+        self.closed = False
+        self.rollbacks = 0
+        self.ping_error = None
+
+    def ping(self, **kwargs):
+        if self.ping_error:
+            raise self.ping_error
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    FakeConnection.opened = 0
+    monkeypatch.setattr(db_pool.mysql.connector, 'connect', FakeConnection)
+    return db_pool.ConnectionPool({}, pool_size=2, max_overflow=1, timeout=0.2, retry_delay=0)
+
+
+def test_connections_are_reused(pool):
+    for _ in range(5):
+        with pool.connection() as connection:
+            pass
+    assert FakeConnection.opened == 1
+    assert connection.rollbacks == 5  # No transaction leaks to the next borrower
+    stats = pool.stats()
+    assert (stats['open'], stats['idle'], stats['in_use'], stats['checkouts']) == (1, 1, 0, 5)
+
+
+def test_overflow_connections_are_closed_on_release(pool):
+    borrowed = [pool.acquire() for _ in range(3)]
+    assert pool.stats()['open'] == 3
+    for connection, opened_at in borrowed:
+        pool.release(connection, opened_at)
+    assert [connection.closed for connection, _ in borrowed] == [False, False, True]
+    assert pool.stats()['idle'] == 2
+
+
+def test_checkout_times_out_when_exhausted(pool):
+    borrowed = [pool.acquire() for _ in range(3)]
+    with pytest.raises(db_pool.PoolError, match='Timed out'):
+        pool.acquire()
+    assert pool.stats()['checkout_failures'] == 1
+
+    # A returned connection wakes a waiting thread
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(pool.acquire()))
+    pool.timeout = 5
+    waiter.start()
+    pool.release(*borrowed[0])
+    waiter.join()
+    assert got[0][0] is borrowed[0][0]
+
+
+def test_unreachable_server_raises_pool_error(pool, monkeypatch):
+    def refuse(**config):
+        raise errors.InterfaceError("Can't connect")
+    monkeypatch.setattr(db_pool.mysql.connector, 'connect', refuse)
+    with pytest.raises(db_pool.PoolError, match='Could not connect'):
+        pool.acquire()
+    stats = pool.stats()
+    assert (stats['open'], stats['in_use'], stats['checkout_failures']) == (0, 0, 1)
+    # Still an mysql.connector.Error for the routes' handlers
+    assert issubclass(db_pool.PoolError, errors.Error)
+
+
+def test_dropped_connection_is_replaced(pool):
+    with pool.connection() as first:
+        pass
+    first.ping_error = errors.OperationalError("MySQL server has gone away")
+    with pool.connection() as second:
+        pass
+    assert second is not first and first.closed
+    assert pool.stats()['reconnects'] == 1
+
+
+def test_connection_is_discarded_after_a_connection_error(pool):
+    with pytest.raises(errors.OperationalError):
+        with pool.connection() as connection:
+            raise errors.OperationalError("Lost connection")
+    assert connection.closed
+    assert pool.stats()['open'] == 0
+
+
+def test_forked_child_starts_empty_without_closing_parent_connections(pool):
+    with pool.connection() as connection:
+        pass
+    pool._after_fork()
+    assert not connection.closed
+    assert pool.stats()['idle'] == 0
+    with pool.connection() as child_connection:
+        pass
+    assert child_connection is not connection
@@ -0,0 +1,47 @@
+from datetime import datetime, timedelta
+
+from duplicate_index import DuplicateIndex
+
+LAT, LNG = 25.6093, 85.1376
+METRE = 1 / 111320.0  # Degrees of latitude
+
+
+def test_finds_reports_within_the_radius_nearest_first():
+    index = DuplicateIndex(radius_m=50)
+    index.add(1, LAT + 40 * METRE, LNG)
+    index.add(2, LAT + 10 * METRE, LNG)
+    index.add(3, LAT + 80 * METRE, LNG)  # Too far
+    assert index.candidates(LAT, LNG) == [2, 1]
+
+
+def test_radius_crosses_cell_borders():
+    index = DuplicateIndex(radius_m=50)
+    cell = index._cell_deg
+    border = (int(LAT / cell) + 1) * cell  # A cell border just north of LAT
+    index.add(1, border + 5 * METRE, LNG)
+    assert index.candidates(border - 5 * METRE, LNG) == [1]
+
+
+def test_old_removed_and_unlocated_complaints_are_ignored():
+    index = DuplicateIndex(radius_m=50, window_hours=24)
+    index.add(1, LAT, LNG, created_at=datetime.now() - timedelta(hours=25))
+    index.add(2, LAT, LNG)
+    index.add(3, None, LNG)
+    assert index.candidates(LAT, LNG) == [2]
+    index.remove(2)
+    assert index.candidates(LAT, LNG) == []
+    assert index.candidates(None, None) == []
+    assert len(index) == 1
+
+
+def test_load_reads_only_new_rows(fake_cursor):
+    now = datetime.now()
+    index = DuplicateIndex(radius_m=50)
+    cursor = fake_cursor([("FROM complaints", [(1, LAT, LNG, now - timedelta(hours=1)),
+                                               (2, LAT, LNG, now)])])
+    index.load(cursor)
+    assert len(index) == 2 and not index.needs_refresh()
+
+    index.load(cursor)
+    # The second load starts at the newest row already loaded
+    assert cursor.executed[-1][1] == (now,)
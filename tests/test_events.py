@@ -0,0 +1,214 @@
+import json
+
+import pytest
+
+import events
+
+
+def read_events(chunk):
+    """(id, event, data) of every event in a chunk of SSE text."""
+    found = []
+    for block in chunk.strip().split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.split('\n') if not line.startswith(':'))
+        if 'event' in fields:
+            found.append((fields['id'], fields['event'], json.loads(fields['data'])))
+    return found
+
+
+def open_stream(broker, last_event_id=None):
+    stream = broker.stream(last_event_id)
+    assert next(stream) == f"retry: {events.RETRY_MS}\n\n"
+    return stream
+
+
+class FakeTable:
+    """In-memory complaint_events table shared by several brokers."""
+
+    def __init__(self):
+        self.rows = []
+        self.next_id = 1
+
+    def reserve(self):
+        """An AUTO_INCREMENT id handed to an INSERT that has not committed."""
+        self.next_id += 1
+        return self.next_id - 1
+
+    def commit(self, number, event_type, data):
+        self.rows = sorted(self.rows + [(number, event_type, data)])
+
+    def append(self, new_events):
+        for event_type, data in new_events:
+            self.commit(self.reserve(), event_type, data)
+
+    def read(self, after, limit):
+        if after is None:
+            return self.rows[-limit:]
+        return [row for row in self.rows if row[0] > after][:limit]
+
+
+def test_new_stream_gets_only_new_events():
+    broker = events.EventBroker()
+    broker.publish('created', {'ids': [1]})
+    stream = open_stream(broker)
+    broker.publish('updated', {'ids': [1], 'status': 'Cleaned'})
+    assert read_events(next(stream)) == [
+        (f"{broker.epoch}-2", 'updated', {'ids': [1], 'status': 'Cleaned'})]
+    stream.close()
+    assert broker.stats()['subscribers'] == 0
+
+
+def test_resume_delivers_missed_events():
+    broker = events.EventBroker()
+    broker.publish('created', {'ids': [1]})
+    broker.publish('created', {'ids': [2]})
+    broker.publish('deleted', {'ids': [1]})
+    stream = open_stream(broker, f"{broker.epoch}-1")
+    assert [(type_, data) for _, type_, data in read_events(next(stream))] == [
+        ('created', {'ids': [2]}), ('deleted', {'ids': [1]})]
+    stream.close()
+
+
+def test_resume_after_ring_overflow_asks_for_reload():
+    broker = events.EventBroker(ring_size=3)
+    for complaint_id in range(1, 6):
+        broker.publish('created', {'ids': [complaint_id]})
+    stream = open_stream(broker, f"{broker.epoch}-1")
+    assert read_events(next(stream)) == [(f"{broker.epoch}-5", 'reload', {})]
+    stream.close()
+
+    # Still inside the buffer: caught up normally
+    stream = open_stream(broker, f"{broker.epoch}-2")
+    assert [data['ids'] for _, _, data in read_events(next(stream))] == [[3], [4], [5]]
+    stream.close()
+
+
+@pytest.mark.parametrize('last_event_id', ['other-1', 'garbage', '99'])
+def test_foreign_event_id_asks_for_reload(last_event_id):
+    broker = events.EventBroker()
+    broker.publish('created', {'ids': [1]})
+    stream = open_stream(broker, last_event_id)
+    assert read_events(next(stream))[0][1] == 'reload'
+    stream.close()
+
+
+def test_large_id_lists_are_split():
+    broker = events.EventBroker()
+    stream = open_stream(broker)
+    broker.publish('deleted', {'ids': list(range(events.MAX_EVENT_IDS + 1))})
+    sent = read_events(next(stream))
+    assert [len(data['ids']) for _, _, data in sent] == [events.MAX_EVENT_IDS, 1]
+    stream.close()
+
+
+def test_subscriber_limit():
+    broker = events.EventBroker(max_subscribers=1)
+    stream = open_stream(broker)
+    with pytest.raises(events.SubscriberLimitReached):
+        broker.stream()
+    stream.close()
+    open_stream(broker).close()
+
+
+def test_fork_gives_a_new_epoch():
+    broker = events.EventBroker()
+    broker.publish('created', {'ids': [1]})
+    epoch = broker.epoch
+    broker._after_fork()
+    assert broker.epoch != epoch
+    assert broker.stats()['buffered'] == 0
+    stream = open_stream(broker, f"{epoch}-1")
+    assert read_events(next(stream))[0][1] == 'reload'
+    stream.close()
+
+
+def test_shared_table_resumes_on_another_worker():
+    table = FakeTable()
+    first = events.EventBroker(table=table)
+    second = events.EventBroker(table=table)
+    first.publish('created', {'ids': [1]})
+    first.publish('created', {'ids': [2]})
+    assert first.epoch is None and table.rows[0][0] == 1
+
+    # Event IDs are table row IDs, valid on any worker
+    stream = open_stream(second, '1')
+    assert read_events(next(stream)) == [('2', 'created', {'ids': [2]})]
+    stream.close()
+
+
+def test_shared_table_id_ahead_of_this_worker_is_read_first():
+    table = FakeTable()
+    broker = events.EventBroker(table=table)
+    broker.poll()
+    table.append([('created', '{"ids": [1]}'), ('created', '{"ids": [2]}')])
+    stream = open_stream(broker, '2')  # Seen by the browser on another worker
+    broker.publish('deleted', {'ids': [2]})
+    broker.poll()
+    assert read_events(next(stream)) == [('3', 'deleted', {'ids': [2]})]
+    stream.close()
+
+
+def test_event_committed_out_of_order_is_delivered_late():
+    table = FakeTable()
+    broker = events.EventBroker(table=table)
+    broker.poll()
+    stream = open_stream(broker)
+    slow = table.reserve()  # Row 1: its transaction commits last
+    table.append([('created', '{"ids": [2]}')])
+    broker.poll()
+    assert read_events(next(stream)) == [('2', 'created', {'ids': [2]})]
+    assert broker.stats()['gaps'] == 1
+
+    table.commit(slow, 'deleted', '{"ids": [1]}')
+    broker.poll()
+    # Sent with the newest id so far, so a reconnect does not repeat row 2
+    assert read_events(next(stream)) == [('2', 'deleted', {'ids': [1]})]
+    assert broker.stats()['gaps'] == 0
+    stream.close()
+
+
+def test_gap_is_forgotten_after_the_grace_period(monkeypatch):
+    table = FakeTable()
+    broker = events.EventBroker(table=table)
+    broker.poll()
+    monkeypatch.setattr(events, 'GAP_GRACE', -1)  # Expires at once
+    table.reserve()  # Rolled back: never committed
+    table.append([('created', '{"ids": [2]}')])
+    broker.poll()
+    assert broker.stats()['gaps'] == 1
+    broker.poll()
+    assert broker.stats()['gaps'] == 0
+
+
+def test_resume_skips_events_the_client_has_seen():
+    table = FakeTable()
+    broker = events.EventBroker(table=table)
+    broker.poll()
+    table.append([('created', '{"ids": [1]}'), ('created', '{"ids": [2]}'), ('created', '{"ids": [3]}')])
+    broker.poll()
+    stream = open_stream(broker, '2')
+    assert read_events(next(stream)) == [('3', 'created', {'ids': [3]})]
+    stream.close()
+
+
+def test_live_events_unavailable_when_database_is_down(admin_client):
+    response = admin_client.get('/admin/events')
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '30'
+
+
+def test_live_events_resume_from_last_event_id(admin_client, app_module, monkeypatch):
+    broker = events.EventBroker()
+    monkeypatch.setattr(app_module, 'live_events', broker)
+    broker.publish('created', {'ids': [1]})
+    broker.publish('updated', {'ids': [1], 'status': 'Cleaned'})
+
+    response = admin_client.get('/admin/events', buffered=False,
+                                headers={'Last-Event-ID': f"{broker.epoch}-1"})
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    chunks = response.iter_encoded()
+    assert next(chunks) == f"retry: {events.RETRY_MS}\n\n".encode()
+    assert next(chunks).decode() == (f"id: {broker.epoch}-2\nevent: updated\n"
+                                     'data: {"ids": [1], "status": "Cleaned"}\n\n')
+    response.close()
+    assert broker.stats()['subscribers'] == 0
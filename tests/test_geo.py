@@ -0,0 +1,94 @@
+import math
+import sqlite3
+
+import pytest
+
+import geo
+
+
+def test_haversine_m():
+    assert geo.haversine_m(25.6, 85.1, 25.6, 85.1) == 0
+    # One degree of latitude, and a quarter of the equator
+    assert abs(geo.haversine_m(25.0, 85.0, 26.0, 85.0) - 111195) < 1
+    assert abs(geo.haversine_m(0, 0, 0, 90) - math.pi / 2 * geo.EARTH_RADIUS_M) < 1
+
+
+@pytest.mark.parametrize('lat, lng', [(25.6, 85.1), (-33.9, 151.2), (0.0, 179.99)])
+def test_bounding_box_contains_the_circle(lat, lng):
+    radius = 1000
+    min_lat, min_lng, max_lat, max_lng = geo.bounding_box(lat, lng, radius)
+    for bearing in range(0, 360, 15):
+        # Points on the circle, found by stepping out along a bearing
+        d = radius / geo.EARTH_RADIUS_M
+        b = math.radians(bearing)
+        phi = math.asin(math.sin(math.radians(lat)) * math.cos(d)
+                        + math.cos(math.radians(lat)) * math.sin(d) * math.cos(b))
+        lam = math.radians(lng) + math.atan2(math.sin(b) * math.sin(d) * math.cos(math.radians(lat)),
+                                             math.cos(d) - math.sin(math.radians(lat)) * math.sin(phi))
+        point_lat, point_lng = math.degrees(phi), min(180.0, math.degrees(lam))
+        assert min_lat - 1e-9 <= point_lat <= max_lat + 1e-9
+        assert min_lng - 1e-9 <= point_lng <= max_lng + 1e-9
+
+
+@pytest.mark.parametrize('lat', [90.0, 89.99])
+def test_bounding_box_near_a_pole_spans_every_longitude(lat):
+    min_lat, min_lng, max_lat, max_lng = geo.bounding_box(lat, 10.0, 5000)
+    assert (min_lng, max_lat, max_lng) == (-180.0, 90.0, 180.0)
+    assert min_lat == pytest.approx(lat - 0.045, abs=1e-3)
+
+
+def test_parse_bbox():
+    assert geo.parse_bbox({}) is None
+    assert geo.parse_bbox({'min_lat': '25.5', 'min_lng': '85', 'max_lat': '25.7', 'max_lng': '85.2'}) == (
+        25.5, 85.0, 25.7, 85.2)
+    with pytest.raises(ValueError, match='must all be numbers'):
+        geo.parse_bbox({'min_lat': '25.5'})
+    with pytest.raises(ValueError, match='Invalid bounding box'):
+        geo.parse_bbox({'min_lat': '26', 'min_lng': '85', 'max_lat': '25', 'max_lng': '86'})
+
+
+def test_wkt_uses_lat_long_order():
+    assert geo.point_wkt(25.6, 85.1) == 'POINT(25.6 85.1)'
+    assert geo.box_wkt(1, 2, 3, 4) == 'POLYGON((1 2, 3 2, 3 4, 1 4, 1 2))'
+
+
+def test_tile_xy():
+    assert geo.tile_xy(0.0, 0.0, 1) == (1, 1)
+    assert geo.tile_xy(25.6093, 85.1376, 10) == (754, 436)
+    # Clamped at the Mercator limits and the antimeridian
+    assert geo.tile_xy(89.9, 180.0, 4) == (15, 0)
+    assert geo.tile_xy(-89.9, -180.0, 4) == (0, 15)
+
+
+def test_cluster_level():
+    assert geo.cluster_level(0) == 6
+    assert geo.cluster_level(7) == 10
+    assert geo.cluster_level(22) == geo.CLUSTER_LEVELS[-1]
+
+
+@pytest.mark.parametrize('lat, lng', [(25.6093, 85.1376), (-33.87, 151.21), (85.1, -179.9), (-89.0, 0.0)])
+def test_tile_sql_matches_tile_xy(lat, lng):
+    # The cluster counts are computed in SQL; they must land in the
+    # same cells that /api/complaints/clusters looks up with tile_xy
+    db = sqlite3.connect(':memory:')
+    for name, function in (('LN', math.log), ('TAN', math.tan), ('COS', math.cos),
+                           ('RADIANS', math.radians), ('FLOOR', math.floor), ('POW', math.pow),
+                           ('LEAST', min), ('GREATEST', max)):
+        db.create_function(name, -1, function)
+    db.create_function('PI', 0, lambda: math.pi)
+    for level in geo.CLUSTER_LEVELS:
+        x, y = db.execute(f"SELECT {geo._tile_x_sql(lng, level)}, {geo._tile_y_sql(lat, level)}").fetchone()
+        assert (int(x), int(y)) == geo.tile_xy(lat, lng, level)
+
+
+def test_near_validates_arguments(client):
+    response = client.get('/api/complaints/near?lat=25.6')
+    assert response.status_code == 400
+    assert response.get_json()['message'] == 'lat and lng are required'
+    response = client.get('/api/complaints/near?lat=95&lng=85')
+    assert response.status_code == 400
+
+
+def test_clusters_validates_zoom(client):
+    assert client.get('/api/complaints/clusters').status_code == 400
+    assert client.get('/api/complaints/clusters?zoom=30').status_code == 400
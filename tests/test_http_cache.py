@@ -0,0 +1,112 @@
+import contextlib
+from datetime import datetime
+
+import pytest
+from werkzeug.datastructures import MultiDict
+from werkzeug.test import EnvironBuilder
+from werkzeug.wrappers import Request
+
+import http_cache
+
+DIGEST = 'abcd' + '0' * 60
+
+
+@pytest.fixture
+def database(app_module, fake_cursor, monkeypatch):
+    """A complaints table and its data_version row, as /complaints reads them."""
+
+    class Database:
+        version = 7
+        changed_at = 1700000000.2
+        now = 1700000005.0
+        complaints = [{'id': 1, 'area': 'Digha', 'status': 'Pending',
+                       'created_at': datetime(2024, 1, 2, 3, 4, 5)}]
+        cursors = []
+
+    class Connection:
+        def cursor(self, **options):
+            cursor = fake_cursor([
+                ("FROM data_version", [(Database.version, Database.changed_at, Database.now)]),
+                ("FROM complaints", [dict(row) for row in Database.complaints]),
+            ])
+            Database.cursors.append(cursor)
+            return cursor
+
+    monkeypatch.setattr(app_module, 'get_db', lambda: contextlib.nullcontext(Connection()))
+    return Database
+
+
+def test_etag_round_trip(client, database):
+    response = client.get('/complaints?area=Digha')
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+    assert etag == '"%s"' % http_cache.make_etag(7, MultiDict({'area': 'Digha'}))
+    assert response.headers['Cache-Control'] == 'no-cache'
+    assert response.get_json()['count'] == 1
+
+    # Unchanged: an empty 304 and the complaints are not queried
+    response = client.get('/complaints?area=Digha', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.get_data() == b''
+    assert response.headers['ETag'] == etag
+    assert not any('FROM complaints' in query for query, _ in database.cursors[-1].executed)
+
+    # Other filters are another entity
+    response = client.get('/complaints?area=Patna', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+
+    # A write bumps the version: the full page again, with a new ETag
+    database.version = 8
+    response = client.get('/complaints?area=Digha', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_if_modified_since(client, database):
+    response = client.get('/complaints')
+    # The change time is rounded up to the next whole second
+    assert response.last_modified.timestamp() == 1700000001
+    last_modified = response.headers['Last-Modified']
+
+    response = client.get('/complaints', headers={'If-Modified-Since': last_modified})
+    assert response.status_code == 304
+    # If-None-Match wins over If-Modified-Since
+    response = client.get('/complaints', headers={'If-Modified-Since': last_modified,
+                                                   'If-None-Match': '"6-0"'})
+    assert response.status_code == 200
+
+
+def test_last_modified_waits_for_the_second_to_pass():
+    assert http_cache.last_modified(1700000000.2, 1700000000.9) is None
+    assert http_cache.last_modified(1700000000.2, 1700000001.0) == 1700000001
+
+
+def test_etag_ignores_argument_order():
+    first = http_cache.make_etag(3, MultiDict([('status', 'Pending'), ('area', 'Digha')]))
+    second = http_cache.make_etag(3, MultiDict([('area', 'Digha'), ('status', 'Pending')]))
+    assert first == second
+    assert first != http_cache.make_etag(4, MultiDict([('area', 'Digha'), ('status', 'Pending')]))
+
+
+def test_is_not_modified_without_validators():
+    request = Request(EnvironBuilder().get_environ())
+    assert http_cache.is_not_modified(request, '1-abc', 1700000001) is False
+
+
+@pytest.mark.parametrize('path, immutable', [
+    (f'ab/cd/{DIGEST}.jpg', True),
+    ('1700000000_bin.jpg', False),
+])
+def test_image_cache_headers(client, application, tmp_path, monkeypatch, path, immutable):
+    monkeypatch.setitem(application.config, 'UPLOAD_FOLDER', str(tmp_path))
+    target = tmp_path / path
+    target.parent.mkdir(parents=True, exist_ok=True)
+    target.write_bytes(b'\xff\xd8\xff\xd9')
+    response = client.get(f'/uploads/{path}')
+    assert response.status_code == 200
+    cache_control = response.cache_control
+    assert cache_control.public
+    assert cache_control.immutable is immutable
+    assert cache_control.max_age == (http_cache.IMMUTABLE_MAX_AGE if immutable
+                                     else http_cache.LEGACY_IMAGE_MAX_AGE)
+    response.close()
@@ -0,0 +1,82 @@
+import hashlib
+import io
+import struct
+
+import pytest
+from werkzeug.datastructures import FileStorage
+
+import image_metadata
+import storage
+
+
+def exif_app1(entries):
+    """APP1 EXIF segment with SHORT / ASCII entries {tag: value} (little-endian)."""
+    values = b''
+    ifd = struct.pack('<H', len(entries))
+    data_offset = 8 + 2 + 12 * len(entries) + 4
+    for tag, value in entries.items():
+        if isinstance(value, int):
+            ifd += struct.pack('<HHIHH', tag, 3, 1, value, 0)
+        else:
+            text = value.encode() + b'\x00'
+            ifd += struct.pack('<HHII', tag, 2, len(text), data_offset + len(values))
+            values += text
+    payload = b'Exif\x00\x00' + b'II*\x00' + struct.pack('<I', 8) + ifd + b'\x00' * 4 + values
+    return b'\xff\xe1' + struct.pack('>H', len(payload) + 2) + payload
+
+
+def segment(marker, payload):
+    return bytes([0xFF, marker]) + struct.pack('>H', len(payload) + 2) + payload
+
+
+# A tiny JPEG skeleton: the scan data is not decoded by the stripper
+JFIF = segment(0xE0, b'JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00')
+TABLES = segment(0xDB, b'\x00' + bytes(64)) + segment(0xC0, b'\x08\x00\x01\x00\x01\x01\x01\x11\x00')
+SCAN = segment(0xDA, b'\x01\x01\x00\x00\x3f\x00') + b'\x12\xff\x00\x34\xff\xd0\x56'
+EOI = b'\xff\xd9'
+
+
+def test_jpeg_metadata_is_removed_and_orientation_kept():
+    original = (b'\xff\xd8' + JFIF
+                + exif_app1({0x010F: 'Canon', 0x0112: 6, 0x8825: 'GPS'})
+                + segment(0xE1, b'http://ns.adobe.com/xap/1.0/\x00<x:xmpmeta/>')
+                + segment(0xED, b'Photoshop 3.0\x00IPTC')
+                + segment(0xFE, b'comment')
+                + TABLES + SCAN + EOI + b'appended motion photo')
+    cleaned = image_metadata.strip_metadata(original, 'jpg')
+    assert cleaned == (b'\xff\xd8' + JFIF + image_metadata.orientation_segment(6)
+                       + TABLES + SCAN + EOI)
+    assert image_metadata.exif_orientation(image_metadata.orientation_segment(6)[4:]) == 6
+    # Already clean: unchanged
+    assert image_metadata.strip_metadata(cleaned, 'jpg') == cleaned
+
+
+def test_png_text_chunks_are_removed():
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + b'\x00' * 4
+    header = image_metadata.PNG_SIGNATURE + chunk(b'IHDR', bytes(13))
+    body = chunk(b'IDAT', b'pixels') + chunk(b'IEND', b'')
+    original = header + chunk(b'tEXt', b'GPS\x0025.6') + chunk(b'eXIf', b'MM') + body + b'junk'
+    assert image_metadata.strip_metadata(original, 'png') == header + body
+
+
+@pytest.mark.parametrize('data, extension', [
+    (b'\xff\xd8\xff\xe1\xff\xff', 'jpg'),
+    (image_metadata.PNG_SIGNATURE + b'\x00\x00\x00\xff', 'png'),
+    (b'GIF89a\x01\x00', 'gif'),
+])
+def test_damaged_images_raise_value_error(data, extension):
+    with pytest.raises(ValueError):
+        image_metadata.strip_metadata(data, extension)
+
+
+def test_stage_hashes_the_cleaned_upload(tmp_path):
+    store = storage.BlobStore(str(tmp_path), max_bytes=1024 * 1024)
+    original = b'\xff\xd8' + JFIF + exif_app1({0x010F: 'Canon'}) + TABLES + SCAN + EOI
+    upload = store.stage(FileStorage(io.BytesIO(original), filename='photo.jpg'))
+    cleaned = b'\xff\xd8' + JFIF + TABLES + SCAN + EOI
+    assert upload.size == len(cleaned)
+    assert upload.blob_path == storage.blob_path(hashlib.sha256(cleaned).hexdigest(), 'jpg')
+    assert store.publish(upload) is True
+    with open(tmp_path / upload.blob_path, 'rb') as f:
+        assert f.read() == cleaned
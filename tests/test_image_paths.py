@@ -0,0 +1,125 @@
+"""Image paths sent by clients can only name images the app stored."""
+
+import contextlib
+import os
+
+import pytest
+
+import archive
+import complaint_queries
+import storage
+
+DIGEST = 'abcd' + '0' * 60
+
+
+def make_file(root, path, data=b'image'):
+    target = os.path.join(root, path)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    with open(target, 'wb') as file:
+        file.write(data)
+    return target
+
+
+@pytest.mark.parametrize('path, stored', [
+    (f'ab/cd/{DIGEST}.jpg', True),
+    ('1700000000_bin_photo.JPG', True),  # Flat name from before content addressing
+    (f'ab/ce/{DIGEST}.jpg', False),  # Shards do not match the hash
+    (f'ab/cd/{DIGEST}.py', False),
+    ('../../app.py', False),
+    ('/etc/passwd', False),
+    ('1700000000_../x.jpg', False),
+    (['x'], False),
+])
+def test_is_stored_path(path, stored):
+    assert storage.is_stored_path(path) is stored
+
+
+def test_blob_store_rejects_paths_outside_the_store(tmp_path):
+    store = storage.BlobStore(str(tmp_path / 'uploads'), max_bytes=1024)
+    victim = make_file(str(tmp_path), 'app.py')
+    for path in ('../app.py', str(tmp_path / 'app.py')):
+        with pytest.raises(ValueError):
+            store.remove(path)
+        with pytest.raises(ValueError):
+            store.publish_copy(victim, path)
+    assert os.path.exists(victim)
+
+    # A well-formed name that is a symlink out of the store
+    os.symlink(victim, os.path.join(store.root, '1_link.jpg'))
+    with pytest.raises(ValueError, match='outside'):
+        store.remove('1_link.jpg')
+
+    stored = make_file(store.root, f'ab/cd/{DIGEST}.jpg')
+    store.remove(f'ab/cd/{DIGEST}.jpg')
+    assert not os.path.exists(stored)
+
+
+def test_add_existing_reference_needs_a_tracked_stored_path(fake_cursor):
+    cursor = fake_cursor([("UPDATE image_blobs", [(1,)])])
+    assert storage.add_existing_reference(cursor, '../../app.py') is False
+    assert cursor.executed == []
+    assert storage.add_existing_reference(cursor, f'ab/cd/{DIGEST}.jpg') is True
+    assert storage.add_existing_reference(fake_cursor(), f'ab/cd/{DIGEST}.jpg') is False
+
+
+def test_validate_complaint_rejects_foreign_image_paths():
+    item = {'name': 'Asha', 'area': 'Digha', 'image_path': '../../app.py'}
+    assert complaint_queries.validate_complaint(item) == complaint_queries.UNKNOWN_IMAGE_MESSAGE
+    item['image_path'] = f'ab/cd/{DIGEST}.jpg'
+    assert complaint_queries.validate_complaint(item) is None
+
+
+def test_batch_rejects_unknown_image_paths(app_module, fake_cursor):
+    cursor = fake_cursor()  # UPDATE image_blobs matches no row
+    items = [{'name': 'A', 'area': 'Digha', 'image_path': f'ab/cd/{DIGEST}.jpg'}]
+    results, created = app_module.insert_complaints_batch(cursor, items)
+    assert results == [{'index': 0, 'success': False, 'error': complaint_queries.UNKNOWN_IMAGE_MESSAGE}]
+    assert created == []
+
+
+def test_batch_route_ignores_client_image_size(client, app_module, fake_cursor, monkeypatch):
+    # image_size marks journaled images the server stored itself; sent
+    # by a client it must not skip the image_blobs check
+    cursor = fake_cursor()
+
+    class Connection:
+        def cursor(self):
+            return cursor
+
+        def commit(self):
+            pass
+
+    monkeypatch.setattr(app_module, 'get_db', lambda: contextlib.nullcontext(Connection()))
+    response = client.post('/api/submit_complaints/batch', json={'complaints': [
+        {'name': 'A', 'area': 'Digha', 'image_path': '../../app.py', 'image_size': 1},
+        {'name': 'B', 'area': 'Digha', 'image_path': '1700000000_bin.jpg', 'image_size': 1},
+    ]})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['failed'] == 2
+    assert {result['error'] for result in body['results']} == {complaint_queries.UNKNOWN_IMAGE_MESSAGE}
+    assert not any('INSERT' in query for query, _ in cursor.executed)
+
+
+def test_release_image_leaves_untracked_files(app_module, fake_cursor):
+    path = make_file(app_module.blob_store.root, '1700000000_kept.jpg')
+    app_module.release_image(fake_cursor(), '1700000000_kept.jpg')  # No image_blobs row
+    assert os.path.exists(path)
+    app_module.release_image(fake_cursor([("SELECT ref_count", [(1,)])]), '1700000000_kept.jpg')
+    assert not os.path.exists(path)
+
+
+def test_archive_image_only_moves_tracked_uploads(tmp_path, fake_cursor):
+    hot = storage.BlobStore(str(tmp_path / 'uploads'), max_bytes=1024)
+    cold = storage.BlobStore(str(tmp_path / 'archive'), max_bytes=1024)
+    victim = make_file(str(tmp_path), 'app.py')
+
+    archive.archive_image(fake_cursor(), '../app.py', 1, hot, cold)
+    archive.archive_image(fake_cursor([("SELECT ref_count", [(1,)])]), '../app.py', 1, hot, cold)
+    assert os.path.exists(victim)
+    assert os.listdir(cold.root) == [storage.TEMP_DIR]
+
+    stored = make_file(hot.root, f'ab/cd/{DIGEST}.jpg')
+    archive.archive_image(fake_cursor([("SELECT ref_count", [(1,)])]), f'ab/cd/{DIGEST}.jpg', 1, hot, cold)
+    assert not os.path.exists(stored)
+    assert os.path.exists(os.path.join(cold.root, f'ab/cd/{DIGEST}.jpg'))
@@ -0,0 +1,205 @@
+import json
+import os
+import threading
+import time
+
+import complaint_queries
+import journal
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_slot_replays_records_after_the_checkpoint(tmp_path):
+    slot = journal.JournalSlot(str(tmp_path / 'slot-0'))
+    for number in range(1, 6):
+        slot.append({'item': {'name': f"c{number}"}})
+    slot.sync()
+    slot.checkpoint(3)
+    slot.unlock()
+
+    # A torn last line from a crash is skipped
+    segment = [name for name in os.listdir(slot.directory) if name.endswith('.log')][-1]
+    with open(os.path.join(slot.directory, segment), 'ab') as f:
+        f.write(b'{"seq": 6, "item": {"na')
+
+    restarted = journal.JournalSlot(slot.directory)
+    assert restarted.load() == 2
+    assert [record['item']['name'] for record in restarted.pending] == ['c4', 'c5']
+    assert restarted.last_seq == 5
+    restarted.unlock()
+
+
+def test_checkpoint_removes_stored_segments(tmp_path, monkeypatch):
+    monkeypatch.setattr(journal, 'SEGMENT_BYTES', 1)  # One record per segment
+    slot = journal.JournalSlot(str(tmp_path / 'slot-0'))
+    for number in range(3):
+        slot.append({'item': {}})
+    slot.checkpoint(2)
+    assert [first for first, _ in slot._segments()] == [3]
+    slot.unlock()
+
+
+def test_records_are_stored_once_the_sink_recovers(tmp_path):
+    stored = []
+    failures = [2]  # The first two flushes fail (MySQL down)
+
+    def sink(records, files_dir):
+        if failures[0]:
+            failures[0] -= 1
+            raise RuntimeError("MySQL is down")
+        stored.extend(record['item']['name'] for record in records)
+
+    write_journal = journal.WriteBehindJournal(str(tmp_path), sink, retry_delay=0.01)
+    threads = [threading.Thread(target=write_journal.submit, args=({'name': f"c{n}"},))
+               for n in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    wait_for(lambda: len(stored) == 10)
+    assert sorted(stored) == sorted(f"c{n}" for n in range(10))
+    stats = write_journal.stats()
+    assert stats['flush_failures'] == 2
+    assert stats['fsyncs'] <= 10  # Concurrent submissions share fsyncs
+    wait_for(lambda: write_journal._slot.read_checkpoint() == 10)
+    assert write_journal.stats()['depth'] == 0
+
+
+def test_replayed_batch_is_not_inserted_twice(app_module, fake_cursor):
+    # The batch was stored just before a crash, but not checkpointed:
+    # on replay its idempotency keys are found and nothing is inserted
+    cursor = fake_cursor([
+        ("FROM complaints WHERE idempotency_key IN", [('jnl-a', 11)]),
+        ("FROM merged_reports WHERE idempotency_key IN", [('jnl-b', 12)]),
+    ])
+    items = [{'name': 'A', 'area': 'Digha', 'idempotency_key': 'jnl-a'},
+             {'name': 'B', 'area': 'Digha', 'idempotency_key': 'jnl-b'}]
+    results, created = app_module.insert_complaints_batch(cursor, items)
+    assert [(result['complaint_id'], result['status']) for result in results] == [
+        (11, 'replayed'), (12, 'replayed')]
+    assert created == []
+    assert not any('INSERT' in query for query, _ in cursor.executed)
+
+
+class RefusedRecord(Exception):
+    """Stands in for an error such as DataError: the record is at fault."""
+
+
+def poison_sink(stored, attempts):
+    def sink(records, files_dir):
+        attempts.append([record['item']['name'] for record in records])
+        if any(record['item']['name'] == 'bad' for record in records):
+            raise RefusedRecord("Data too long for column 'description'")
+        stored.extend(record['item']['name'] for record in records)
+    return sink
+
+
+def test_refused_record_is_dead_lettered(tmp_path):
+    stored, attempts = [], []
+    write_journal = journal.WriteBehindJournal(
+        str(tmp_path), poison_sink(stored, attempts), retry_delay=0.01,
+        is_outage=lambda error: not isinstance(error, RefusedRecord))
+    write_journal.start()
+    kept = os.path.join(write_journal._slot.files_dir, 'ab' + '0' * 62 + '.jpg')
+    with open(kept, 'wb') as f:
+        f.write(b'image')
+    for name in ('c1', 'bad', 'c2'):
+        item = {'name': name}
+        if name == 'bad':
+            item.update(image_path='ab/00/' + os.path.basename(kept), image_size=5)
+        write_journal.submit(item)
+
+    wait_for(lambda: write_journal._slot.read_checkpoint() == 3)
+    assert sorted(stored) == ['c1', 'c2']
+    assert ['bad'] in attempts  # Retried on its own before being set aside
+    stats = write_journal.stats()
+    assert (stats['depth'], stats['dead_letters'], stats['flushed']) == (0, 1, 2)
+
+    with open(tmp_path / journal.DEAD_LETTER_FILE) as f:
+        lines = [json.loads(line) for line in f]
+    assert [line['item']['name'] for line in lines] == ['bad']
+    assert 'Data too long' in lines[0]['error']
+    # The image is kept with the dead letter, and removed from the slot
+    assert os.listdir(tmp_path / journal.DEAD_LETTER_FILES_DIR) == [os.path.basename(kept)]
+    assert not os.path.exists(kept)
+
+
+def test_outage_is_retried_not_dead_lettered(tmp_path):
+    stored = []
+    down = [3]
+
+    def sink(records, files_dir):
+        if down[0]:
+            down[0] -= 1
+            raise ConnectionError("MySQL is down")
+        stored.extend(record['item']['name'] for record in records)
+
+    write_journal = journal.WriteBehindJournal(
+        str(tmp_path), sink, retry_delay=0.01,
+        is_outage=lambda error: isinstance(error, ConnectionError))
+    write_journal.submit({'name': 'c1'})
+    wait_for(lambda: stored == ['c1'])
+    assert write_journal.stats()['dead_letters'] == 0
+    assert not os.path.exists(tmp_path / journal.DEAD_LETTER_FILE)
+
+
+def test_flusher_survives_a_failed_checkpoint(tmp_path, monkeypatch):
+    stored = []
+    write_journal = journal.WriteBehindJournal(
+        str(tmp_path), lambda records, files_dir: stored.extend(records), retry_delay=0.01)
+    write_journal.start()
+    real_checkpoint = journal.JournalSlot.checkpoint
+    failures = [1]
+
+    def checkpoint(slot, seq):
+        if failures[0]:
+            failures[0] -= 1
+            raise OSError(28, "No space left on device")
+        real_checkpoint(slot, seq)
+
+    monkeypatch.setattr(journal.JournalSlot, 'checkpoint', checkpoint)
+    write_journal.submit({'name': 'c1'})
+    wait_for(lambda: len(stored) == 1)
+    write_journal.submit({'name': 'c2'})
+    wait_for(lambda: write_journal._slot.read_checkpoint() == 2)
+    assert len(stored) == 2
+
+
+def test_validate_complaint_checks_column_sizes():
+    item = {'name': 'Asha', 'area': 'Digha', 'description': 'x' * complaint_queries.MAX_DESCRIPTION_BYTES}
+    assert complaint_queries.validate_complaint(item) is None
+    item['description'] = '\u0915' * 30000  # 90000 bytes of UTF-8
+    assert complaint_queries.validate_complaint(item) == (
+        f"description must be at most {complaint_queries.MAX_DESCRIPTION_BYTES} bytes")
+    item['description'] = {'text': 'x'}
+    assert complaint_queries.validate_complaint(item) == "description must be text"
+    item = {'name': 'Asha', 'area': 'Digha', 'image_path': '1_' + 'x' * 300 + '.jpg'}
+    assert 'at most 255' in complaint_queries.validate_complaint(item)
+
+
+def test_api_submit_validates_before_journaling(client, app_module):
+    depth = app_module.write_journal.stats().get('depth', 0)
+    response = client.post('/api/submit_complaint', json={'area': 'Digha'})
+    assert response.status_code == 400
+    assert response.get_json()['message'] == 'name is required'
+
+    response = client.post('/api/submit_complaint',
+                           json={'name': 'Asha', 'area': 'Digha', 'description': 'x' * 70000})
+    assert response.status_code == 400
+    response = client.post('/api/submit_complaint', data={'area': 'Digha'})
+    assert response.status_code == 400
+    assert app_module.write_journal.stats().get('depth', 0) == depth
+
+
+def test_app_tells_outages_from_refused_records(app_module):
+    import mysql.connector
+    assert app_module.is_journal_outage(app_module.PoolError("down"))
+    assert app_module.is_journal_outage(mysql.connector.OperationalError("gone away"))
+    assert app_module.is_journal_outage(OSError("disk full"))
+    assert not app_module.is_journal_outage(mysql.connector.DataError("Data too long"))
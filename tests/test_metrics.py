@@ -0,0 +1,131 @@
+import math
+
+import metrics
+
+
+def parse(text):
+    """{(sample name, labels text): value} and {metric: type} of an exposition."""
+    samples, types = {}, {}
+    for line in text.splitlines():
+        if line.startswith('# TYPE '):
+            _, _, name, kind = line.split(' ')
+            types[name] = kind
+        elif line and not line.startswith('#'):
+            series, value = line.rsplit(' ', 1)
+            name, _, labels = series.partition('{')
+            samples[(name, labels.rstrip('}'))] = float(value)
+    return samples, types
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = metrics.Histogram('t_seconds', 'Test', ('endpoint',), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        histogram.observe(value, 'main.index')
+    registry = metrics.Registry()
+    registry.register(histogram)
+    text = registry.render()
+    assert text.endswith('\n')
+    samples, types = parse(text)
+    assert types == {'t_seconds': 'histogram'}
+    assert samples[('t_seconds_bucket', 'endpoint="main.index",le="0.1"')] == 1
+    assert samples[('t_seconds_bucket', 'endpoint="main.index",le="1"')] == 3
+    assert samples[('t_seconds_bucket', 'endpoint="main.index",le="+Inf"')] == 4
+    assert samples[('t_seconds_count', 'endpoint="main.index"')] == 4
+    assert math.isclose(samples[('t_seconds_sum', 'endpoint="main.index"')], 4.05)
+
+
+def test_label_values_are_escaped():
+    counter = metrics.Counter('c_total', 'Test', ('template',))
+    counter.inc('a"b\\c\nd')
+    registry = metrics.Registry()
+    registry.register(counter)
+    assert 'c_total{template="a\\"b\\\\c\\nd"} 1' in registry.render()
+
+
+def test_stats_gauges_expose_numbers_only():
+    gauges = metrics.StatsGauges('journal', 'Journal', lambda: {
+        'depth': 3, 'flushed': 10, 'running': True, 'last_error': 'boom', 'lag_seconds': 0.5},
+        counters=('flushed',))
+    registry = metrics.Registry()
+    registry.register(gauges)
+    samples, types = parse(registry.render())
+    assert types == {'journal_depth': 'gauge', 'journal_flushed_total': 'counter',
+                     'journal_running': 'gauge', 'journal_lag_seconds': 'gauge'}
+    assert samples[('journal_flushed_total', '')] == 10
+    assert samples[('journal_running', '')] == 1
+
+
+def test_statement_type():
+    assert metrics.statement_type('  select 1') == 'SELECT'
+    assert metrics.statement_type('WITH x AS (SELECT 1) SELECT * FROM x') == 'OTHER'
+    assert metrics.statement_type('') == 'OTHER'
+
+
+class FakeCursor:
+    def __init__(self, clock):
+        self.clock = clock
+
+    def execute(self, operation, params=None):
+        self.clock[0] += 0.3
+
+    def fetchall(self):
+        self.clock[0] += 0.1
+        return [(1,)]
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, clock):
+        self.clock = clock
+
+    def cursor(self):
+        return FakeCursor(self.clock)
+
+
+def test_slow_query_and_request_log(monkeypatch, capsys):
+    clock = [0.0]
+    monkeypatch.setattr(metrics.time, 'perf_counter', lambda: clock[0])
+    app_metrics = metrics.AppMetrics(slow_query_ms=200, slow_request_ms=1000)
+
+    app_metrics.start_request()
+    cursor = app_metrics.instrument(FakeConnection(clock)).cursor()
+    cursor.execute("SELECT * FROM complaints WHERE area = %s", ('Digha',))
+    cursor.fetchall()  # The fetch counts towards the statement
+    clock[0] += 1.0
+    app_metrics.finish_request('GET', 'main.admin', 200, '/admin')
+
+    log = capsys.readouterr().out
+    assert "Slow query (400 ms): SELECT * FROM complaints WHERE area = %s params=('Digha',)" in log
+    assert "Slow request: GET /admin 200 in 1400 ms" in log
+    assert "SQL 400 ms in 1 queries" in log
+
+    samples, _ = parse(app_metrics.render())
+    assert samples[('db_slow_queries_total', 'statement="SELECT"')] == 1
+    assert samples[('http_slow_requests_total', 'endpoint="main.admin"')] == 1
+    assert samples[('http_requests_total', 'method="GET",endpoint="main.admin",status="200"')] == 1
+    assert samples[('http_request_db_seconds_count', 'endpoint="main.admin"')] == 1
+
+
+def test_zero_turns_the_slow_log_off(monkeypatch, capsys):
+    clock = [0.0]
+    monkeypatch.setattr(metrics.time, 'perf_counter', lambda: clock[0])
+    app_metrics = metrics.AppMetrics(slow_query_ms=0, slow_request_ms=0)
+    app_metrics.start_request()
+    cursor = app_metrics.instrument(FakeConnection(clock)).cursor()
+    cursor.execute("UPDATE complaints SET status = 'Cleaned'")
+    cursor.close()
+    app_metrics.finish_request('POST', 'main.update_status', 302, '/update_status')
+    assert capsys.readouterr().out == ''
+
+
+def test_metrics_endpoint(client):
+    client.get('/api/pool_stats')
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.content_type == metrics.CONTENT_TYPE
+    samples, types = parse(response.get_data(as_text=True))
+    assert types['http_requests_total'] == 'counter'
+    assert types['db_pool_checkouts_total'] == 'counter'
+    assert samples[('http_requests_total', 'method="GET",endpoint="main.pool_stats",status="200"')] >= 1
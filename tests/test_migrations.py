@@ -0,0 +1,148 @@
+import pytest
+
+import migrations
+
+
+@pytest.fixture
+def server(fake_cursor, monkeypatch):
+    """A MySQL server that remembers schema_migrations between runs."""
+
+    class Cursor(fake_cursor):
+        def execute(self, query, params=()):
+            super().execute(query, params)
+            if 'INSERT INTO schema_migrations' in query:
+                server.applied.append(params[0])
+            elif 'SELECT version FROM schema_migrations' in query:
+                self.rows = [(version,) for version in server.applied]
+
+    class Connection:
+        def cursor(self):
+            cursor = Cursor([("GET_LOCK", [(server.lock,)]), ("RELEASE_LOCK", [(1,)])])
+            server.cursors.append(cursor)
+            return cursor
+
+        def commit(self):
+            server.commits += 1
+
+        def close(self):
+            pass
+
+    class Server:
+        applied = []
+        cursors = []
+        commits = 0
+        lock = 1
+
+    server = Server()
+    monkeypatch.setattr(migrations.mysql.connector, 'connect', lambda **config: Connection())
+    return server
+
+
+def recording_migrations(monkeypatch, ran, versions=(1, 2, 3)):
+    def migration(version):
+        return lambda connection, batch_size, pause: ran.append(version)
+    monkeypatch.setattr(migrations, 'MIGRATIONS',
+                        [(version, f'step_{version}', migration(version)) for version in versions])
+
+
+def test_migration_versions_are_unique_and_ordered():
+    versions = [version for version, _, _ in migrations.MIGRATIONS]
+    assert versions == sorted(set(versions))
+    assert versions == list(range(1, len(versions) + 1))
+
+
+def test_migrations_run_in_order_once(server, monkeypatch):
+    ran = []
+    recording_migrations(monkeypatch, ran)
+    config = {'database': 'waste_management', 'user': 'root'}
+
+    assert migrations.run_migrations(config) is True
+    assert ran == [1, 2, 3]
+    assert server.applied == [1, 2, 3]
+    # Each migration is committed with its schema_migrations row
+    assert server.commits == 3
+
+    # A second run finds everything applied
+    assert migrations.run_migrations(config) is True
+    assert ran == [1, 2, 3]
+
+    # A new migration is the only one applied by the next run
+    recording_migrations(monkeypatch, ran, versions=(1, 2, 3, 4))
+    assert migrations.run_migrations(config) is True
+    assert ran == [1, 2, 3, 4]
+    assert server.applied == [1, 2, 3, 4]
+
+
+def test_migrations_wait_for_the_lock(server, monkeypatch, capsys):
+    ran = []
+    recording_migrations(monkeypatch, ran)
+    server.lock = 0
+    assert migrations.run_migrations({'database': 'waste_management'}) is False
+    assert ran == []
+    assert 'migration lock' in capsys.readouterr().out
+
+
+def test_failed_migration_is_not_recorded_and_releases_the_lock(server, monkeypatch):
+    def broken(connection, batch_size, pause):
+        raise migrations.mysql.connector.errors.DatabaseError('Lock wait timeout')
+
+    ran = []
+    recording_migrations(monkeypatch, ran)
+    migrations.MIGRATIONS[1] = (2, 'step_2', broken)
+    assert migrations.run_migrations({'database': 'waste_management'}) is False
+    assert server.applied == [1]
+    assert any('RELEASE_LOCK' in query for query, _ in server.cursors[-1].executed)
+
+    # Fixed, the next run resumes at the failed version
+    recording_migrations(monkeypatch, ran)
+    assert migrations.run_migrations({'database': 'waste_management'}) is True
+    assert ran == [1, 2, 3]
+
+
+def test_backfill_in_batches_covers_the_id_range(fake_cursor):
+    cursor = fake_cursor([("SELECT MIN(id), MAX(id)", [(3, 12)])])
+
+    class Connection:
+        commits = 0
+
+        def cursor(self):
+            return cursor
+
+        def commit(self):
+            Connection.commits += 1
+
+    migrations.backfill_in_batches(Connection(), 'complaints',
+                                   "UPDATE complaints SET x = %s WHERE id BETWEEN %s AND %s",
+                                   ('y',), batch_size=5, pause=0)
+    updates = [params for query, params in cursor.executed if query.startswith('UPDATE')]
+    assert updates == [('y', 3, 7), ('y', 8, 12)]
+    assert Connection.commits == 2
+
+
+def test_backfill_of_an_empty_table_does_nothing(fake_cursor):
+    cursor = fake_cursor([("SELECT MIN(id), MAX(id)", [(None, None)])])
+
+    class Connection:
+        def cursor(self):
+            return cursor
+
+    assert migrations.backfill_in_batches(Connection(), 'complaints', "UPDATE", pause=0) == 0
+    assert len(cursor.executed) == 1
+
+
+def test_migrations_skip_work_already_done(fake_cursor):
+    # A database created from waste_management.sql already has the column
+    class Connection:
+        def __init__(self, cursor):
+            self.cursor_ = cursor
+
+        def cursor(self):
+            return self.cursor_
+
+    done = fake_cursor([("information_schema.COLUMNS", [('int', 'NO')])])
+    migrations.migration_005_report_count(Connection(done), 100, 0)
+    assert not any(query.startswith('ALTER') for query, _ in done.executed)
+
+    missing = fake_cursor()
+    migrations.migration_005_report_count(Connection(missing), 100, 0)
+    assert missing.executed[-1][0].startswith('ALTER TABLE complaints ADD COLUMN report_count')
@@ -0,0 +1,101 @@
+import random
+import time
+
+import numpy as np
+
+import routing
+
+DEPOT = (25.6093, 85.1376)
+
+
+def random_stops(count, seed=1):
+    rng = random.Random(seed)
+    return [{'id': n, 'latitude': DEPOT[0] + rng.uniform(-0.05, 0.05),
+             'longitude': DEPOT[1] + rng.uniform(-0.05, 0.05), 'report_count': rng.randint(1, 4)}
+            for n in range(count)]
+
+
+def test_haversine_matrix():
+    dist = routing.haversine_matrix([25.0, 26.0, 25.0], [85.0, 85.0, 85.0])
+    assert dist.shape == (3, 3)
+    assert np.allclose(np.diag(dist), 0)
+    assert np.allclose(dist, dist.T)
+    assert abs(dist[0, 1] - 111195) < 50  # One degree of latitude
+
+
+def test_sweep_groups_cover_every_stop_once():
+    stops = random_stops(103)
+    lats = np.array([stop['latitude'] for stop in stops])
+    lngs = np.array([stop['longitude'] for stop in stops])
+    groups = routing.sweep_groups(lats, lngs, *DEPOT, 4)
+    assert len(groups) == 4
+    assert sorted(np.concatenate(groups).tolist()) == list(range(103))
+    assert max(map(len, groups)) - min(map(len, groups)) <= 1
+
+
+def test_sweep_groups_are_angular_sectors():
+    # Stops due north, east, south and west of the depot
+    lats = np.array([DEPOT[0] + 0.01, DEPOT[0], DEPOT[0] - 0.01, DEPOT[0]] * 5)
+    lngs = np.array([DEPOT[1], DEPOT[1] + 0.01, DEPOT[1], DEPOT[1] - 0.01] * 5)
+    groups = routing.sweep_groups(lats, lngs, *DEPOT, 4)
+    assert [sorted({int(k) % 4 for k in group}) for group in sorted(groups, key=min)] == [[0], [1], [2], [3]]
+
+
+def test_two_opt_keeps_a_valid_tour_and_never_lengthens_it():
+    stops = random_stops(60)
+    dist = routing.haversine_matrix([DEPOT[0]] + [s['latitude'] for s in stops],
+                                    [DEPOT[1]] + [s['longitude'] for s in stops])
+    tour = np.concatenate(([0], np.random.default_rng(0).permutation(np.arange(1, 61)), [0]))
+    improved = routing.two_opt(dist, tour, time.monotonic() + 10)
+    assert improved[0] == 0 and improved[-1] == 0
+    assert sorted(improved[1:-1].tolist()) == list(range(1, 61))
+    assert routing.route_length(dist, improved) < routing.route_length(dist, tour)
+
+
+def test_plan_routes_serves_each_stop_once():
+    stops = random_stops(50)
+    plan = routing.plan_routes(stops, *DEPOT, vehicles=3, capacity=20)
+    served = [stop['id'] for route in plan['routes'] for stop in route['stops']]
+    assert sorted(served) == list(range(50))
+    assert len(plan['routes']) == 3
+    assert plan['unassigned'] == []
+    assert plan['total_distance_m'] == round(sum(r['distance_m'] for r in plan['routes']), 1)
+
+
+def test_plan_routes_over_capacity_keeps_most_reported():
+    stops = random_stops(30)
+    for stop in stops[:5]:
+        stop['report_count'] = 10
+    plan = routing.plan_routes(stops, *DEPOT, vehicles=2, capacity=5)
+    served = {stop['id'] for route in plan['routes'] for stop in route['stops']}
+    assert len(served) == 10
+    assert served >= {0, 1, 2, 3, 4}
+    assert sorted(served | set(plan['unassigned'])) == list(range(30))
+
+
+def test_plan_routes_without_stops():
+    plan = routing.plan_routes([], *DEPOT, vehicles=2, capacity=5)
+    assert plan['routes'] == [] and plan['total_distance_m'] == 0
+
+
+def test_haversine_matrix_blocks_match_one_pass(monkeypatch):
+    stops = random_stops(70)
+    lats = [stop['latitude'] for stop in stops]
+    lngs = [stop['longitude'] for stop in stops]
+    whole = routing.haversine_matrix(lats, lngs)
+    monkeypatch.setattr(routing, 'MATRIX_ROW_BLOCK', 16)
+    blocked = routing.haversine_matrix(lats, lngs)
+    assert blocked.dtype == np.float32
+    assert np.array_equal(blocked, whole)
+
+
+def test_route_planning_requires_admin_login(client):
+    response = client.get('/api/routes?depot_lat=25.6&depot_lng=85.1')
+    assert response.status_code == 401
+
+
+def test_route_planning_validates_the_depot(admin_client):
+    response = admin_client.get('/api/routes?depot_lat=95&depot_lng=85.1')
+    assert response.status_code == 400
+    response = admin_client.get('/api/routes?depot_lat=25.6&depot_lng=85.1&vehicles=0')
+    assert response.status_code == 400
@@ -0,0 +1,45 @@
+import pytest
+
+import search
+
+
+def test_words_become_required_prefixes():
+    assert search.parse_search_text('  dead animal ') == ('+dead* +animal*', 'dead animal')
+
+
+def test_phrases_are_kept_together():
+    boolean_query, natural_query = search.parse_search_text('"near the school" garbage')
+    assert boolean_query == '+"near the school" +garbage*'
+    assert natural_query == 'near the school garbage'
+
+
+def test_one_word_phrase_is_a_word():
+    assert search.parse_search_text('"hospital"') == ('+hospital*', 'hospital')
+
+
+def test_short_words_are_dropped():
+    assert search.parse_search_text('a pile on road') == ('+pile* +road*', 'pile road')
+
+
+def test_user_operators_are_not_passed_through():
+    boolean_query, _ = search.parse_search_text('-garbage +drain* (smell) ~dog @2')
+    assert boolean_query == '+garbage* +drain* +smell* +dog*'
+
+
+@pytest.mark.parametrize('text', ['', None, 'a b', '"" ++ --'])
+def test_nothing_searchable(text):
+    with pytest.raises(ValueError, match='at least one word'):
+        search.parse_search_text(text)
+
+
+def test_too_long():
+    with pytest.raises(ValueError, match='at most'):
+        search.parse_search_text('x' * (search.MAX_SEARCH_LENGTH + 1))
+
+
+def test_cursor_round_trip_and_limits():
+    assert search.decode_cursor(search.encode_cursor(150)) == 150
+    with pytest.raises(ValueError):
+        search.decode_cursor(search.encode_cursor(search.MAX_SEARCH_OFFSET + 1))
+    with pytest.raises(ValueError):
+        search.decode_cursor('garbage')
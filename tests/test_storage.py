@@ -0,0 +1,62 @@
+import hashlib
+import io
+import os
+
+import pytest
+from werkzeug.datastructures import FileStorage
+from werkzeug.exceptions import RequestEntityTooLarge, UnsupportedMediaType
+
+import storage
+
+
+def test_blob_path_is_sharded_by_hash():
+    digest = hashlib.sha256(b'photo').hexdigest()
+    assert storage.blob_path(digest, 'jpg') == f"{digest[:2]}/{digest[2:4]}/{digest}.jpg"
+
+
+def test_detect_image_type():
+    assert storage.detect_image_type(b'\x89PNG\r\n\x1a\n') == 'png'
+    assert storage.detect_image_type(b'\xff\xd8\xff\xe0abcd') == 'jpg'
+    assert storage.detect_image_type(b'GIF89a..') == 'gif'
+    assert storage.detect_image_type(b'%PDF-1.7') is None
+
+
+def test_stage_rejects_non_images(tmp_path):
+    store = storage.BlobStore(str(tmp_path), max_bytes=1024 * 1024)
+    with pytest.raises(UnsupportedMediaType):
+        store.stage(FileStorage(io.BytesIO(b'%PDF-1.7 not an image'), filename='photo.jpg'))
+    assert store.stage(FileStorage(io.BytesIO(b'\xff\xd8\xff\xe1\xff\xff'), filename='x.jpg')) is None
+
+
+def jpeg_upload(data=b'photo'):
+    return FileStorage(io.BytesIO(b'\xff\xd8\xff\xd9' + data), filename='photo.jpg')
+
+
+def test_identical_uploads_are_stored_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage.HashingUpload, 'strip_metadata', lambda self: None)
+    store = storage.BlobStore(str(tmp_path), max_bytes=1024)
+    first = store.stage(jpeg_upload())
+    second = store.stage(jpeg_upload())
+    assert first.blob_path == second.blob_path
+    assert store.publish(first) is True
+    assert store.publish(second) is False
+    # Nothing is left behind in the temp folder
+    assert sorted(p.name for p in tmp_path.rglob('*') if p.is_file()) == [first.blob_path.split('/')[-1]]
+
+
+def test_stage_stops_at_the_size_limit(tmp_path):
+    store = storage.BlobStore(str(tmp_path), max_bytes=1024)
+    with pytest.raises(RequestEntityTooLarge):
+        store.stage(jpeg_upload(bytes(2048)))
+    assert os.listdir(store.temp_dir) == []
+
+
+def test_release_reference_counts_down(fake_cursor):
+    path = storage.blob_path('ab' * 32, 'jpg')
+    assert storage.release_reference(fake_cursor(), path) is None
+    shared = fake_cursor([("SELECT ref_count", [(2,)])])
+    assert storage.release_reference(shared, path) is False
+    assert shared.executed[-1][0].startswith('UPDATE image_blobs SET ref_count = ref_count - 1')
+    last = fake_cursor([("SELECT ref_count", [{'ref_count': 1}])])
+    assert storage.release_reference(last, path) is True
+    assert last.executed[-1][0].startswith('DELETE FROM image_blobs')
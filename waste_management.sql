@@ -25,9 +25,13 @@ CREATE TABLE IF NOT EXISTS complaints (
     -- Detailed description of the garbage issue
     description TEXT,
     
-    -- GPS coordinates for location tracking
-    latitude VARCHAR(50),
-    longitude VARCHAR(50),
+    -- GPS coordinates for location tracking (NULL when not available)
+    latitude DECIMAL(10,7),
+    longitude DECIMAL(10,7),
+    
+    -- Same coordinates as a POINT for spatial queries
+    -- (POINT(0 0) when the complaint has no GPS location)
+    location POINT NOT NULL SRID 4326,
     
     -- Path to the uploaded garbage image
     image_path VARCHAR(255),
@@ -36,9 +40,130 @@ CREATE TABLE IF NOT EXISTS complaints (
     status VARCHAR(50) DEFAULT 'Pending',
     
     -- Timestamp when complaint was created
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    
+    -- Number of citizen reports merged into this complaint
+    report_count INT NOT NULL DEFAULT 1,
+    
+    -- Timestamp when the complaint was marked Cleaned
+    cleaned_at TIMESTAMP NULL DEFAULT NULL,
+    
+    -- Client-supplied key that makes retried batch submissions safe
+    idempotency_key VARCHAR(64) NULL,
+    UNIQUE INDEX idx_idempotency_key (idempotency_key),
+    
+    -- Indexes for filtering by status / area / date and for map queries
+    INDEX idx_created (created_at),
+    INDEX idx_status_created (status, created_at),
+    INDEX idx_area_created (area, created_at),
+    INDEX idx_status_cleaned (status, cleaned_at),
+    SPATIAL INDEX idx_location (location),
+    
+    -- Full-text search over area and description (/api/search)
+    FULLTEXT INDEX idx_fulltext (area, description)
+);
+
+-- Step 4: Precomputed map cluster counts
+-- One row per (zoom level, status, map tile); kept up to date by the app
+CREATE TABLE IF NOT EXISTS complaint_clusters (
+    level TINYINT NOT NULL,
+    status VARCHAR(50) NOT NULL,
+    x INT NOT NULL,
+    y INT NOT NULL,
+    count INT NOT NULL DEFAULT 0,
+    sum_lat DOUBLE NOT NULL DEFAULT 0,
+    sum_lng DOUBLE NOT NULL DEFAULT 0,
+    PRIMARY KEY (level, status, x, y),
+    INDEX idx_level_status_count (level, status, count)
+);
+
+-- Step 5: Idempotency keys of reports merged into an existing complaint
+CREATE TABLE IF NOT EXISTS merged_reports (
+    idempotency_key VARCHAR(64) PRIMARY KEY,
+    complaint_id INT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Step 6: Reference counts of stored image files
+-- Images are stored by content hash; a file is deleted when ref_count reaches 0
+CREATE TABLE IF NOT EXISTS image_blobs (
+    path VARCHAR(255) PRIMARY KEY,
+    ref_count INT NOT NULL DEFAULT 1,
+    size_bytes BIGINT NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Step 7: Change counter for HTTP caching (ETag / Last-Modified)
+-- Bumped by every write transaction
+CREATE TABLE IF NOT EXISTS data_version (
+    id TINYINT PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0,
+    changed_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6)
+);
+INSERT IGNORE INTO data_version (id, version) VALUES (1, 0);
+
+-- Step 8: Analytics rollups, kept up to date by the app
+-- Complaints per (day reported, area, current status)
+CREATE TABLE IF NOT EXISTS complaint_daily_stats (
+    day DATE NOT NULL,
+    area VARCHAR(100) NOT NULL,
+    status VARCHAR(50) NOT NULL,
+    complaints INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, area, status)
+);
+
+-- Complaints cleaned per (day cleaned, area) and total seconds to clean
+CREATE TABLE IF NOT EXISTS cleaning_daily_stats (
+    day DATE NOT NULL,
+    area VARCHAR(100) NOT NULL,
+    cleaned INT NOT NULL DEFAULT 0,
+    clean_seconds BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, area)
+);
+
+-- Step 9: Archive of complaints cleaned long ago (moved by archive.py)
+-- Compressed and partitioned by year; archive.py adds partitions for new years
+CREATE TABLE IF NOT EXISTS complaints_archive (
+    id INT NOT NULL,
+    name VARCHAR(100) NOT NULL,
+    area VARCHAR(100) NOT NULL,
+    description TEXT,
+    latitude DECIMAL(10,7),
+    longitude DECIMAL(10,7),
+    image_path VARCHAR(255),
+    status VARCHAR(50),
+    created_at TIMESTAMP NOT NULL,
+    report_count INT NOT NULL DEFAULT 1,
+    cleaned_at TIMESTAMP NULL DEFAULT NULL,
+    idempotency_key VARCHAR(64) NULL,
+    archived_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, created_at),
+    INDEX idx_created (created_at),
+    INDEX idx_area_created (area, created_at)
+)
+ROW_FORMAT=COMPRESSED
+PARTITION BY RANGE (UNIX_TIMESTAMP(created_at)) (
+    PARTITION p_old VALUES LESS THAN (UNIX_TIMESTAMP('2024-01-01 00:00:00')),
+    PARTITION p2024 VALUES LESS THAN (UNIX_TIMESTAMP('2025-01-01 00:00:00')),
+    PARTITION p2025 VALUES LESS THAN (UNIX_TIMESTAMP('2026-01-01 00:00:00')),
+    PARTITION p2026 VALUES LESS THAN (UNIX_TIMESTAMP('2027-01-01 00:00:00')),
+    PARTITION p2027 VALUES LESS THAN (UNIX_TIMESTAMP('2028-01-01 00:00:00')),
+    PARTITION p_future VALUES LESS THAN MAXVALUE
+);
+
+-- Step 10: Live dashboard events, shared by the app's worker processes
+-- The app keeps only the newest rows
+CREATE TABLE IF NOT EXISTS complaint_events (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    event_type VARCHAR(16) NOT NULL,
+    data TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- NOTE: Existing databases are upgraded by the migration runner:
+--   python migrations.py
+-- It converts old VARCHAR coordinates in small batches.
+
 -- ============================================
 -- HOW TO USE THIS FILE IN MySQL WORKBENCH:
 -- ============================================
@@ -0,0 +1,17 @@
+"""
+============================================
+WSGI Entry Point
+Web Based Smart Waste Management System
+============================================
+The app as loaded by a production WSGI server:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Configure it with WASTE_* environment variables (see
+settings.py); schema migrations are run by gunicorn.conf.py.
+============================================
+"""
+
+from app import create_app
+
+app = create_app()